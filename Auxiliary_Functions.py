@@ -4,14 +4,19 @@
 # model. ######################################
 
 # Import nccessary packages
-import xlrd
+import bisect
+import os
 
+import pandas as pd
+
+
+_workbook_cache = {}
 
 class SetInput():
     """
     This is an object that initialise the input sets
     """
-    def __init__(self, g, i, j, o, d, l, c, w, t):
+    def __init__(self, g, i, j, o, d, l, c, w, t, a, at):
         self.g = g
         self.i = i
         self.j = j
@@ -21,12 +26,14 @@ class SetInput():
         self.c = c
         self.w = w
         self.t = t
+        self.a = a
+        self.at = at
 
 class ParaFixedInput():
     """
     This is an object that initialise the fixed parameters
     """
-    def __init__(self, tau, r, u, H, OL, OW, NC, NL, NW):
+    def __init__(self, tau, H, OL, OW, NC, NL, NW):
         self.tau = tau
         self.H = H
         self.OL = OL
@@ -48,6 +55,78 @@ class ParaVarInput():
         self.M_init = M_init
         self.WS_init = WS_init
 
+class TimeExpandedNetwork():
+    """
+    This is an object that indexes the feasible departures (i, j, t) by
+    node-period, so the balance constraints can look up the services
+    leaving and arriving at node i in period t without scanning all nodes.
+    outbound[i, t] holds the departures leaving i at t, inbound[i, t] the
+    departures (ix, i, tp) arriving at i in the first period t reached
+    by tp + H[ix, i], and departures[t] every departure leaving at t
+    """
+    def __init__(self, nodes, periods, at, H):
+        periods = list(periods)
+        self.outbound = {(i, t): [] for i in nodes for t in periods}
+        self.inbound = {(i, t): [] for i in nodes for t in periods}
+        self.departures = {t: [] for t in periods}
+        for (i, j, t) in at:
+            self.outbound[i, t].append((i, j, t))
+            self.inbound[j, arrival_period(periods, t + H[i, j])].append((i, j, t))
+            self.departures[t].append((i, j, t))
+
+def arrival_period(periods, t):
+    """
+    This function takes in the sorted list of time periods and a point in
+    time t and returns the first period at or after t (None past the last
+    period). On the uniform grid this is t itself; on a compressed
+    timeline an arrival is counted in the period that follows it
+    """
+    pos = bisect.bisect_left(periods, t)
+    return periods[pos] if pos < len(periods) else None
+
+def preparation_windows(periods, nodes, P, outbound):
+    """
+    This function takes in the sorted list of time periods, the nodes,
+    their preparation times P and the departures outbound[i, t] of every
+    node-period, and returns the window of every min_prep_time row: the
+    periods tp with t - P[i] <= tp <= t, found by bisection, so each row
+    only spans its own window. The windows are the cliques of departures
+    that conflict at a node; only the maximal ones are kept, a window
+    whose departures all fall in the window of the next period is implied
+    by it and left out
+    """
+    periods = list(periods)
+    windows = {}
+    for i in nodes:
+        starts = [bisect.bisect_left(periods, t - P[i]) for t in periods]
+        for pos, t in enumerate(periods):
+            end = starts[pos + 1] if pos + 1 < len(periods) else pos + 1
+            if any(outbound[i, periods[tp]] for tp in range(starts[pos], end)):
+                windows[i, t] = periods[starts[pos]:pos + 1]
+    return windows
+
+def feasible_legs(H):
+    """
+    This function takes in the journey time dictionary H (with the zero
+    entries already removed) and returns the sorted list of feasible
+    legs (i, j). Self-loops are never legs.
+    """
+    return sorted(key for key, val in H.items() if val and key[0] != key[1])
+
+def feasible_departures(H, t):
+    """
+    This function takes in the journey time dictionary H and the list of
+    time periods t and returns the sorted list of (i, j, t) departures
+    along feasible legs that arrive within the planning horizon
+    """
+    t = list(t)
+    return [
+    (i, j, tp)
+    for (i, j) in feasible_legs(H)
+    for tp in t
+    if tp + H[i, j] <= t[-1]
+    ]
+
 def cell_loc_conversion(user_input_loc):
     """
     This function takes in the excel cell number (x, A) where x is the
@@ -56,125 +135,115 @@ def cell_loc_conversion(user_input_loc):
     """
     return user_input_loc[0] - 1, ord(user_input_loc[1].lower()) - 97
         
+def cell_value(value):
+    """
+    This function takes in a cell value read in bulk from the workbook
+    and returns it as a plain python value, with whole numbers as int
+    so that keys read from excel match the sets of the model
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class ExcelWorkbook():
+    """
+    This is an object that opens the input workbook once (.xls or .xlsx)
+    and reads each sheet in bulk into a frame the first time it is needed,
+    so every set and parameter is sliced out of memory
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.stamp = None
+        self._excel = pd.ExcelFile(file_name)
+        self._sheets = {}
+
+    def sheet(self, sheet_name):
+        """
+        This function returns the whole sheet as a frame indexed by
+        0-based row and column positions
+        """
+        if sheet_name not in self._sheets:
+            self._sheets[sheet_name] = self._excel.parse(sheet_name, header = None)
+        return self._sheets[sheet_name]
+
+    def block(self, sheet_name, start_loc, end_loc, columns):
+        """
+        This function returns the rows below the header row start_loc up to
+        end_loc for the given column offsets from the start column, as a list
+        of row lists with empty cells as None
+        """
+        start_loc = cell_loc_conversion(start_loc)
+        end_loc = cell_loc_conversion(end_loc)
+        frame = self.sheet(sheet_name).reindex(
+                index = range(start_loc[0] + 1, end_loc[0] + 1),
+                columns = [start_loc[1] + col for col in columns]
+                )
+        return frame.astype(object).where(frame.notna(), None).values.tolist()
+
+    def read_set(self, sheet_name, start_loc, end_loc):
+        """
+        This function returns the set listed in the start column
+        """
+        return [
+        cell_value(row[0])
+        for row in self.block(sheet_name, start_loc, end_loc, [0])
+        if row[0] is not None
+        ]
+
+    def read_par(self, sheet_name, start_loc, end_loc, n_set):
+        """
+        This function returns the parameter whose n_set index columns start at
+        start_loc and whose values sit in the column of end_loc as a dictionary
+        (keyed by tuples when n_set > 1, empty cells read as 0)
+        """
+        value_col = cell_loc_conversion(end_loc)[1] - cell_loc_conversion(start_loc)[1]
+        rows = self.block(sheet_name, start_loc, end_loc, list(range(n_set)) + [value_col])
+
+        par_dict = {}
+        for row in rows:
+            if all(cell is None for cell in row[:n_set]):
+                continue
+            key = tuple(cell_value(cell) for cell in row[:n_set])
+            par_dict[key[0] if n_set == 1 else key] = 0 if row[-1] is None else cell_value(row[-1])
+        return par_dict
+
 def result_data_load(optimisation_model, var_list):
     """
     This function takes the model and the list of variables
-    and return the solutions as a dictionary
+    and return the nonzero values of the solution as a dictionary
     """
     result_data = {}
     for i in var_list:
         var_obj = getattr(optimisation_model, i)
-        result_data[i] = {}
-        for k in var_obj.keys():
-            result_data[i][k] = var_obj[k].value
+        result_data[i] = {k: val for k, val in var_obj.extract_values().items() if val}
     return result_data
 
+def open_workbook(file_name):
+    """
+    This function takes in the excel file name and returns the
+    ExcelWorkbook object for it, opening the file only once for as long
+    as it is unchanged on disk
+    """
+    stamp = os.stat(file_name).st_mtime_ns
+    workbook = _workbook_cache.get(file_name)
+    if workbook is None or workbook.stamp != stamp:
+        workbook = ExcelWorkbook(file_name)
+        workbook.stamp = stamp
+        _workbook_cache[file_name] = workbook
+    return workbook
+
 def read_set_from_excel(file_name, sheet_name, start_loc, end_loc, n_set):
     """
     This function takes in the excel and the sheet_name + the location
     of the set to be retrieved and returns the dictionary that can be 
     used for the optimisation model
     """
-    start_loc = cell_loc_conversion(start_loc)
-    end_loc = cell_loc_conversion(end_loc)
-    
-    for sheet in xlrd.open_workbook(file_name).sheets():
-        if sheet.name == sheet_name:
-            set_list = [
-            sheet.cell(row, start_loc[1]).value
-            for row in range(start_loc[0] + 1, end_loc[0] + 1)
-            ]
-
-    return set_list            
-            
+    return open_workbook(file_name).read_set(sheet_name, start_loc, end_loc)
+
 def read_par_from_excel(file_name, sheet_name, start_loc, end_loc, n_set):
     """
     This function takes in the excel and the sheet_name + the location
     of the parameter to be retrieved and the paramter dimention
     and returns the dictionary that can be used for the optimisation model
     """
-    start_loc = cell_loc_conversion(start_loc)
-    end_loc = cell_loc_conversion(end_loc)
-
-    if n_set == 1:
-        for sheet in xlrd.open_workbook(file_name).sheets():
-            if sheet.name == sheet_name:
-                dic_keys = [
-                sheet.cell(row, start_loc[1]).value
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-                dic_values = [
-                sheet.cell(row, end_loc[1]).value
-                if sheet.cell_type(row, col) != xlrd.XL_CELL_EMPTY else 0
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-                
-    elif n_set == 2:
-        for sheet in xlrd.open_workbook(file_name).sheets():
-            if sheet.name == sheet_name:
-                dic_keys = [
-                (sheet.cell(row, start_loc[1]).value,
-                sheet.cell(row, start_loc[1] + 1).value)
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-                dic_values = [
-                sheet.cell(row, end_loc[1]).value
-                if sheet.cell_type(row, col) != xlrd.XL_CELL_EMPTY else 0
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-    
-    elif n_set == 3:
-        for sheet in xlrd.open_workbook(file_name).sheets():
-            if sheet.name == sheet_name:
-                dic_keys = [
-                (sheet.cell(row, start_loc[1]).value,
-                sheet.cell(row, start_loc[1] + 1).value,
-                sheet.cell(row, start_loc[1] + 2).value)
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-                dic_values = [
-                sheet.cell(row, end_loc[1]).value
-                if sheet.cell_type(row, col) != xlrd.XL_CELL_EMPTY else 0
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-    elif n_set == 4:
-        for sheet in xlrd.open_workbook(file_name).sheets():
-            if sheet.name == sheet_name:
-                dic_keys = [
-                (sheet.cell(row, start_loc[1]).value,
-                sheet.cell(row, start_loc[1] + 1).value,
-                sheet.cell(row, start_loc[1] + 2).value,
-                sheet.cell(row, start_loc[1] + 3).value)
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-                dic_values = [
-                sheet.cell(row, end_loc[1]).value
-                if sheet.cell_type(row, col) != xlrd.XL_CELL_EMPTY else 0
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-    elif n_set == 5:
-        for sheet in xlrd.open_workbook(file_name).sheets():
-            if sheet.name == sheet_name:
-                dic_keys = [
-                (sheet.cell(row, start_loc[1]).value,
-                sheet.cell(row, start_loc[1] + 1).value,
-                sheet.cell(row, start_loc[1] + 2).value,
-                sheet.cell(row, start_loc[1] + 3).value,
-                sheet.cell(row, start_loc[1] + 4).value)
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-
-                dic_values = [
-                sheet.cell(row, end_loc[1]).value
-                if sheet.cell_type(row, col) != xlrd.XL_CELL_EMPTY else 0
-                for row in range(start_loc[0] + 1, end_loc[0] + 1)
-                ]
-                
-    par_dict = dict(zip(dic_keys, dic_values))
-    return par_dict
+    return open_workbook(file_name).read_par(sheet_name, start_loc, end_loc, n_set)
@@ -0,0 +1,239 @@
+###############################################
+# This documents contains the scaling #########
+# benchmark: synthetic instances of growing ###
+# size run through the load, build and solve ##
+# pipeline, each in a fresh process, and ######
+# compared against the stored baseline. #######
+
+# Import nccessary packages
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import Input_Cache as fcache
+import Instance_Generator as fgen
+import Main
+import Sparse_Builder as fsparse
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# generator arguments of every benchmark instance, smallest first
+BENCHMARK_SIZES = {
+    'n4_t49': dict(n_nodes = 4, n_legs = 8, horizon = 49, seed = 1),
+    'n6_t97': dict(n_nodes = 6, n_legs = 14, n_customers = 2, n_origins = 2, n_destinations = 1,
+                   horizon = 97, seed = 2),
+    'n12_t97': dict(n_nodes = 12, n_legs = 30, n_customers = 3, n_origins = 3, n_destinations = 3,
+                    horizon = 97, seed = 3),
+    }
+
+# figures that must match the baseline exactly: a change means the formulation changed
+COUNT_KEYS = ('variables', 'constraints', 'nonzeros', 'supply_entries')
+
+# figures compared with a tolerance, as a ratio of the baseline
+TIME_KEYS = ('load_time', 'build_time', 'pyomo_build_time', 'lp_write_time', 'solve_time')
+
+
+def _finite(value):
+    return float(value) if np.isfinite(value) else None
+
+def measure_instance(name, size, pyomo = True, solve = True, time_limit = 10):
+    """
+    This function generates the instance, loads it back through the
+    compiled input cache, builds the sparse (and with pyomo the Pyomo)
+    model, times writing the Pyomo model as the LP file the solver reads,
+    solves it with HiGHS under time_limit and returns the row of figures,
+    with the peak resident memory of the process in MB. Meant to run in a
+    process of its own, so the peak belongs to this instance
+    """
+    set_input, fixed_par, var_par = fgen.generate_instance(**size)
+    with tempfile.TemporaryDirectory() as folder:
+        cache_file = os.path.join(folder, name + '.rso.npz')
+        fcache.compile_input_cache(cache_file, name, set_input, fixed_par, var_par)
+        begin = time.perf_counter()
+        set_input, fixed_par, var_par = fcache.load_input_cache(cache_file, name)
+        load_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par)
+    build_time = time.perf_counter() - begin
+
+    row = {
+    'instance': name,
+    'variables': int(sparse_model.n_col),
+    'constraints': int(sparse_model.n_row),
+    'nonzeros': int(sparse_model.A.nnz),
+    'supply_entries': len(var_par.S),
+    'load_time': load_time,
+    'build_time': build_time,
+    }
+
+    if pyomo:
+        begin = time.perf_counter()
+        model = Main.build_model(set_input, fixed_par, var_par)
+        row['pyomo_build_time'] = time.perf_counter() - begin
+
+        # the LP file the solver interface writes inside Main.main's solve phase
+        with tempfile.TemporaryDirectory() as folder:
+            begin = time.perf_counter()
+            model.write(os.path.join(folder, name + '.lp'), io_options = {'symbolic_solver_labels': True})
+            row['lp_write_time'] = time.perf_counter() - begin
+
+    if solve:
+        solution = fsparse.solve_highs(sparse_model, time_limit = time_limit, threads = 1)
+        row['status'] = solution.status
+        row['objective'] = _finite(solution.objective)
+        row['gap'] = _finite(solution.gap)
+        row['solve_time'] = solution.runtime
+
+    row['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return row
+
+def run_benchmark(sizes = None, pyomo = True, solve = True, time_limit = 10):
+    """
+    This function measures every instance of sizes (BENCHMARK_SIZES by
+    default) in a fresh process, one after the other, and returns the rows
+    """
+    sizes = BENCHMARK_SIZES if sizes is None else sizes
+    rows = []
+    for name, size in sizes.items():
+        with concurrent.futures.ProcessPoolExecutor(
+             max_workers = 1, mp_context = multiprocessing.get_context('spawn')) as pool:
+            rows.append(pool.submit(measure_instance, name, size, pyomo, solve, time_limit).result())
+    return rows
+
+def measure_formulation(name, size, strengthened, time_limit = 60, target_gap = 0.01):
+    """
+    This function generates the instance, builds the base or (with
+    strengthened) the strengthened formulation, and returns its row of
+    figures: the LP bound, the branch-and-bound nodes HiGHS explores and
+    the time to reach target_gap (each None when time_limit runs out
+    first)
+    """
+    set_input, fixed_par, var_par = fgen.generate_instance(**size)
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par, strengthened = strengthened)
+    relaxation = fsparse.solve_highs(sparse_model, time_limit, threads = 1, relax = True)
+
+    highs = fsparse.highs_instance(sparse_model, time_limit, target_gap, threads = 1)
+    solution = fsparse.run_highs(highs, sparse_model)
+    reached = np.isfinite(solution.gap) and solution.gap <= target_gap
+    return {
+    'instance': name,
+    'formulation': 'strengthened' if strengthened else 'base',
+    'constraints': int(sparse_model.n_row),
+    'nonzeros': int(sparse_model.A.nnz),
+    'lp_bound': _finite(relaxation.objective) if relaxation.status == 'Optimal' else None,
+    'objective': _finite(solution.objective),
+    'gap': _finite(solution.gap),
+    'nodes': int(highs.getInfo().mip_node_count),
+    'time_to_target': solution.runtime if reached else None,
+    }
+
+def compare_formulations(sizes = None, time_limit = 60, target_gap = 0.01):
+    """
+    This function measures the base and the strengthened formulation on
+    every instance of sizes (BENCHMARK_SIZES by default), each run in a
+    fresh process, and returns the rows
+    """
+    sizes = BENCHMARK_SIZES if sizes is None else sizes
+    rows = []
+    for name, size in sizes.items():
+        for strengthened in (False, True):
+            with concurrent.futures.ProcessPoolExecutor(
+                 max_workers = 1, mp_context = multiprocessing.get_context('spawn')) as pool:
+                rows.append(pool.submit(measure_formulation, name, size, strengthened,
+                                        time_limit, target_gap).result())
+    return rows
+
+def load_baseline(file_name = BASELINE_FILE):
+    """
+    This function returns the stored baseline rows keyed by instance
+    """
+    with open(file_name) as handle:
+        return {row['instance']: row for row in json.load(handle)}
+
+def save_baseline(rows, file_name = BASELINE_FILE):
+    """
+    This function stores the rows as the new baseline
+    """
+    with open(file_name, 'w') as handle:
+        json.dump(rows, handle, indent = 2)
+
+def compare_to_baseline(rows, baseline, time_tolerance = 1.5, memory_tolerance = 1.25,
+                        gap_tolerance = 0.01, min_time = 0.05):
+    """
+    This function compares the rows with the baseline and returns the
+    findings as lines: changed model sizes, times above time_tolerance
+    times the baseline (ignoring differences under min_time seconds),
+    peak memory above memory_tolerance times the baseline and gaps more
+    than gap_tolerance above it. An empty list means no regression
+    """
+    findings = []
+    for row in rows:
+        name = row['instance']
+        if name not in baseline:
+            findings.append('%s: not in the baseline' % name)
+            continue
+        base = baseline[name]
+        for key in COUNT_KEYS:
+            if key in base and row.get(key) != base[key]:
+                findings.append('%s: %s changed from %s to %s' % (name, key, base[key], row.get(key)))
+        for key in TIME_KEYS:
+            if key in base and key in row \
+               and row[key] > time_tolerance * base[key] and row[key] - base[key] > min_time:
+                findings.append('%s: %s rose from %.3fs to %.3fs' % (name, key, base[key], row[key]))
+        if 'peak_rss_mb' in base and row['peak_rss_mb'] > memory_tolerance * base['peak_rss_mb']:
+            findings.append('%s: peak memory rose from %.0fMB to %.0fMB'
+                            % (name, base['peak_rss_mb'], row['peak_rss_mb']))
+        if base.get('gap') is not None and row.get('gap', 0) is not None \
+           and row.get('gap', 0) > base['gap'] + gap_tolerance:
+            findings.append('%s: gap rose from %.4f to %.4f' % (name, base['gap'], row['gap']))
+        elif base.get('gap') is not None and 'gap' in row and row['gap'] is None:
+            findings.append('%s: no solution found within the time limit' % name)
+    return findings
+
+def main(update = False):
+    """
+    This is the main function of the benchmark: it runs the suite, prints
+    one line per instance and either compares the run with the stored
+    baseline (returning the findings) or, with update, stores it as the
+    new baseline
+    """
+    rows = run_benchmark()
+    for row in rows:
+        print('%(instance)s: %(variables)d variables, %(constraints)d constraints, %(nonzeros)d nonzeros, '
+              'load %(load_time).3fs, build %(build_time).3fs, peak %(peak_rss_mb).0fMB' % row)
+
+    if update or not os.path.exists(BASELINE_FILE):
+        save_baseline(rows)
+        return []
+
+    findings = compare_to_baseline(rows, load_baseline())
+    print('\n'.join(findings) if findings else 'no regression against the baseline')
+    return findings
+
+def main_formulations(time_limit = 60, target_gap = 0.01):
+    """
+    This is the main function of the formulation comparison: it prints
+    the LP bound, nodes and time to target_gap of the base and the
+    strengthened formulation on every benchmark instance
+    """
+    rows = compare_formulations(time_limit = time_limit, target_gap = target_gap)
+    for row in rows:
+        target = '%.2fs' % row['time_to_target'] if row['time_to_target'] is not None else 'not reached'
+        print('%-8s %-12s %7d rows, LP bound %10s, objective %10s, %6d nodes, to %.0f%% gap: %s'
+              % (row['instance'], row['formulation'], row['constraints'], row['lp_bound'],
+                 row['objective'], row['nodes'], 100 * target_gap, target))
+    return rows
+
+if __name__ == '__main__':
+    if 'formulations' in sys.argv[1:]:
+        main_formulations()
+        sys.exit(0)
+    sys.exit(1 if main(update = 'update' in sys.argv[1:]) else 0)
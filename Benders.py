@@ -0,0 +1,286 @@
+###############################################
+# This documents contains the Benders #########
+# decomposition: a master problem choosing ####
+# the services (x, M) over a continuous #######
+# copy of the routing, and an integer #########
+# subproblem routing wagons and containers ####
+# over the chosen services, which returns #####
+# optimality and feasibility cuts. ############
+
+# Import nccessary packages
+import time
+
+import highspy
+import numpy as np
+import scipy.sparse as sp
+
+import Sparse_Builder as fsparse
+
+
+class ArrayProblem():
+    """
+    This is an object that holds a problem as the arrays highs_instance
+    reads from a SparseModel
+    """
+    def __init__(self, c, col_lower, col_upper, integrality, A, row_lower, row_upper):
+        self.c = c
+        self.col_lower = col_lower
+        self.col_upper = col_upper
+        self.integrality = integrality
+        self.A = A.tocsr()
+        self.row_lower = row_lower
+        self.row_upper = row_upper
+        self.n_row, self.n_col = self.A.shape
+
+class BendersDecomposition():
+    """
+    This is an object that splits the SparseModel into a master problem
+    and a routing subproblem. The master keeps the locomotive columns x
+    and M integer, holds the wagon and container columns as a continuous
+    relaxation and prices the routing through a column eta, bounded below
+    by the relaxed routing cost and by the cuts. The subproblem fixes the
+    services x of the master and solves the integer routing of wagons and
+    containers over them (only transportation_constraint links both). A
+    feasible routing gives an upper bound and an optimality cut on eta:
+    the Benders cut of the row duals of the relaxed routing, strengthened
+    by a Lagrangian solve of the integer routing and lifted by the
+    integrality gap left at those services as the integer L-shaped cut
+    is; an infeasible one a no-good feasibility cut on those services.
+    Branch-and-bound in the master thus never branches on the flow
+    blocks, and the master bound is a proven lower bound
+    """
+    def __init__(self, sparse_model, threads = None, tee = False):
+        self.sparse_model = sparse_model
+        self.tee = tee
+        columns = sparse_model.columns
+        master = np.zeros(sparse_model.n_col, dtype = bool)
+        for name in ('x', 'M'):
+            master[columns[name].offset:columns[name].offset + columns[name].space.size] = True
+        self.master_cols = np.flatnonzero(master)
+        self.sub_cols = np.flatnonzero(~master)
+        self.x_cols = np.arange(columns['x'].offset, columns['x'].offset + columns['x'].space.size)
+        self.eta = sparse_model.n_col
+
+        # master: every column, the routing continuous, plus eta >= routing cost
+        c_route = np.where(master, 0.0, sparse_model.c)
+        integrality = np.where(master, sparse_model.integrality, 0).astype(np.int32)
+        self.master = fsparse.highs_instance(ArrayProblem(
+                      np.append(np.where(master, sparse_model.c, 0.0), 1.0),
+                      np.append(sparse_model.col_lower, 0.0),
+                      np.append(sparse_model.col_upper, np.inf),
+                      np.append(integrality, 0).astype(np.int32),
+                      sp.vstack([
+                      sp.hstack([sparse_model.A, sp.csr_matrix((sparse_model.n_row, 1))]),
+                      sp.csr_matrix(np.append(-c_route, 1.0)[None, :])
+                      ]),
+                      np.append(sparse_model.row_lower, 0.0), np.append(sparse_model.row_upper, np.inf)
+                      ), threads = threads, tee = tee)
+
+        # subproblem: the rows with routing columns, bounds shifted by the services
+        A = sparse_model.A.tocsc()
+        sub_rows = np.flatnonzero(abs(A[:, self.sub_cols]) @ np.ones(len(self.sub_cols)) > 0)
+        A_rows = sparse_model.A[sub_rows]
+        self.B = A_rows[:, self.master_cols].tocsr()
+        self.sub_lower = sparse_model.row_lower[sub_rows]
+        self.sub_upper = sparse_model.row_upper[sub_rows]
+        self.sub_rows = np.arange(len(sub_rows), dtype = np.int32)
+        self.sub = fsparse.highs_instance(ArrayProblem(
+                   sparse_model.c[self.sub_cols], np.zeros(len(self.sub_cols)),
+                   sparse_model.col_upper[self.sub_cols], sparse_model.integrality[self.sub_cols],
+                   A_rows[:, self.sub_cols], self.sub_lower, self.sub_upper
+                   ), threads = threads)
+
+        # relaxed subproblem, whose row duals give the Benders cuts
+        self.sub_lp = fsparse.highs_instance(ArrayProblem(
+                      sparse_model.c[self.sub_cols], np.zeros(len(self.sub_cols)),
+                      sparse_model.col_upper[self.sub_cols], np.zeros(len(self.sub_cols), dtype = np.int32),
+                      A_rows[:, self.sub_cols], self.sub_lower, self.sub_upper
+                      ), threads = threads)
+
+        # Lagrangian subproblem: the integer routing with free copies of the
+        # master columns linked to it (the services), priced by the cut
+        self.link = np.flatnonzero(abs(self.B).sum(axis = 0).A1 > 0)
+        lagrangian_cols = np.append(self.master_cols[self.link], self.sub_cols)
+        self.lagrangian = fsparse.highs_instance(ArrayProblem(
+                          sparse_model.c[lagrangian_cols], sparse_model.col_lower[lagrangian_cols],
+                          sparse_model.col_upper[lagrangian_cols], sparse_model.integrality[lagrangian_cols],
+                          A_rows[:, lagrangian_cols], self.sub_lower, self.sub_upper
+                          ), threads = threads)
+
+    def solve_subproblem(self, master_values, time_limit = None):
+        """
+        This function fixes the services of master_values (over the master
+        columns) in the subproblem, solves the integer routing and returns
+        its status, the cost and column values of its best routing (inf and
+        None without one) and the bound on the routing cost
+        """
+        activity = self.B @ master_values
+        self.sub.changeRowsBounds(len(self.sub_rows), self.sub_rows,
+                                  np.maximum(self.sub_lower - activity, -highspy.kHighsInf),
+                                  np.minimum(self.sub_upper - activity, highspy.kHighsInf))
+        if time_limit is not None:
+            self.sub.setOptionValue('time_limit', float(time_limit))
+        self.sub.run()
+        status = self.sub.modelStatusToString(self.sub.getModelStatus())
+        info = self.sub.getInfo()
+        if status == 'Optimal':
+            return status, info.objective_function_value, np.array(self.sub.getSolution().col_value), \
+                   info.objective_function_value
+        if info.primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            return status, np.inf, None, info.mip_dual_bound
+        return status, info.objective_function_value, np.array(self.sub.getSolution().col_value), \
+               info.mip_dual_bound
+
+    def benders_cut(self, master_values, time_limit = None):
+        """
+        This function returns the Benders cut of the routing at
+        master_values as its value there and its subgradient over the
+        master columns: the routing cost at any master values m is at
+        least value + subgradient . (m - master_values). The subgradient
+        comes from the row duals of the relaxed routing (the row bounds
+        shift by -B m); the cut is then raised to the bound of the
+        Lagrangian subproblem under that subgradient, which accounts for
+        the integer wagons and containers (within time_limit, its dual
+        bound so far). None when the relaxed routing has no optimal
+        solution
+        """
+        activity = self.B @ master_values
+        self.sub_lp.changeRowsBounds(len(self.sub_rows), self.sub_rows,
+                                     np.maximum(self.sub_lower - activity, -highspy.kHighsInf),
+                                     np.minimum(self.sub_upper - activity, highspy.kHighsInf))
+        self.sub_lp.run()
+        if self.sub_lp.modelStatusToString(self.sub_lp.getModelStatus()) != 'Optimal':
+            return None
+        subgradient = -(self.B.T @ np.array(self.sub_lp.getSolution().row_dual))
+        value = self.sub_lp.getInfo().objective_function_value
+
+        # min over the integer routing and services of cost - subgradient . services
+        cost = np.append(-subgradient[self.link], self.sparse_model.c[self.sub_cols])
+        self.lagrangian.changeColsCost(len(cost), np.arange(len(cost), dtype = np.int32), cost)
+        if time_limit is not None:
+            self.lagrangian.setOptionValue('time_limit', float(time_limit))
+        self.lagrangian.run()
+        info = self.lagrangian.getInfo()
+        intercept = info.objective_function_value \
+                    if self.lagrangian.modelStatusToString(self.lagrangian.getModelStatus()) == 'Optimal' \
+                    else info.mip_dual_bound
+        if np.isfinite(intercept):
+            value = max(value, intercept + subgradient @ master_values)
+        return value, subgradient
+
+    def add_cut(self, services, cost, cut = None):
+        """
+        This function adds the cut of the services (x values): with the
+        routing cost, the integer L-shaped cut eta >= cost * (1 - number of
+        services that differ), or with cut (the value, subgradient and
+        master values of benders_cut) the Benders cut lifted by the gap
+        left at the services, eta >= Benders cut + (cost - value) *
+        (1 - number of services that differ); with cost None, the no-good
+        cut that at least one service differs
+        """
+        on = services > 0.5
+        signs = np.where(on, -1.0, 1.0)
+        n_on = int(on.sum())
+        if cost is None:
+            cols, vals, lower = self.x_cols, signs, 1 - n_on
+        elif cut is None:
+            cols, vals, lower = np.append(self.x_cols, self.eta), np.append(cost * signs, 1.0), cost * (1 - n_on)
+        else:
+            value, subgradient, master_values = cut
+            lift = max(cost - value, 0.0)
+            vals = -subgradient
+            vals[:len(self.x_cols)] += lift * signs
+            cols, vals = np.append(self.master_cols, self.eta), np.append(vals, 1.0)
+            lower = value - subgradient @ master_values + lift * (1 - n_on)
+        self.master.addRow(float(lower), highspy.kHighsInf, len(cols),
+                           np.asarray(cols, dtype = np.int32), np.asarray(vals, dtype = np.float64))
+
+    def solve(self, max_iterations = 100, time_limit = None, mip_rel_gap = 1e-4, sub_time_limit = None):
+        """
+        This function alternates master and subproblem until the gap
+        between the master bound and the best schedule closes to
+        mip_rel_gap, or max_iterations or time_limit is reached, and
+        returns the SparseSolution of the best schedule over all columns.
+        Only an infeasible routing cuts its services off; one stopped by
+        sub_time_limit keeps its best routing and is priced by its bound
+        """
+        begin = time.perf_counter()
+        model = self.sparse_model
+        best, best_values, bound = np.inf, None, -np.inf
+        status = 'Iteration limit reached'
+
+        limited = set()
+
+        for iteration in range(max_iterations):
+            if time_limit is not None:
+                left = time_limit - (time.perf_counter() - begin)
+                if left <= 0:
+                    status = 'Time limit reached'
+                    break
+                self.master.setOptionValue('time_limit', float(left))
+            self.master.run()
+            master_status = self.master.modelStatusToString(self.master.getModelStatus())
+            if master_status == 'Infeasible':
+                status = 'Infeasible' if best_values is None else 'Optimal'
+                break
+            info = self.master.getInfo()
+            if info.primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+                status = master_status
+                break
+            bound = max(bound, info.mip_dual_bound)
+            master_values = np.round(np.array(self.master.getSolution().col_value)[self.master_cols])
+            services = master_values[:len(self.x_cols)]
+
+            sub_status, cost, sub_values, sub_bound = self.solve_subproblem(master_values, sub_time_limit)
+            if sub_values is not None:
+                total = float(model.c[self.master_cols] @ master_values) + cost
+                if total < best:
+                    best = total
+                    best_values = np.zeros(model.n_col)
+                    best_values[self.master_cols] = master_values
+                    best_values[self.sub_cols] = sub_values
+            cut = None
+            if sub_status != 'Infeasible':
+                cut_time_limit = sub_time_limit
+                if time_limit is not None:
+                    left = max(0.0, time_limit - (time.perf_counter() - begin))
+                    cut_time_limit = left if cut_time_limit is None else min(cut_time_limit, left)
+                cut = self.benders_cut(master_values, cut_time_limit)
+                cut = None if cut is None else cut + (master_values,)
+            if sub_status == 'Optimal':
+                self.add_cut(services, cost, cut)
+            elif sub_status == 'Infeasible':
+                self.add_cut(services, None)
+            else:
+                # a routing cut short by sub_time_limit proves neither its cost
+                # nor its infeasibility: only its bound prices those services,
+                # and the run stops unproven once the master picks them again
+                key = services.tobytes()
+                if key in limited:
+                    status = 'Subproblem time limit reached'
+                    break
+                limited.add(key)
+                if np.isfinite(sub_bound) and sub_bound > 0:
+                    self.add_cut(services, sub_bound, cut)
+
+            gap = (best - bound) / max(abs(best), 1e-9) if np.isfinite(best) else np.inf
+            if self.tee:
+                print('iteration %d: master %s, routing %s, bound %.2f, best %.2f, gap %.4f, %.2fs'
+                      % (iteration, master_status, sub_status, bound, best, gap, time.perf_counter() - begin))
+            if gap <= mip_rel_gap:
+                status = 'Optimal'
+                break
+
+        gap = (best - bound) / max(abs(best), 1e-9) if np.isfinite(best) else np.inf
+        values = best_values if best_values is not None else np.zeros(model.n_col)
+        return fsparse.SparseSolution(model, status, best, bound, gap, time.perf_counter() - begin, values)
+
+def solve_benders(sparse_model, max_iterations = 100, time_limit = None, mip_rel_gap = 1e-4,
+                  sub_time_limit = None, threads = None, tee = False):
+    """
+    This function solves the SparseModel by Benders decomposition and
+    returns the SparseSolution of the best schedule with the proven bound
+    """
+    return BendersDecomposition(sparse_model, threads = threads, tee = tee).solve(
+           max_iterations, time_limit, mip_rel_gap, sub_time_limit
+           )
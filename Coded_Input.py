@@ -0,0 +1,334 @@
+###############################################
+# This documents contains the integer-coded ###
+# input objects: every set mapped to ##########
+# contiguous integer codes and every ##########
+# parameter stored as NumPy arrays of coded ###
+# keys and values, read like the dictionaries #
+# of Auxiliary_Functions and converted back ###
+# to them without loss. #######################
+
+# Import nccessary packages
+from collections.abc import Mapping
+
+import numpy as np
+
+import Auxiliary_Functions as faux
+import Input_Cache as fcache
+
+# parameters Parameters.parameter_initialisation gives a default of zero
+PAR_DEFAULTS = {'S': 0, 'FC': 0, 'VC': 0}
+
+# share of the cells of its key space a parameter must fill to get a dense slot table
+DENSE_FRACTION = 0.25
+
+
+class SetCodes():
+    """
+    This is an object that codes the labels of a set as the integers
+    0..size-1 in the order of the set. Labels met in parameter keys that
+    the set does not list are coded after them, so that the parameter
+    converts back without loss
+    """
+    __slots__ = ('labels', 'position', 'size')
+
+    def __init__(self, labels, size = None):
+        self.labels = list(labels)
+        self.position = {label: code for code, label in enumerate(self.labels)}
+        self.size = len(self.labels) if size is None else size
+
+    def add(self, label):
+        """
+        This function returns the code of label, coding it after the
+        labels known so far when it is new
+        """
+        code = self.position.get(label)
+        if code is None:
+            code = self.position[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def encode(self, labels):
+        """
+        This function returns the codes of labels as an array, -1 for the
+        labels never coded
+        """
+        return np.array([self.position.get(label, -1) for label in labels], dtype = np.int64)
+
+class CodedParameter(Mapping):
+    """
+    This is an object that holds a parameter dictionary as the flat
+    positions of its coded keys in the key space of its sets (sorted) and
+    the values in the same order, plus a table from flat position to
+    entry when the parameter fills at least DENSE_FRACTION of its key
+    space. It reads like the dictionary (so Pyomo's initialize= takes it
+    as is) and looks up whole arrays of coded keys at once
+    """
+    __slots__ = ('name', 'sets', 'shape', 'flat', 'vals', 'slot', 'default')
+
+    def __init__(self, name, sets, codes, values, default = None):
+        self.name = name
+        self.sets = tuple(sets)
+        self.shape = tuple(len(codes_of_set.labels) for codes_of_set in self.sets)
+        self.default = default
+        codes = np.asarray(codes, dtype = np.int64).reshape(len(values), len(self.sets))
+        flat = np.ravel_multi_index(tuple(codes.T), self.shape) if len(values) \
+               else np.empty(0, dtype = np.int64)
+        order = np.argsort(flat, kind = 'stable')
+        self.flat = flat[order]
+        self.vals = np.asarray(values)[order]
+
+        cells = int(np.prod(self.shape))
+        self.slot = None
+        if len(values) and len(values) >= DENSE_FRACTION * cells:
+            self.slot = np.full(cells, -1, dtype = np.int32 if len(values) < 2**31 else np.int64)
+            self.slot[self.flat] = np.arange(len(values))
+
+    def __len__(self):
+        return len(self.vals)
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        if len(key) != len(self.sets):
+            raise KeyError(key)
+        flat = 0
+        for label, codes_of_set, size in zip(key, self.sets, self.shape):
+            code = codes_of_set.position.get(label, size)
+            if code >= size:
+                raise KeyError(key if len(key) > 1 else key[0])
+            flat = flat * size + code
+        if self.slot is not None:
+            entry = int(self.slot[flat])
+        else:
+            entry = int(self.flat.searchsorted(flat))
+            entry = entry if entry < len(self.flat) and self.flat[entry] == flat else -1
+        if entry < 0:
+            raise KeyError(key if len(key) > 1 else key[0])
+        return self.vals[entry].item()
+
+    def items(self):
+        """
+        This function returns the (key, value) pairs, keys as in the
+        dictionary (a label for one set, a tuple of labels otherwise)
+        """
+        codes = np.unravel_index(self.flat, self.shape) if len(self.flat) else [[]] * len(self.sets)
+        columns = [
+        [codes_of_set.labels[code] for code in np.asarray(dim).tolist()]
+        for codes_of_set, dim in zip(self.sets, codes)
+        ]
+        keys = columns[0] if len(columns) == 1 else zip(*columns)
+        return list(zip(keys, self.vals.tolist()))
+
+    def to_dict(self):
+        """
+        This function returns the parameter as the dictionary it was coded from
+        """
+        return dict(self.items())
+
+    @property
+    def nbytes(self):
+        """
+        This function returns the bytes held by the arrays of the parameter
+        """
+        return self.flat.nbytes + self.vals.nbytes + (0 if self.slot is None else self.slot.nbytes)
+
+    def encode(self, dim, labels):
+        """
+        This function returns the codes of labels in the set of dimension
+        dim, -1 for the labels the parameter has no key with
+        """
+        codes = self.sets[dim].encode(labels)
+        return np.where(codes < self.shape[dim], codes, -1)
+
+    def remap(self, dim, labels):
+        """
+        This function returns, for every code of dimension dim, the
+        position of its label in labels (-1 when labels lacks it), to
+        carry the coded keys over to another ordering of the set
+        """
+        position = {label: pos for pos, label in enumerate(labels)}
+        return np.array([
+               position.get(label, -1) for label in self.sets[dim].labels[:self.shape[dim]]
+               ], dtype = np.int64)
+
+    def entries(self):
+        """
+        This function returns the codes of the keys, one array per
+        dimension, and the values, entry by entry
+        """
+        return np.unravel_index(self.flat, self.shape), self.vals
+
+    def entries_at(self, flat):
+        """
+        This function returns the entry of every flat position, -1 where
+        the parameter has no key
+        """
+        if self.slot is not None:
+            return self.slot[flat].astype(np.int64)
+        entry = np.searchsorted(self.flat, flat)
+        found = entry < len(self.flat)
+        found[found] = self.flat[entry[found]] == flat[found]
+        return np.where(found, entry, -1)
+
+    def lookup(self, codes, default = None):
+        """
+        This function takes in one array of codes per dimension (broadcast
+        together) and returns the values of those keys, default where the
+        parameter has no key (the parameter's own default when None).
+        Raises KeyError for a missing key without any default
+        """
+        default = self.default if default is None else default
+        codes = np.broadcast_arrays(*[np.asarray(code, dtype = np.int64) for code in codes])
+        inside = np.ones(codes[0].shape, dtype = bool)
+        for code, size in zip(codes, self.shape):
+            inside &= (code >= 0) & (code < size)
+        entry = np.full(codes[0].shape, -1, dtype = np.int64)
+        if inside.any():
+            flat = np.ravel_multi_index(tuple(code[inside] for code in codes), self.shape)
+            entry[inside] = self.entries_at(flat)
+        missing = entry < 0
+        if missing.any() and default is None:
+            raise KeyError('%s has no value for %d of the keys looked up' % (self.name, int(missing.sum())))
+        if len(self.vals) == 0:
+            return np.full(entry.shape, default, dtype = np.float64)
+        return np.where(missing, 0 if default is None else default, self.vals[np.maximum(entry, 0)])
+
+class CodedSetInput():
+    """
+    This is an object that initialise the input sets like
+    Auxiliary_Functions.SetInput, with the codes of every set in codes
+    """
+    __slots__ = fcache.SET_NAMES + ('a', 'at', 'codes')
+
+    def __init__(self, g, i, j, o, d, l, c, w, t, a, at, codes = None):
+        for name, labels in zip(fcache.SET_NAMES, (g, i, j, o, d, l, c, w, t)):
+            setattr(self, name, list(labels))
+        self.a = a
+        self.at = at
+        self.codes = codes or {name: SetCodes(getattr(self, name)) for name in fcache.SET_NAMES}
+
+class CodedParaFixedInput():
+    """
+    This is an object that initialise the fixed parameters like
+    Auxiliary_Functions.ParaFixedInput, each a CodedParameter
+    """
+    __slots__ = tuple(fcache.FIXED_PAR_SETS)
+
+    def __init__(self, tau, H, OL, OW, NC, NL, NW):
+        self.tau = tau
+        self.H = H
+        self.OL = OL
+        self.OW = OW
+        self.NC = NC
+        self.NL = NL
+        self.NW = NW
+
+class CodedParaVarInput():
+    """
+    This is an object that initialise the varying parameters like
+    Auxiliary_Functions.ParaVarInput, each a CodedParameter but WMAX
+    """
+    __slots__ = tuple(fcache.VAR_PAR_SETS) + ('WMAX',)
+
+    def __init__(self, FC, VC, P, WMAX, S, M_init, WS_init):
+        self.FC = FC
+        self.VC = VC
+        self.P = P
+        self.WMAX = WMAX
+        self.S = S
+        self.M_init = M_init
+        self.WS_init = WS_init
+
+def value_array(values):
+    """
+    This function returns the parameter values as an array, of integers
+    when every value is one so that they convert back as int
+    """
+    values = list(values)
+    if all(isinstance(val, (int, np.integer)) and not isinstance(val, bool) for val in values):
+        return np.array(values, dtype = np.int64)
+    return np.array(values, dtype = np.float64)
+
+def encode_parameter(name, par_dict, sets, default = None):
+    """
+    This function takes in a parameter dictionary and the SetCodes of
+    each dimension of its keys and returns it as a CodedParameter. A
+    CodedParameter is returned as is
+    """
+    if isinstance(par_dict, CodedParameter):
+        return par_dict
+    keys = [key if isinstance(key, tuple) else (key,) for key in par_dict]
+    codes = np.array([
+            [codes_of_set.add(key[dim]) for key in keys]
+            for dim, codes_of_set in enumerate(sets)
+            ], dtype = np.int64).reshape(len(sets), len(keys))
+    return CodedParameter(name, sets, codes.T, value_array(par_dict.values()), default)
+
+def encode_input(set_input, fixed_par, var_par):
+    """
+    This function takes in the input objects and returns their coded
+    counterparts, the parameters coded against the codes of the sets
+    (the parts already coded are kept)
+    """
+    if not isinstance(set_input, CodedSetInput):
+        set_input = CodedSetInput(*[getattr(set_input, name) for name in fcache.SET_NAMES + ('a', 'at')])
+
+    def coded(par, name, set_names):
+        return encode_parameter(name, getattr(par, name), [set_input.codes[set_name] for set_name in set_names],
+                                PAR_DEFAULTS.get(name))
+
+    fixed_par = CodedParaFixedInput(**{
+                name: coded(fixed_par, name, set_names) for name, set_names in fcache.FIXED_PAR_SETS.items()
+                })
+    var_par = CodedParaVarInput(WMAX = var_par.WMAX, **{
+              name: coded(var_par, name, set_names) for name, set_names in fcache.VAR_PAR_SETS.items()
+              })
+    return set_input, fixed_par, var_par
+
+def decode_parameters(fixed_par, var_par):
+    """
+    This function takes in the (coded) parameter input objects and
+    returns the Auxiliary_Functions ones, every CodedParameter converted
+    back to its dictionary, which Pyomo's initialize= reads key by key
+    fastest
+    """
+    def plain(par):
+        return par.to_dict() if isinstance(par, CodedParameter) else par
+
+    fixed = {name: plain(getattr(fixed_par, name)) for name in fcache.FIXED_PAR_SETS}
+    var = {name: plain(getattr(var_par, name)) for name in fcache.VAR_PAR_SETS}
+    return faux.ParaFixedInput(**fixed), faux.ParaVarInput(WMAX = var_par.WMAX, **var)
+
+def load_coded_input_cache(cache_file, digest):
+    """
+    This function returns the coded input objects straight from the
+    arrays of the compiled input cache, without building any dictionary,
+    or None when the cache is missing, unreadable or stale
+    """
+    data = fcache.read_input_cache(cache_file, digest)
+    if data is None:
+        return None
+    labels, sizes, arrays = data
+
+    codes = {name: SetCodes(labels[name], sizes[name]) for name in fcache.SET_NAMES}
+
+    def coded(name, set_names):
+        values = arrays[name + '_val']
+        if np.all(np.mod(values, 1) == 0):
+            values = values.astype(np.int64)
+        return CodedParameter(name, [codes[set_name] for set_name in set_names], arrays[name + '_idx'],
+                              values, PAR_DEFAULTS.get(name))
+
+    fixed_par = CodedParaFixedInput(**{name: coded(name, set_names)
+                                       for name, set_names in fcache.FIXED_PAR_SETS.items()})
+    var_par = CodedParaVarInput(WMAX = faux.cell_value(arrays['WMAX'].item()), **{
+              name: coded(name, set_names) for name, set_names in fcache.VAR_PAR_SETS.items()
+              })
+    t = labels['t'][:sizes['t']]
+    set_input = CodedSetInput(*[labels[name][:sizes[name]] for name in fcache.SET_NAMES],
+                              faux.feasible_legs(fixed_par.H), faux.feasible_departures(fixed_par.H, t),
+                              codes = codes)
+    return set_input, fixed_par, var_par
@@ -0,0 +1,209 @@
+###############################################
+# This documents contains the commodity #######
+# aggregation stage: customers sharing a ######
+# destination and deadlines are merged into ###
+# one commodity before the model is built, ####
+# and the container flows of the solution #####
+# are split back per customer afterwards. #####
+
+# Import nccessary packages
+import copy
+import time
+
+import numpy as np
+
+import Auxiliary_Functions as faux
+import Sparse_Builder as fsparse
+
+
+class AggregatedInput():
+    """
+    This is an object that holds the aggregated input objects together
+    with the group label of every original (g, d) pair (group_of) and the
+    customers behind every (label, d) pair (members)
+    """
+    def __init__(self, set_input, fixed_par, var_par, group_of, members):
+        self.set_input = set_input
+        self.fixed_par = fixed_par
+        self.var_par = var_par
+        self.group_of = group_of
+        self.members = members
+
+def commodity_groups(set_input, fixed_par):
+    """
+    This function groups the customers of every destination d by their
+    deadlines tau[g, o, d] over the origins, and returns the group label
+    of every (g, d) pair and the deadlines of every label. Customers of
+    one group with the same destination are interchangeable in every
+    constraint but container_balance and demand_tracking
+    """
+    labels, group_of = {}, {}
+    for d in set_input.d:
+        for g in set_input.g:
+            profile = tuple(fixed_par.tau.get((g, o, d)) for o in set_input.o)
+            if profile not in labels:
+                labels[profile] = 'group_%d' % (len(labels) + 1)
+            group_of[g, d] = labels[profile]
+    profiles = {label: profile for profile, label in labels.items()}
+    return group_of, profiles
+
+def aggregate_input(set_input, fixed_par, var_par):
+    """
+    This function takes in the input objects and returns the
+    AggregatedInput in which the customer set is replaced by the group
+    labels, the supply S is summed per group and tau is taken over from
+    the deadlines the group shares
+    """
+    group_of, profiles = commodity_groups(set_input, fixed_par)
+    members = {}
+    for (g, d), label in group_of.items():
+        members.setdefault((label, d), []).append(g)
+
+    g = list(profiles)
+    tau = {
+    (label, o, d): due
+    for label, profile in profiles.items()
+    for o, due in zip(set_input.o, profile) if due is not None
+    for d in set_input.d
+    }
+    S = {}
+    for (c, gx, i, d, t), val in var_par.S.items():
+        key = (c, group_of.get((gx, d), gx), i, d, t)
+        S[key] = S.get(key, 0) + val
+
+    agg_set_input = faux.SetInput(g, set_input.i, set_input.j, set_input.o, set_input.d, set_input.l,
+                                  set_input.c, set_input.w, set_input.t, set_input.a, set_input.at)
+    agg_fixed_par = copy.copy(fixed_par)
+    agg_fixed_par.tau = tau
+    agg_var_par = copy.copy(var_par)
+    agg_var_par.S = S
+    return AggregatedInput(agg_set_input, agg_fixed_par, agg_var_par, group_of, members)
+
+def split_flows(sparse_model, agg_model, aggregated, agg_CM):
+    """
+    This function splits the container flows agg_CM (aggregated
+    commodities, departures) of the aggregated model over the customers
+    of every group and returns the flows CM of the original model. Every
+    node keeps the containers of the group as batches of one customer and
+    deadline; a departure takes the batches due first (due last when
+    leaving their destination) and hands them over at its arrival
+    """
+    index, agg_index = sparse_model.index, agg_model.index
+    CM = np.zeros((index.nF, index.nK))
+    due = index.release_period()
+
+    for fa in np.flatnonzero(agg_CM.sum(axis = 1) > 0.5).tolist():
+        c, label, d = agg_index.c[agg_index.f_c[fa]], agg_index.g[agg_index.f_g[fa]], agg_index.d[agg_index.f_d[fa]]
+        group = [index.commodity(c, g, d) for g in aggregated.members.get((label, d), [])]
+        dest = int(index.d_node[index.d_pos[d]])
+
+        releases = {}
+        for s in np.flatnonzero(np.isin(index.s_f, group)).tolist():
+            releases.setdefault(int(index.s_t[s]), []).append((int(index.s_i[s]), [int(due[s]), int(index.s_f[s]), index.s_val[s]]))
+        departures = {}
+        for k in np.flatnonzero(agg_CM[fa] > 0.5).tolist():
+            departures.setdefault(int(index.dep_t[k]), []).append(k)
+
+        stock = {i: [] for i in range(index.nI)}
+        in_transit = {}
+        for t in range(index.nT):
+            for j, batch in in_transit.pop(t, []) + releases.get(t, []):
+                stock[j].append(batch)
+            for k in departures.get(t, []):
+                i, left = int(index.dep_i[k]), round(agg_CM[fa, k])
+                stock[i].sort(reverse = i == dest)
+                for batch in stock[i]:
+                    take = min(left, batch[2])
+                    if take > 0:
+                        CM[batch[1], k] += take
+                        batch[2] -= take
+                        left -= take
+                        in_transit.setdefault(int(index.arr_t[k]), []).append((int(index.dep_j[k]), [batch[0], batch[1], take]))
+                stock[i] = [batch for batch in stock[i] if batch[2] > 0]
+    return CM
+
+def disaggregate(sparse_model, agg_solution, aggregated):
+    """
+    This function maps a solution of the aggregated model to the columns
+    of the original SparseModel: x and WM are taken over, CM is split per
+    customer and the stocks follow from the flows
+    """
+    index, agg_model = sparse_model.index, agg_solution.sparse_model
+    blocks = {}
+    for name in ('x', 'WM', 'CM'):
+        family = agg_model.columns[name]
+        block = agg_solution.values[family.offset:family.offset + family.space.size]
+        blocks[name] = np.round(block).reshape(-1, agg_model.index.nK)
+
+    CM = split_flows(sparse_model, agg_model, aggregated, blocks['CM'])
+    supply = np.zeros((index.nF, index.nI, index.nT))
+    np.add.at(supply, (index.s_f, index.s_i, index.s_t), index.s_val)
+    stocks = {
+    'x': blocks['x'],
+    'M': fsparse.stocks_from_flows(index, blocks['x'], index.nL, index.M_init),
+    'WM': blocks['WM'],
+    'WS': fsparse.stocks_from_flows(index, blocks['WM'], index.nW, index.WS_init),
+    'CM': CM,
+    'CS': fsparse.stocks_from_flows(index, CM, index.nF, np.zeros((index.nF, index.nI)), supply),
+    }
+    values = np.zeros(sparse_model.n_col)
+    for name, family in sparse_model.columns.items():
+        values[family.offset:family.offset + family.space.size] = stocks[name].ravel()
+    return values
+
+def repair_container_flows(sparse_model, values, time_limit = None, threads = None):
+    """
+    This function keeps the trains and wagons of values fixed and
+    re-solves the container flows and stocks of the original model over
+    them. As only x and WM carry costs, a feasible repair keeps the
+    objective. Returns the repaired column values, or None when the
+    trains cannot carry every customer in time
+    """
+    free = np.zeros(sparse_model.n_col, dtype = bool)
+    for name in ('CM', 'CS'):
+        family = sparse_model.columns[name]
+        free[family.offset:family.offset + family.space.size] = True
+    rows = np.flatnonzero(abs(sparse_model.A) @ free.astype(np.float64) > 0)
+    restricted = fsparse.RestrictedModel(sparse_model, np.flatnonzero(free), values, rows)
+    solution = fsparse.solve_highs(restricted, time_limit, None, threads, start = values[free])
+    if solution.status != 'Optimal':
+        return None
+    repaired = restricted.expand(solution.values)
+    repaired[free] = np.round(repaired[free])
+    return repaired
+
+def solve_aggregated(set_input, fixed_par, var_par, time_limit = None, mip_rel_gap = None,
+                     threads = None, tee = False):
+    """
+    This function takes in the input objects, solves the model with the
+    equivalent customers merged and returns a SparseSolution of the
+    original model with the container flows split back per customer.
+    Customers of one group released at different origins are not fully
+    interchangeable (their containers sit at different nodes), so the
+    aggregated model is a relaxation with a valid bound; when the split
+    misses a customer deadline the container flows are repaired over the
+    same trains, and the original model is solved only if that fails
+    """
+    begin = time.perf_counter()
+    aggregated = aggregate_input(set_input, fixed_par, var_par)
+    agg_model = fsparse.build_sparse_model(aggregated.set_input, aggregated.fixed_par, aggregated.var_par)
+    agg_solution = fsparse.solve_highs(agg_model, time_limit, mip_rel_gap, threads, tee)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par)
+    if len(agg_solution.values) != agg_model.n_col or not np.isfinite(agg_solution.objective):
+        return fsparse.SparseSolution(sparse_model, agg_solution.status, agg_solution.objective,
+                                      agg_solution.bound, agg_solution.gap,
+                                      time.perf_counter() - begin, np.zeros(sparse_model.n_col))
+
+    values = disaggregate(sparse_model, agg_solution, aggregated)
+    if len(sparse_model.violated_rows(values)) > 0:
+        repaired = repair_container_flows(sparse_model, values, time_limit, threads)
+        if repaired is None:
+            solution = fsparse.solve_highs(sparse_model, time_limit, mip_rel_gap, threads, tee)
+            solution.runtime = time.perf_counter() - begin
+            return solution
+        values = repaired
+
+    return fsparse.SparseSolution(sparse_model, agg_solution.status, float(sparse_model.c @ values),
+                                  agg_solution.bound, agg_solution.gap,
+                                  time.perf_counter() - begin, values)
@@ -1,19 +1,69 @@
 import pyomo.environ as pyo
 
-def constraint_definition(model):
+import Auxiliary_Functions as faux
+import Instrumentation as finst
+
+def existing(var, keys):
+    """
+    This function takes in an indexed variable and candidate index keys
+    and returns the variables of the keys it has: the container variables
+    of a model built over the reachable sets leave the others out, and
+    they count as zero
+    """
+    return [var[key] for key in keys if key in var]
+
+def container_rows(model, network):
+    """
+    This function takes in the model object and its time-expanded network
+    and returns the index keys of the container_balance rows and of the
+    demand_tracking rows, in set order. Over the full index sets these
+    are every commodity-node-period and commodity-period; over the
+    reachable sets cm and cs only the rows holding some variable
+    """
+    tsetlist = list(model.t)
+    if not hasattr(model, 'cm'):
+        return list(model.c * model.g * model.d * model.i * model.t), list(model.c * model.g * model.d * model.t)
+
+    next_period = dict(zip(tsetlist[:-1], tsetlist[1:]))
+    arrival = {dep: tp for (_, tp), deps in network.inbound.items() for dep in deps}
+    rows = set()
+    for (c, g, d, i, t) in model.cs:
+        rows.add((c, g, d, i, t))
+        if t in next_period:
+            rows.add((c, g, d, i, next_period[t]))
+    for (c, g, d, i, j, t) in model.cm:
+        rows.add((c, g, d, i, t))
+        rows.add((c, g, d, j, arrival[i, j, t]))
+
+    position = {name: {label: pos for pos, label in enumerate(getattr(model, name))} for name in 'cgdit'}
+    balance_rows = sorted(rows, key = lambda key: tuple(position[name][label] for name, label in zip('cgdit', key)))
+    demand_rows = [(c, g, d, t) for (c, g, d, i, t) in model.cs if i == d]
+    return balance_rows, demand_rows
+
+def constraint_definition(model, profiler = None):
     """
     This function takes in the model object and initialise
-    user-defined constraints
+    user-defined constraints. With a profiler, the objective and every
+    constraint component are measured as phases of their own
     """
     tsetlist = list(model.t)
+    previous_period = dict(zip(tsetlist[1:], tsetlist[:-1]))
+
+    # inbound and outbound departures of every node-period
+    with finst.phase(profiler, 'time_expanded_network'):
+        network = faux.TimeExpandedNetwork(model.i, tsetlist, model.at, model.H)
+        windows = faux.preparation_windows(
+                  tsetlist, model.i, {i: pyo.value(model.P[i]) for i in model.i}, network.outbound
+                  )
+        balance_rows, demand_rows = container_rows(model, network)
 
     def objective_rule(model):
         """
         This constraint defines the objective function
         """
         return \
-          sum (model.VC[w, i, j] * model.WM[w, i, j, t] for t in model.t for w in model.w for i in model.i for j in model.j)\
-        + sum (model.FC[l, i, j] * model.x[l, i, j, t] for t in model.t for l in model.l for i in model.i for j in model.j)
+          sum (model.VC[w, i, j] * model.WM[w, i, j, t] for w in model.w for (i, j, t) in model.at)\
+        + sum (model.FC[l, i, j] * model.x[l, i, j, t] for l in model.l for (i, j, t) in model.at)
 
 
     def locomotive_balance(model, l, i, t):
@@ -21,20 +71,15 @@ def constraint_definition(model):
         This constraint defines the loco balance around a given node i.
         ix refers to i' from formulation
         """
-        if t <= 1
-        return \
-        model.M[l, i, t] = model.M_init[l, i]
-        
-        elseif t <= model.H[ix,i]
-        return \
-        model.M[l, i, t] = model.M[l, i, t-1] \
-                           - sum (model.x[l, i, ix, t] for ix in model.i if ix != i)
-    
-        else
+        if t == tsetlist[0]:
+            previous = model.M_init[l, i]
+        else:
+            previous = model.M[l, i, previous_period[t]]
+
         return \
-        model.M[l, i, t] = model.M[l, i, t-1] \
-                           - sum (model.x[l, i, ix, t] for ix in model.i if ix != i) \
-                           + sum (model.x[l, ix, i, t-model.H[ix,i]] for ix in model.i if ix != i)
+        model.M[l, i, t] == previous \
+                           - sum (model.x[l, i, ix, t] for (_, ix, _) in network.outbound[i, t]) \
+                           + sum (model.x[l, ix, i, tp] for (ix, _, tp) in network.inbound[i, t])
 
 
     def wagon_balance(model, w, i, t):
@@ -42,95 +87,86 @@ def constraint_definition(model):
         This constraint defines the wagon balance around a given node i.
         ix refers to i' from formulation
         """
-        if t <= 1
-        return \
-        model.WS[w, i, t] = model.WS_init[w, i]
-    
-        elseif t <= model.H[ix,i]
-        return \
-        model.WS[w, i, t] = model.WS[w, i, t-1] \
-                           - sum (model.WM[w, i, ix, t] for ix in model.i if ix != i)
-    
-        else
+        if t == tsetlist[0]:
+            previous = model.WS_init[w, i]
+        else:
+            previous = model.WS[w, i, previous_period[t]]
+
         return \
-        model.WS[w, i, t] = model.WS[w, i, t-1] \
-                           - sum (model.WM[w, i, ix, t] for ix in model.i if ix != i) \
-                           + sum (model.WM[w, ix, i, t-model.H[ix,i]] for ix in model.i if ix != i)
+        model.WS[w, i, t] == previous \
+                           - sum (model.WM[w, i, ix, t] for (_, ix, _) in network.outbound[i, t]) \
+                           + sum (model.WM[w, ix, i, tp] for (ix, _, tp) in network.inbound[i, t])
 
-    def container_balance(model, c, i, t):
+    def container_balance(model, c, g, d, i, t):
         """
         This constraint defines the container balance around a given node i.
         ix refers to i' from formulation
         """
-        if t <= 1
-        return \
-        sum (model.CS[c, g, d, i, t] for g in model.g for d in model.d) \
-        = sum (model.S[c, g, i, d, t] for g in model.g for d in model.d)
+        if t == tsetlist[0]:
+            previous = []
+        else:
+            previous = existing(model.CS, [(c, g, d, i, previous_period[t])])
 
-        elseif t <= model.H[ix,i]
-        return \
-        sum (model.CS[c, g, d, i, t] for g in model.g for o in model.d) \
-        = sum (model.CS[c, g, d, i, t-1] for g in model.g for o in model.d) \
-        + sum (model.S[c, g, i, d, t] for g in model.g for d in model.d) \
-        - sum (model.CM[c, g, d, i, ix, t] for ix in model.i if ix != i for g in model.g for d in model.d)       
-    
-        else
         return \
-        sum (model.CS[c, g, d, i, t] for g in model.g for d in model.d) \
-        = sum (model.CS[c, g, d, i, t-1] for g in model.g for d in model.d) \
-        + sum (model.S[c, g, i, d, t] for g in model.g for d in model.d) \
-        - sum (model.CM[c, g, d, i, ix, t] for ix in model.i if ix != i for g in model.g for d in model.d) \
-        + sum (model.CM[c, g, d, ix, i, t-model.H[ix,i]] for ix in model.i if ix != i for g in model.g for d in model.d)
+        sum (existing(model.CS, [(c, g, d, i, t)])) == sum (previous) \
+        + model.S[c, g, i, d, t] \
+        - sum (existing(model.CM, ((c, g, d, i, ix, t) for (_, ix, _) in network.outbound[i, t]))) \
+        + sum (existing(model.CM, ((c, g, d, ix, i, tp) for (ix, _, tp) in network.inbound[i, t])))
 
     def close_the_loop_1(model, l, i):
         """
         This constraint ensures all locos are at their original locations upon completion of a delivery cycle.
         Distribution does not have to be accurate at ID level; as long as locos are of same class, it is operationally okay.
         """
-        if t1 = tsetlist[0] and t2 = tsetlist[-1]
         return \
-        model.M[l, i, t1] = model.M[l, i, t2]
+        model.M[l, i, tsetlist[0]] == model.M[l, i, tsetlist[-1]]
 
     def close_the_loop_2(model, w, i):
         """
         This constraint ensures all wagons are at their original locations upon completion of a delivery cycle.
         Distribution does not have to be accurate at ID level; as long as wagons are of same class, it is operationally okay.
         """
-        if t1 = tsetlist[0] and t2 = tsetlist[-1]
         return \
-        model.WS[w, i, t1] = model.WS[w, i, t2]
+        model.WS[w, i, tsetlist[0]] == model.WS[w, i, tsetlist[-1]]
 
     def operational_limit_1(model, w, t):
         """
         This constraint ensures the total number of wagons in the network does not exceed the number of wagons owned at all times.
         """
         return \
-        sum (model.WM[w, i, j, t] for i in model.i for j in model.j) \
-        + sum (model.WS[w, i, t] for i in model.i)
-        = model.OW[w]
-        
+        sum (model.WM[w, i, j, t] for (i, j, _) in network.departures[t]) \
+        + sum (model.WS[w, i, t] for i in model.i) \
+        <= model.OW[w]
+
     def operational_limit_2(model, l, t):
         """
         This constraint ensures the total number of locos in the network does not exceed the number of locos owned at all times.
         """
         return \
-        sum (model.x[l, i, j, t] for i in model.i for j in model.j) \
+        sum (model.x[l, i, j, t] for (i, j, _) in network.departures[t]) \
         + sum (model.M[l, i, t] for i in model.i) \
-        = model.OL[l]
-    
+        <= model.OL[l]
+
     def service_limit(model, i, t):
         """
         This constraint ensures no more than one train is leaving each node at time t
         """
+        departures = [model.x[l, i, j, t] for l in model.l for (_, j, _) in network.outbound[i, t]]
+        if not departures:
+            return pyo.Constraint.Skip
         return \
-        sum (model.x[l, i, j, t] for l in model.l for j in model.j) <= 1
+        sum (departures) <= 1
 
     def storage_limit_1(model, i, t):
         """
-        This constraint ensures each node only holds containers up to its storage limit
+        This constraint ensures each node only holds containers up to its storage limit.
+        Containers delivered at their destination are handed over and no longer occupy storage.
         """
+        stored = existing(model.CS, ((c, g, d, i, t) for c in model.c for g in model.g for d in model.d if d != i))
+        if not stored:
+            return pyo.Constraint.Skip
         return \
-        sum (model.CS[c, g, d, i, t] for c in model.c for g in model.g for d in model.d) <= model.NC[i]
+        sum (stored) <= model.NC[i]
 
     def storage_limit_2(model, i, t):
         """
@@ -138,7 +174,7 @@ def constraint_definition(model):
         """
         return \
         sum (model.M[l, i, t] for l in model.l) <= model.NL[i]
-        
+
     def storage_limit_3(model, i, t):
         """
         This constraint ensures each node only holds wagons up to its storage limit
@@ -146,128 +182,290 @@ def constraint_definition(model):
         return \
         sum (model.WS[w, i, t] for w in model.w) <= model.NW[i]
 
-    def demand_tracking(model, c, g, d):
+    def demand_tracking(model, c, g, d, t):
         """
-        This constraint ensures all container deliveries are made in time
+        This constraint ensures all container deliveries are made in time: by period t the destination
+        has received every container whose deadline tau has passed, and by the end of the horizon all of them
         """
-        if tf = tsetlist[-1]
+        def due(i, tp):
+            if t == tsetlist[-1] or i == d:
+                return tp <= t
+            if i in model.o:
+                return tp + model.tau[g, i, d] <= t
+            return False
+
         return \
-        sum (model.S[c, g, i, d, t] for i in model.i for t in model.t) = sum (model.CS[c, g, d, i, t] for i in model.i if i == d for t in model.t)
-    
-     def transportation_constraint(model, i, j, t):
+        sum (model.S[c, g, i, d, tp] for i in model.i for tp in model.t if due(i, tp)) \
+        <= model.CS[c, g, d, d, t]
+
+    def transportation_constraint(model, i, j, t):
         """
         This constraint restricts the maximum number of wagons on each service to WMAX
         """
         return \
         sum (model.x[l, i, j, t] * model.WMAX for l in model.l) >= sum (model.WM[w, i, j, t] for w in model.w)
 
-     def wagon_mix_1(model, i, j, t):
+    def wagon_mix_1(model, i, j, t):
         """
         This constraint defines the mix of wagon types constituting each service (1)
         """
         return \
-        model.WM["60", i, j, t] + model.WM["40", i, j, t] >= \
-        sum (model.CM["40", g, d, i, j, t] for g in model.g for d in model.d)
-    
-     def wagon_mix_2(model, i, j, t):
+        model.WM["60ft", i, j, t] + model.WM["40ft", i, j, t] >= \
+        sum (existing(model.CM, (("40ft", g, d, i, j, t) for g in model.g for d in model.d)))
+
+    def wagon_mix_2(model, i, j, t):
         """
         This constraint defines the mix of wagon types constituting each service (2)
         """
         return \
-        3 * model.WM["60", i, j, t] \
-        - 2 * sum (model.CM["40", g, d, i, j, t] for g in model.g for d in model.d) >= \
-        sum (model.CM["20", g, d, i, j, t] for g in model.g for d in model.d)   
-    
-     def min_prep_time(model, i, t):
+        3 * model.WM["60ft", i, j, t] \
+        - 2 * sum (existing(model.CM, (("40ft", g, d, i, j, t) for g in model.g for d in model.d))) >= \
+        sum (existing(model.CM, (("20ft", g, d, i, j, t) for g in model.g for d in model.d)))
+
+    def min_prep_time(model, i, t):
+        """
+        This constraint ensures that the services are spaced apart for at least 1 time period.
+        Each row spans the preparation window ending at t; windows covered by the next one are skipped
+        """
+        if (i, t) not in windows:
+            return pyo.Constraint.Skip
+        return \
+        sum (model.x[l, i, j, tp] for tp in windows[i, t] for (_, j, _) in network.outbound[i, tp] for l in model.l) <= 1
+
+    with finst.phase(profiler, 'objective_function'):
+        model.objective_function = pyo.Objective(
+                                   rule = objective_rule,
+                                   sense = pyo.minimize, doc = 'minimize cost'
+                                   )
+
+    with finst.phase(profiler, 'constraint1'):
+        model.constraint1 = pyo.Constraint(
+                            model.l, model.i, model.t, rule = locomotive_balance,
+                            doc = 'refer to locomotive_balance description'
+                            )
+
+    with finst.phase(profiler, 'constraint2'):
+        model.constraint2 = pyo.Constraint(
+                            model.w, model.i, model.t, rule = wagon_balance,
+                            doc = 'refer to wagon_balance description'
+                            )
+
+    with finst.phase(profiler, 'constraint3'):
+        model.constraint3 = pyo.Constraint(
+                            balance_rows, rule = container_balance,
+                            doc = 'refer to container_balance description'
+                            )
+
+    with finst.phase(profiler, 'constraint4'):
+        model.constraint4 = pyo.Constraint(
+                            model.l, model.i, rule = close_the_loop_1,
+                            doc = 'refer to close_the_loop_1 description'
+                            )
+
+    with finst.phase(profiler, 'constraint5'):
+        model.constraint5 = pyo.Constraint(
+                            model.w, model.i, rule = close_the_loop_2,
+                            doc = 'refer to close_the_loop_2 description'
+                            )
+
+    with finst.phase(profiler, 'constraint6'):
+        model.constraint6 = pyo.Constraint(
+                            model.w, model.t, rule = operational_limit_1,
+                            doc = 'refer to operational_limit_1 description'
+                            )
+
+    with finst.phase(profiler, 'constraint7'):
+        model.constraint7 = pyo.Constraint(
+                            model.l, model.t, rule = operational_limit_2,
+                            doc = 'refer to operational_limit_2 description'
+                            )
+
+    with finst.phase(profiler, 'constraint8'):
+        model.constraint8 = pyo.Constraint(
+                            model.i, model.t, rule = service_limit,
+                            doc = 'refer to service_limit description'
+                            )
+
+    with finst.phase(profiler, 'constraint9'):
+        model.constraint9 = pyo.Constraint(
+                            model.i, model.t, rule = storage_limit_1,
+                            doc = 'refer to storage_limit_1 description'
+                            )
+
+    with finst.phase(profiler, 'constraint10'):
+        model.constraint10 = pyo.Constraint(
+                            model.i, model.t, rule = storage_limit_2,
+                            doc = 'refer to storage_limit_2 description'
+                            )
+
+    with finst.phase(profiler, 'constraint11'):
+        model.constraint11 = pyo.Constraint(
+                            model.i, model.t, rule = storage_limit_3,
+                            doc = 'refer to storage_limit_3 description'
+                            )
+
+    with finst.phase(profiler, 'constraint12'):
+        model.constraint12 = pyo.Constraint(
+                            demand_rows, rule = demand_tracking,
+                            doc = 'refer to demand_tracking description'
+                            )
+
+    with finst.phase(profiler, 'constraint13'):
+        model.constraint13 = pyo.Constraint(
+                            model.at, rule = transportation_constraint,
+                            doc = 'refer to transportation_constraint description'
+                            )
+
+    with finst.phase(profiler, 'constraint14'):
+        model.constraint14 = pyo.Constraint(
+                            model.at, rule = wagon_mix_1,
+                            doc = 'refer to wagon_mix_1 description'
+                            )
+
+    with finst.phase(profiler, 'constraint15'):
+        model.constraint15 = pyo.Constraint(
+                            model.at, rule = wagon_mix_2,
+                            doc = 'refer to wagon_mix_2 description'
+                            )
+
+    with finst.phase(profiler, 'constraint16'):
+        model.constraint16 = pyo.Constraint(
+                            model.i, model.t, rule = min_prep_time,
+                            doc = 'refer to min_prep_time description'
+                            )
+
+def interchangeable_successor(members, signature):
+    """
+    This function takes in the members of a set (in set order) and the
+    data signature of each, and returns for every member the next member
+    with the same signature (None for the last one of its class)
+    """
+    successor = {}
+    for pos, member in enumerate(members):
+        successor[member] = next(
+                            (other for other in members[pos + 1:] if signature[other] == signature[member]),
+                            None
+                            )
+    return successor
+
+def strengthening_definition(model, profiler = None):
+    """
+    This function takes in the model object built by
+    constraint_definition and adds the valid inequalities of the
+    strengthened formulation: service/flow linking disaggregated by wagon
+    type and commodity, per-service container bounds from the wagon
+    fleet, and orderings between interchangeable locomotive and wagon
+    types. They cut off fractional points only, never an integer schedule
+    (the orderings keep one of every set of symmetric schedules)
+    """
+    tsetlist = list(model.t)
+    mix_wagons = ("60ft", "40ft")
+
+    # containers of every commodity released up to each period
+    released = {}
+    for c in model.c:
+        for g in model.g:
+            for d in model.d:
+                total = 0
+                for t in tsetlist:
+                    total = total + sum (model.S[c, g, i, d, t] for i in model.i)
+                    released[c, g, d, t] = total
+
+    # types whose data (costs, fleet, initial positions) cannot tell them apart
+    loco_successor = interchangeable_successor(list(model.l), {
+                     l: (tuple(pyo.value(model.FC[l, i, j]) for (i, j) in model.a),
+                         pyo.value(model.OL[l]), tuple(pyo.value(model.M_init[l, i]) for i in model.i))
+                     for l in model.l
+                     })
+    wagon_successor = interchangeable_successor([w for w in model.w if w not in mix_wagons], {
+                      w: (tuple(pyo.value(model.VC[w, i, j]) for (i, j) in model.a),
+                          pyo.value(model.OW[w]), tuple(pyo.value(model.WS_init[w, i]) for i in model.i))
+                      for w in model.w if w not in mix_wagons
+                      })
+
+    def wagon_link(model, w, i, j, t):
+        """
+        This constraint ensures a service carries no more wagons of type w than are owned
+        """
+        return \
+        model.WM[w, i, j, t] <= model.OW[w] * sum (model.x[l, i, j, t] for l in model.l)
+
+    def container_link(model, c, g, d, i, j, t):
         """
-        This constraint ensures that the services are spaced apart for at least 1 time period
+        This constraint ensures a service carries no more containers of a commodity than have been released by t
         """
-        if tp = t
         return \
-        sum (model.x[l, i, j, tp] for l in model.l for j in model.j for tp in model.t if tp >= t - model.P[i]) \
-        <= 1
-    
-    model.objective_function = pyo.Objective(
-                               rule = objective_rule,
-                               sense = pyo.minimize, doc = 'minimize cost'
-                               )
-
-    model.constraint1 = pyo.Constraint(
-                        model.l, model.i, model.t, rule = locomotive_balance,
-                        doc = 'refer to locomotive_balance description'
-                        )
-
-    model.constraint2 = pyo.Constraint(
-                        model.w, model.i, model.t, rule = wagon_balance,
-                        doc = 'refer to wagon_balance description'
-                        )
-
-    model.constraint3 = pyo.Constraint(
-                        model.c, model.i, model.t, rule = container_balance,
-                        doc = 'refer to container_balance description'
-                        )
-
-    model.constraint4 = pyo.Constraint(
-                        model.l, model.i, rule = close_the_loop_1,
-                        doc = 'refer to close_the_loop_1 description'
-                        )
-
-    model.constraint5 = pyo.Constraint(
-                        model.w, model.i, rule = close_the_loop_2,
-                        doc = 'refer to close_the_loop_2 description'
-                        )
-
-    model.constraint6 = pyo.Constraint(
-                        model.w, model.t, rule = operational_limit_1,
-                        doc = 'refer to operational_limit_1 description'
-                        )
-
-    model.constraint7 = pyo.Constraint(
-                        model.l, model.t, rule = operational_limit_2,
-                        doc = 'refer to operational_limit_2 description'
-                        )
-
-    model.constraint8 = pyo.Constraint(
-                        model.i, model.t, rule = service_limit,
-                        doc = 'refer to service_limit description'
-                        )
-    
-    model.constraint9 = pyo.Constraint(
-                        model.i, model.t, rule = storage_limit_1,
-                        doc = 'refer to storage_limit_1 description'
-                        )
-    
-    model.constraint10 = pyo.Constraint(
-                        model.i, model.t, rule = storage_limit_2,
-                        doc = 'refer to storage_limit_2 description'
-                        )
-    
-    model.constraint11 = pyo.Constraint(
-                        model.i, model.t, rule = storage_limit_3,
-                        doc = 'refer to storage_limit_3 description'
-                        )
-    
-    model.constraint12 = pyo.Constraint(
-                        model.c, model.g, model.d, rule = demand_tracking,
-                        doc = 'refer to demand_tracking description'
-                        )
-    
-    model.constraint13 = pyo.Constraint(
-                        model.i, model.j, model.t, rule = transportation_constraint,
-                        doc = 'refer to transportation_constraint description'
-                        )
-    
-    model.constraint14 = pyo.Constraint(
-                        model.i, model.j, model.t, rule = wagon_mix_1,
-                        doc = 'refer to wagon_mix_1 description'
-                        )
-    
-    model.constraint15 = pyo.Constraint(
-                        model.i, model.j, model.t, rule = wagon_mix_2,
-                        doc = 'refer to wagon_mix_2 description'
-                        )
-    
-    model.constraint16 = pyo.Constraint(
-                        model.i, model.t, rule = min_prep_time,
-                        doc = 'refer to min_prep_time description'
-                        )
+        model.CM[c, g, d, i, j, t] <= released[c, g, d, t] * sum (model.x[l, i, j, t] for l in model.l)
+
+    def wagon_capacity_1(model, i, j, t):
+        """
+        This constraint bounds the 40ft containers on each service by the 60ft and 40ft wagons owned
+        """
+        return \
+        sum (existing(model.CM, (("40ft", g, d, i, j, t) for g in model.g for d in model.d))) <= \
+        (model.OW["60ft"] + model.OW["40ft"]) * sum (model.x[l, i, j, t] for l in model.l)
+
+    def wagon_capacity_2(model, i, j, t):
+        """
+        This constraint bounds the container slots used on each service by the 60ft wagons owned
+        """
+        return \
+        sum (existing(model.CM, (("20ft", g, d, i, j, t) for g in model.g for d in model.d))) \
+        + 2 * sum (existing(model.CM, (("40ft", g, d, i, j, t) for g in model.g for d in model.d))) <= \
+        3 * model.OW["60ft"] * sum (model.x[l, i, j, t] for l in model.l)
+
+    def locomotive_symmetry(model, l):
+        """
+        This constraint orders interchangeable locomotive types: type l runs at least as many services as the next one
+        """
+        if loco_successor[l] is None:
+            return pyo.Constraint.Skip
+        return \
+        sum (model.x[l, i, j, t] for (i, j, t) in model.at) >= \
+        sum (model.x[loco_successor[l], i, j, t] for (i, j, t) in model.at)
+
+    def wagon_symmetry(model, w):
+        """
+        This constraint orders interchangeable wagon types: type w is moved at least as often as the next one
+        """
+        if wagon_successor.get(w) is None:
+            return pyo.Constraint.Skip
+        return \
+        sum (model.WM[w, i, j, t] for (i, j, t) in model.at) >= \
+        sum (model.WM[wagon_successor[w], i, j, t] for (i, j, t) in model.at)
+
+    with finst.phase(profiler, 'constraint17'):
+        model.constraint17 = pyo.Constraint(
+                             model.w, model.at, rule = wagon_link,
+                             doc = 'refer to wagon_link description'
+                             )
+
+    with finst.phase(profiler, 'constraint18'):
+        model.constraint18 = pyo.Constraint(
+                             model.CM.index_set(), rule = container_link,
+                             doc = 'refer to container_link description'
+                             )
+
+    with finst.phase(profiler, 'constraint19'):
+        model.constraint19 = pyo.Constraint(
+                             model.at, rule = wagon_capacity_1,
+                             doc = 'refer to wagon_capacity_1 description'
+                             )
+
+    with finst.phase(profiler, 'constraint20'):
+        model.constraint20 = pyo.Constraint(
+                             model.at, rule = wagon_capacity_2,
+                             doc = 'refer to wagon_capacity_2 description'
+                             )
+
+    with finst.phase(profiler, 'constraint21'):
+        model.constraint21 = pyo.Constraint(
+                             model.l, rule = locomotive_symmetry,
+                             doc = 'refer to locomotive_symmetry description'
+                             )
+
+    with finst.phase(profiler, 'constraint22'):
+        model.constraint22 = pyo.Constraint(
+                             model.w, rule = wagon_symmetry,
+                             doc = 'refer to wagon_symmetry description'
+                             )
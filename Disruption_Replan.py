@@ -0,0 +1,145 @@
+###############################################
+# This documents contains the disruption ######
+# re-plan: the schedule before a disruption ###
+# kept as it ran, the legs and assets lost ####
+# taken out, new supply added, and only the ###
+# remaining periods re-optimised from the #####
+# old plan. ###################################
+
+# Import nccessary packages
+import copy
+
+import numpy as np
+
+import Presolve as fpre
+import Sparse_Builder as fsparse
+
+
+class Disruption():
+    """
+    This is an object that describes a disruption at time (a period of
+    the horizon): the legs (i, j) closed from then on, the locomotives
+    {(l, i): n} and wagons {(w, i): n} lost at node i, and new supply
+    {(c, g, i, d, t): n} released at or after time
+    """
+    def __init__(self, time, closed_legs = (), lost_locomotives = None, lost_wagons = None, new_supply = None):
+        self.time = time
+        self.closed_legs = set(closed_legs)
+        self.lost_locomotives = dict(lost_locomotives or {})
+        self.lost_wagons = dict(lost_wagons or {})
+        self.new_supply = dict(new_supply or {})
+
+def disrupted_input(var_par, disruption):
+    """
+    This function returns a copy of the varying parameters with the new
+    supply of the disruption added to S. Raises ValueError for supply
+    released before the disruption, which the fixed past cannot serve
+    """
+    var_par = copy.copy(var_par)
+    var_par.S = dict(var_par.S)
+    for key, val in disruption.new_supply.items():
+        if key[4] < disruption.time:
+            raise ValueError('new supply %s is released before the disruption' % (key,))
+        var_par.S[key] = var_par.S.get(key, 0) + val
+    return var_par
+
+def _row(sparse_model, name, flat):
+    """
+    This function returns the model row of the row of family name at the
+    flat position flat of its index space
+    """
+    family = next(family for family in sparse_model.families if family.name == name)
+    return sparse_model.row_offset[name] + int(np.searchsorted(family.index, flat))
+
+def remove_lost_assets(sparse_model, period, values, disruption):
+    """
+    This function takes the lost locomotives and wagons out of the
+    SparseModel (in place) from the period position on: the stock at
+    their node drops by the loss in the balance row, the fleet in the
+    operational limits shrinks, and the lost units are no longer due back
+    at the end of the horizon. Raises ValueError when the plan does not
+    hold that many units at the node just before the disruption
+    """
+    index = sparse_model.index
+    nT = index.nT
+    for lost, labels, stock, balance, loop, limit in (
+        (disruption.lost_locomotives, index.l_pos, 'M', 'constraint1', 'constraint4', 'constraint7'),
+        (disruption.lost_wagons, index.w_pos, 'WS', 'constraint2', 'constraint5', 'constraint6')):
+        family = sparse_model.columns[stock]
+        for (unit, node), n in lost.items():
+            u, i = labels[unit], index.i_pos[node]
+            held = values[family.columns(u, i, period - 1)] if period > 0 \
+                   else (index.M_init if stock == 'M' else index.WS_init)[u, i]
+            if held < n:
+                raise ValueError('only %d %s units of type %s are at %s before the disruption'
+                                 % (held, stock, unit, node))
+            row = _row(sparse_model, balance, (u * index.nI + i) * nT + period)
+            sparse_model.row_lower[row] -= n
+            sparse_model.row_upper[row] -= n
+            if period > 0:
+                row = _row(sparse_model, loop, u * index.nI + i)
+                sparse_model.row_lower[row] += n
+                sparse_model.row_upper[row] += n
+            for t in range(period, nT):
+                sparse_model.row_upper[_row(sparse_model, limit, u * nT + t)] -= n
+
+def closed_columns(sparse_model, period, closed_legs):
+    """
+    This function returns the mask of the departure columns (x, WM, CM)
+    on the closed legs from the period position on
+    """
+    index = sparse_model.index
+    closed = np.array([(i, j) in closed_legs for (i, j, t) in index.at], dtype = bool) \
+             & (index.dep_t >= period)
+    mask = np.zeros(sparse_model.n_col, dtype = bool)
+    for name in ('x', 'WM', 'CM'):
+        family = sparse_model.columns[name]
+        mask[family.offset:family.offset + family.space.size] = np.tile(closed, family.space.size // index.nK)
+    return mask
+
+def replan(set_input, fixed_par, var_par, values, disruption, time_limit = None, mip_rel_gap = None,
+           threads = None, tee = False):
+    """
+    This function re-plans the schedule values (the column values of the
+    current solution) after the disruption: every column before the
+    disruption keeps its value, the closed departures and unreachable
+    container columns are fixed at zero, the lost assets are taken out
+    and the remaining periods are re-optimised with the old plan as the
+    MIP start. Returns the SparseSolution over all columns of the
+    disrupted model, its bound including the cost of the fixed past.
+    Raises ValueError for a disruption after the last period or a
+    schedule that does not match the columns of the model
+    """
+    var_par = disrupted_input(var_par, disruption)
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par)
+    index = sparse_model.index
+    if disruption.time > index.t_val[-1]:
+        raise ValueError('the disruption at %s is after the last period %s' % (disruption.time, index.t_val[-1]))
+    period = int(np.searchsorted(index.t_val, disruption.time, side = 'left'))
+    values = np.array(values, dtype = np.float64)
+    if len(values) != sparse_model.n_col:
+        raise ValueError('the schedule has %d column values, the model %d columns'
+                         % (len(values), sparse_model.n_col))
+
+    remove_lost_assets(sparse_model, period, values, disruption)
+    closed = closed_columns(sparse_model, period, disruption.closed_legs)
+    free = (sparse_model.col_period >= period) & ~closed & fpre.reachable_columns(sparse_model)
+    values[closed] = 0
+
+    rows = np.flatnonzero(abs(sparse_model.A) @ free.astype(np.float64) > 0)
+    restricted = fsparse.RestrictedModel(sparse_model, np.flatnonzero(free), values, rows)
+    solution = fsparse.solve_highs(restricted, time_limit, mip_rel_gap, threads, tee, start = values[free])
+    if tee:
+        print('re-plan from period %s: %d of %d columns free, %s, %.2fs'
+              % (disruption.time, restricted.n_col, sparse_model.n_col, solution.status, solution.runtime))
+
+    if len(solution.values) != restricted.n_col or not np.isfinite(solution.objective):
+        return fsparse.SparseSolution(sparse_model, solution.status, np.inf, -np.inf, np.inf,
+                                      solution.runtime, values)
+    new_values = restricted.expand(solution.values)
+    integer = sparse_model.integrality.astype(bool)
+    new_values[integer] = np.round(new_values[integer])
+    objective = float(sparse_model.c @ new_values)
+    bound = solution.bound + float(sparse_model.c @ restricted.values)
+    return fsparse.SparseSolution(sparse_model, solution.status, objective, bound,
+                                  (objective - bound) / max(abs(objective), 1e-9), solution.runtime, new_values)
@@ -0,0 +1,328 @@
+###############################################
+# This documents contains the greedy ##########
+# constructive heuristic: a period-by-period ##
+# dispatch simulation that builds a schedule ##
+# used as a MIP start or as a quick plan. #####
+
+# Import nccessary packages
+import math
+import time
+
+import numpy as np
+
+import Sparse_Builder as fsparse
+
+
+class Train():
+    """
+    This is an object that follows one locomotive of type l (code) from
+    its home node, with the wagon consist it hauls (counts per wagon type)
+    """
+    def __init__(self, l, home, n_wagon_types):
+        self.l = l
+        self.home = home
+        self.node = home
+        self.consist = np.zeros(n_wagon_types, dtype = np.int64)
+
+def shortest_routes(index):
+    """
+    This function returns the shortest journey times between node
+    positions along the feasible legs and the next hop on each route
+    (-1 when unreachable)
+    """
+    nI = index.nI
+    dist = np.full((nI, nI), np.inf)
+    hop = np.full((nI, nI), -1, dtype = np.int64)
+    np.fill_diagonal(dist, 0)
+    hop[np.arange(nI), np.arange(nI)] = np.arange(nI)
+    for (i, j) in index.set_input.a:
+        i, j = index.i_pos[i], index.i_pos[j]
+        h = index.fixed_par.H[index.i[i], index.i[j]]
+        if h < dist[i, j]:
+            dist[i, j], hop[i, j] = h, j
+
+    for k in range(nI):
+        through = dist[:, k, None] + dist[None, k, :]
+        better = through < dist
+        dist = np.where(better, through, dist)
+        hop = np.where(better, hop[:, k, None], hop)
+    return dist, hop
+
+def wagons_needed(n40, n20):
+    """
+    This function returns the fewest 60ft and 40ft wagons that carry n40
+    40ft and n20 20ft containers under wagon_mix_1 and wagon_mix_2
+    """
+    w60 = math.ceil((n20 + 2 * n40) / 3)
+    return w60, max(0, n40 - w60)
+
+class GreedyScheduler():
+    """
+    This is an object that simulates the network period by period. Every
+    locomotive stays a train with a home node; it leaves home only to
+    carry containers, loads them in order of earliest deadline along the
+    next hop of their shortest route, and is only dispatched when its
+    journey times and preparation leave it time to get home before the
+    horizon ends. One departure per node at most every P[i] + 1 periods,
+    WMAX and the wagon mix always hold; an arrival that would push the
+    projected storage of locos, wagons or containers at the receiving
+    node over its limit is refused (a train away from home then goes on
+    empty). This is a best-effort start, not a feasibility guarantee:
+    supply that overfills a node on release breaks storage_limit_1,
+    containers the trains cannot reach in time break demand_tracking,
+    and a train that loses its slots home to other trains is left away
+    (close_the_loop); greedy_schedule returns the rows violated, and
+    stranded and undelivered count the last two
+    """
+    def __init__(self, sparse_model):
+        index = self.index = sparse_model.index
+        self.dist, self.hop = shortest_routes(index)
+        self.departure = {
+        (i, j, t): k for k, (i, j, t) in enumerate(zip(index.dep_i.tolist(), index.dep_j.tolist(), index.dep_t.tolist()))
+        }
+        self.w60, self.w40 = index.w_pos['60ft'], index.w_pos['40ft']
+        self.c40, self.c20 = index.c_pos['40ft'], index.c_pos['20ft']
+        self.dest = index.d_node[index.f_d]
+        self._return_time = {}
+
+    def return_time(self, node, home):
+        """
+        This function returns the periods a train at node needs to get
+        home: the journey time plus the preparation time at every stop
+        """
+        if (node, home) not in self._return_time:
+            total, n = 0.0, node
+            while n != home:
+                nxt = self.hop[n, home]
+                if nxt < 0:
+                    total = np.inf
+                    break
+                total += self.dist[n, nxt] + self.index.P[n] + 1
+                n = nxt
+            self._return_time[node, home] = total
+        return self._return_time[node, home]
+
+    def load(self, batches, capacity):
+        """
+        This function fills the train with the waiting batches (sorted by
+        deadline) as long as capacity(w60, w40) accepts the wagons they
+        need, and returns the cargo as (batch, count) pairs and the wagons
+        """
+        cargo, n40, n20 = [], 0, 0
+        for batch in batches:
+            due, f, count = batch
+            size40 = self.index.f_c[f] == self.c40
+            for take in range(count, 0, -1):
+                w60, w40 = wagons_needed(n40 + take * size40, n20 + take * (not size40))
+                if capacity(w60, w40):
+                    cargo.append((batch, take))
+                    n40 += take * size40
+                    n20 += take * (not size40)
+                    break
+        return cargo, wagons_needed(n40, n20)
+
+    def run(self):
+        """
+        This function simulates the whole horizon and returns the flows
+        x, WM and CM as arrays over the departures
+        """
+        index = self.index
+        nI, nT = index.nI, index.nT
+        x = np.zeros((index.nL, index.nK))
+        WM = np.zeros((index.nW, index.nK))
+        CM = np.zeros((index.nF, index.nK))
+
+        trains = {i: [] for i in range(nI)}
+        for l in range(index.nL):
+            for i in range(nI):
+                trains[i] += [Train(l, i, index.nW) for n in range(int(index.M_init[l, i]))]
+        pool = index.WS_init.T.astype(np.int64).copy()
+        waiting = {i: [] for i in range(nI)}
+        in_transit = {}
+        last_departure = np.full(nI, -np.inf)
+
+        loco_stock = np.repeat(index.M_init.sum(axis = 0)[:, None], nT, axis = 1)
+        wagon_stock = np.repeat(index.WS_init.sum(axis = 0)[:, None], nT, axis = 1)
+        container_stock = np.zeros((nI, nT))
+        releases = {}
+        for f, i, t, val, due in zip(index.s_f.tolist(), index.s_i.tolist(), index.s_t.tolist(),
+                                     index.s_val.tolist(), index.release_period().tolist()):
+            if self.dest[f] != i:
+                releases.setdefault(t, []).append((i, [due, f, int(val)]))
+                container_stock[i, t:] += val
+
+        for t in range(nT):
+            for train, j, cargo in in_transit.pop(t, []):
+                train.node = j
+                trains[j].append(train)
+                waiting[j] += [[due, f, count] for (due, f, count) in cargo if self.dest[f] != j]
+            for i, batch in releases.get(t, []):
+                waiting[i].append(batch)
+            for i in range(nI):
+                for train in trains[i]:
+                    if train.node == train.home:
+                        pool[i] += train.consist
+                        train.consist[:] = 0
+
+            # no departure in the first period, so the stocks of that period equal
+            # the initial ones and close_the_loop compares against them
+            if t == 0:
+                continue
+
+            for i in range(nI):
+                if index.t_val[t] - last_departure[i] <= index.P[i] or not trains[i]:
+                    continue
+                waiting[i].sort()
+                away = [train for train in trains[i] if train.home != i]
+                home = sorted(
+                       (train for train in trains[i] if train.home == i),
+                       key = lambda train: index.FC[train.l].mean()
+                       )
+                for train in away + home:
+                    if self.dispatch(train, i, t, waiting, trains, in_transit, pool,
+                                     loco_stock, wagon_stock, container_stock, x, WM, CM):
+                        last_departure[i] = index.t_val[t]
+                        break
+
+        self.stranded = sum(train.node != train.home for i in range(nI) for train in trains[i]) \
+                        + sum(len(arrivals) for arrivals in in_transit.values())
+        self.undelivered = sum(count for i in range(nI) for (due, f, count) in waiting[i])
+        return x, WM, CM
+
+    def dispatch(self, train, i, t, waiting, trains, in_transit, pool,
+                 loco_stock, wagon_stock, container_stock, x, WM, CM):
+        """
+        This function tries to send the train out of node i in period t,
+        towards the next hop of the most urgent containers it can take (or
+        home when away and idle), and returns whether it left
+        """
+        index = self.index
+        targets = []
+        for due, f, count in waiting[i]:
+            j = self.hop[i, self.dest[f]]
+            if j >= 0 and j not in targets:
+                targets.append(j)
+        if train.home != i:
+            home_hop = self.hop[i, train.home]
+            targets = [j for j in targets if j == home_hop] + [j for j in targets if j != home_hop]
+            if home_hop not in targets:
+                targets.append(home_hop)
+
+        for j in targets:
+            k = self.departure.get((i, j, t))
+            if k is None:
+                continue
+            arrival = index.arr_t[k]
+            if index.t_val[arrival] + self.return_time(j, train.home) > index.t_val[-1]:
+                continue
+
+            batches = [batch for batch in waiting[i] if self.hop[i, self.dest[batch[1]]] == j]
+            if train.home == i:
+                cargo, (w60, w40) = self.load(
+                                    batches,
+                                    lambda w60, w40: w60 <= pool[i, self.w60] and w40 <= pool[i, self.w40]
+                                    and w60 + w40 <= index.WMAX
+                                    )
+                consist = np.zeros(index.nW, dtype = np.int64)
+                consist[self.w60], consist[self.w40] = w60, w40
+            else:
+                consist = train.consist
+                cargo, needed = self.load(
+                                batches,
+                                lambda w60, w40: w60 <= consist[self.w60] and w60 + w40 <= consist[self.w60] + consist[self.w40]
+                                )
+            if train.home == i and not cargo:
+                continue
+
+            cargo = [(batch[0], batch[1], take, batch) for (batch, take) in cargo]
+            held = sum(take for (due, f, take, batch) in cargo if self.dest[f] != j)
+            # a train away from home may still go on empty when its containers do not fit
+            if held and (container_stock[j, arrival:] + held > index.NC[j]).any():
+                if train.home == i:
+                    continue
+                cargo, held = [], 0
+            if (loco_stock[j, arrival:] + 1 > index.NL[j]).any() \
+               or (consist.sum() and (wagon_stock[j, arrival:] + consist.sum() > index.NW[j]).any()):
+                continue
+
+            # the train leaves: record the flows and move the projected stocks
+            x[train.l, k] = 1
+            WM[:, k] = consist
+            for due, f, take, batch in cargo:
+                CM[f, k] += take
+                batch[2] -= take
+            if train.home == i:
+                pool[i] -= consist
+                train.consist = consist
+            loco_stock[i, t:] -= 1
+            loco_stock[j, arrival:] += 1
+            wagon_stock[i, t:] -= consist.sum()
+            wagon_stock[j, arrival:] += consist.sum()
+            container_stock[i, t:] -= sum(take for (due, f, take, batch) in cargo)
+            container_stock[j, arrival:] += held
+            waiting[i] = [batch for batch in waiting[i] if batch[2] > 0]
+
+            trains[i].remove(train)
+            in_transit.setdefault(arrival, []).append((train, j, [(due, f, take) for (due, f, take, batch) in cargo]))
+            return True
+        return False
+
+def schedule_values(sparse_model, x, WM, CM):
+    """
+    This function returns the full column vector of the schedule given
+    by the flows x, WM and CM, with the stocks M, WS and CS they imply
+    """
+    index = sparse_model.index
+    supply = np.zeros((index.nF, index.nI, index.nT))
+    np.add.at(supply, (index.s_f, index.s_i, index.s_t), index.s_val)
+    blocks = {
+    'x': x,
+    'M': fsparse.stocks_from_flows(index, x, index.nL, index.M_init),
+    'WM': WM,
+    'WS': fsparse.stocks_from_flows(index, WM, index.nW, index.WS_init),
+    'CM': CM,
+    'CS': fsparse.stocks_from_flows(index, CM, index.nF, np.zeros((index.nF, index.nI)), supply),
+    }
+    values = np.zeros(sparse_model.n_col)
+    for name, family in sparse_model.columns.items():
+        values[family.offset:family.offset + family.space.size] = blocks[name].ravel()
+    return values
+
+def greedy_schedule(sparse_model):
+    """
+    This function runs the greedy dispatch on the SparseModel and returns
+    the column values of the schedule together with the rows it violates
+    (empty when the schedule is feasible)
+    """
+    x, WM, CM = GreedyScheduler(sparse_model).run()
+    values = schedule_values(sparse_model, x, WM, CM)
+    return values, sparse_model.violated_rows(values)
+
+def quick_plan(sparse_model):
+    """
+    This function returns the greedy schedule on its own as a
+    SparseSolution, with status 'Heuristic feasible' or, when some rows
+    are violated (e.g. a deadline the greedy rule could not meet),
+    'Heuristic infeasible'
+    """
+    begin = time.perf_counter()
+    values, violated = greedy_schedule(sparse_model)
+    runtime = time.perf_counter() - begin
+    status = 'Heuristic feasible' if len(violated) == 0 else 'Heuristic infeasible'
+    return fsparse.SparseSolution(sparse_model, status, float(sparse_model.c @ values),
+                                  np.nan, np.nan, runtime, values)
+
+def pyomo_warm_start(pyomo_model, sparse_model, values):
+    """
+    This function sets the values of the Pyomo model's variables to the
+    column values, so a solve with warmstart = True starts from them
+    (variables a model built over the reachable sets leaves out are
+    skipped)
+    """
+    for family in sparse_model.columns.values():
+        var = getattr(pyomo_model, family.name)
+        block = values[family.offset:family.offset + family.space.size]
+        for pos in range(family.space.size):
+            key = family.space.key(pos)
+            if key in var:
+                var[key].set_value(float(round(block[pos])), skip_validation = True)
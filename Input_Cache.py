@@ -0,0 +1,183 @@
+###############################################
+# This documents contains the compiled input ##
+# cache: the parsed set and parameter input ###
+# objects stored as integer-coded NumPy #######
+# arrays keyed by the workbook's hash. ########
+
+# Import nccessary packages
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+import Auxiliary_Functions as faux
+
+# bump whenever the cache layout or the input objects change (the sets
+# hard-coded in Main.data_construction are covered by its source in the key)
+CACHE_VERSION = 1
+
+# the sets every parameter dimension is coded against
+SET_NAMES = ('g', 'i', 'j', 'o', 'd', 'l', 'c', 'w', 't')
+
+FIXED_PAR_SETS = {
+    'tau': ('g', 'o', 'd'),
+    'H': ('i', 'j'),
+    'OL': ('l',),
+    'OW': ('w',),
+    'NC': ('i',),
+    'NL': ('i',),
+    'NW': ('i',),
+    }
+
+VAR_PAR_SETS = {
+    'FC': ('l', 'i', 'j'),
+    'VC': ('w', 'i', 'j'),
+    'P': ('i',),
+    'S': ('c', 'g', 'i', 'd', 't'),
+    'M_init': ('l', 'i'),
+    'WS_init': ('w', 'i'),
+    }
+
+
+def file_digest(file_name, reader = None):
+    """
+    This function takes in a file name and returns the sha256 hex digest
+    of its content together with the cache version and, with reader, the
+    source of the function that parses the workbook, so that editing the
+    sets or WMAX it hard-codes invalidates the cache
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    if reader is not None:
+        digest.update(inspect.getsource(reader).encode())
+    with open(file_name, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_file_name(file_name):
+    """
+    This function returns the name of the cache file kept next to the workbook
+    """
+    return os.path.splitext(file_name)[0] + '.rso.npz'
+
+def encode_par(par_dict, set_names, vocab, arrays, name):
+    """
+    This function codes the keys of the parameter dictionary as integer
+    positions in the vocabulary of each of its sets (adding labels the
+    set does not list) and stores codes and values in arrays
+    """
+    codes = np.empty((len(par_dict), len(set_names)), dtype = np.int32)
+    for row, key in enumerate(par_dict):
+        key = key if isinstance(key, tuple) else (key,)
+        for col, set_name in enumerate(set_names):
+            position = vocab[set_name]['position']
+            if key[col] not in position:
+                position[key[col]] = len(vocab[set_name]['labels'])
+                vocab[set_name]['labels'].append(key[col])
+            codes[row, col] = position[key[col]]
+
+    arrays[name + '_idx'] = codes
+    arrays[name + '_val'] = np.fromiter(par_dict.values(), dtype = np.float64, count = len(par_dict))
+
+def decode_par(arrays, set_names, labels, name):
+    """
+    This function rebuilds the parameter dictionary from its coded arrays
+    """
+    codes = arrays[name + '_idx']
+    columns = [
+    [labels[set_name][code] for code in codes[:, col].tolist()]
+    for col, set_name in enumerate(set_names)
+    ]
+    keys = columns[0] if len(set_names) == 1 else zip(*columns)
+    values = [faux.cell_value(value) for value in arrays[name + '_val'].tolist()]
+    return dict(zip(keys, values))
+
+def compile_input_cache(cache_file, digest, set_input, fixed_par, var_par):
+    """
+    This function takes in the parsed input objects and writes them to
+    cache_file as integer-coded index arrays and value arrays, tagged
+    with the digest of the workbook they were parsed from
+    """
+    vocab = {
+    set_name: {'labels': list(getattr(set_input, set_name)), 'position': {}}
+    for set_name in SET_NAMES
+    }
+    for set_name in SET_NAMES:
+        vocab[set_name]['position'] = {
+        label: pos for pos, label in enumerate(vocab[set_name]['labels'])
+        }
+
+    arrays = {'digest': np.array(digest), 'WMAX': np.array(var_par.WMAX)}
+    for name, set_names in FIXED_PAR_SETS.items():
+        encode_par(getattr(fixed_par, name), set_names, vocab, arrays, name)
+    for name, set_names in VAR_PAR_SETS.items():
+        encode_par(getattr(var_par, name), set_names, vocab, arrays, name)
+
+    for set_name in SET_NAMES:
+        arrays['set_' + set_name] = np.array(json.dumps(vocab[set_name]['labels']))
+        arrays['len_' + set_name] = np.array(len(getattr(set_input, set_name)))
+
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'wb') as handle:
+        np.savez(handle, **arrays)
+    os.replace(temp_file, cache_file)
+
+def read_input_cache(cache_file, digest):
+    """
+    This function takes in the cache file and the digest of the current
+    workbook and returns the label lists of the sets (with the labels
+    only parameter keys use after them), the length of every set and the
+    arrays of the cache, or None when the cache is missing, unreadable or
+    stale
+    """
+    try:
+        arrays = np.load(cache_file, allow_pickle = False)
+    except (OSError, ValueError):
+        return None
+
+    with arrays:
+        if str(arrays['digest']) != digest:
+            return None
+        arrays = {name: arrays[name] for name in arrays.files}
+
+    labels = {
+    set_name: json.loads(str(arrays['set_' + set_name]))
+    for set_name in SET_NAMES
+    }
+    sizes = {
+    set_name: int(arrays['len_' + set_name])
+    for set_name in SET_NAMES
+    }
+    return labels, sizes, arrays
+
+def load_input_cache(cache_file, digest):
+    """
+    This function takes in the cache file and the digest of the current
+    workbook and returns the set and parameter input objects, or None
+    when the cache is missing, unreadable or stale
+    """
+    data = read_input_cache(cache_file, digest)
+    if data is None:
+        return None
+    labels, sizes, arrays = data
+
+    sets = {
+    set_name: labels[set_name][:sizes[set_name]]
+    for set_name in SET_NAMES
+    }
+    fixed = {
+    name: decode_par(arrays, set_names, labels, name)
+    for name, set_names in FIXED_PAR_SETS.items()
+    }
+    var = {
+    name: decode_par(arrays, set_names, labels, name)
+    for name, set_names in VAR_PAR_SETS.items()
+    }
+    var['WMAX'] = faux.cell_value(arrays['WMAX'].item())
+
+    sets['a'] = faux.feasible_legs(fixed['H'])
+    sets['at'] = faux.feasible_departures(fixed['H'], sets['t'])
+
+    return faux.SetInput(**sets), faux.ParaFixedInput(**fixed), faux.ParaVarInput(**var)
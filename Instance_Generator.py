@@ -0,0 +1,117 @@
+###############################################
+# This documents contains the seeded ##########
+# synthetic instance generator: random rail ###
+# networks, fleets and supply tables built ####
+# as the same input objects the workbook ######
+# gives, for scaling runs and benchmarks. #####
+
+# Import nccessary packages
+import numpy as np
+
+import Auxiliary_Functions as faux
+
+
+def random_legs(rng, nodes, n_legs, max_journey):
+    """
+    This function returns the journey times H of n_legs directed legs
+    (at least a ring in both directions, so every node reaches every
+    other one), each leg running both ways with the same journey time
+    """
+    n = len(nodes)
+    pairs = {tuple(sorted((k, (k + 1) % n))) for k in range(n)} if n > 1 else set()
+    others = [(a, b) for a in range(n) for b in range(a + 1, n) if (a, b) not in pairs]
+    rng.shuffle(others)
+    for pair in others:
+        if 2 * len(pairs) >= n_legs:
+            break
+        pairs.add(pair)
+
+    H = {}
+    for (a, b) in sorted(pairs):
+        h = int(rng.integers(1, max_journey + 1))
+        H[nodes[a], nodes[b]] = h
+        H[nodes[b], nodes[a]] = h
+    return H
+
+def journey_times(nodes, H):
+    """
+    This function returns the shortest journey time between every pair
+    of nodes along the legs
+    """
+    pos = {node: k for k, node in enumerate(nodes)}
+    dist = np.full((len(nodes), len(nodes)), np.inf)
+    np.fill_diagonal(dist, 0)
+    for (i, j), h in H.items():
+        dist[pos[i], pos[j]] = min(dist[pos[i], pos[j]], h)
+    for k in range(len(nodes)):
+        dist = np.minimum(dist, dist[:, k, None] + dist[None, k, :])
+    return {(i, j): dist[pos[i], pos[j]] for i in nodes for j in nodes}
+
+def generate_instance(n_nodes = 4, n_legs = 8, n_customers = 1, n_origins = 1, n_destinations = 1,
+                      containers = ('20ft', '40ft'), wagons = ('40ft', '60ft'),
+                      locomotives = ('Diesel', 'Electric'), horizon = 49, demand_density = 0.05,
+                      max_journey = 3, max_batch = 6, seed = 0):
+    """
+    This function takes in the size of a synthetic instance and returns
+    its input objects (SetInput, ParaFixedInput, ParaVarInput), always the
+    same ones for the same arguments and seed. The first n_origins nodes
+    are origins and the last n_destinations nodes destinations; every
+    supply entry (c, g, o, d, t) is drawn with probability demand_density
+    in the periods that leave time to meet its deadline tau, and the
+    fleet starts at the origins, large enough to carry a busy period.
+    The wagon_mix rules need the container types '20ft' and '40ft' and
+    the wagon types '40ft' and '60ft'
+    """
+    rng = np.random.default_rng(seed)
+    i = ['N%d' % (k + 1) for k in range(n_nodes)]
+    j = list(i)
+    o = i[:n_origins]
+    d = i[n_nodes - n_destinations:]
+    g = ['G%d' % (k + 1) for k in range(n_customers)]
+    l, c, w = list(locomotives), list(containers), list(wagons)
+    t = list(range(horizon))
+
+    H = random_legs(rng, i, n_legs, max_journey)
+    a = faux.feasible_legs(H)
+    at = faux.feasible_departures(H, t)
+    dist = journey_times(i, H)
+
+    # deadlines leave a few periods of slack over the fastest route
+    tau = {
+    (gx, ox, dx): int(dist[ox, dx] + rng.integers(2, 3 * max_journey + 3))
+    for gx in g for ox in o for dx in d if ox != dx
+    }
+
+    S = {}
+    for cx in c:
+        for gx in g:
+            for (ox, dx) in [(ox, dx) for ox in o for dx in d if (gx, ox, dx) in tau]:
+                for tx in t[1:horizon - tau[gx, ox, dx] - 1]:
+                    if rng.random() < demand_density:
+                        S[cx, gx, ox, dx, tx] = int(rng.integers(1, max_batch + 1))
+
+    # fleet: locomotives and wagons spread over the origins
+    n_locos = max(2, n_origins * 2)
+    M_init = {(lx, ix): 0 for lx in l for ix in i}
+    for k in range(n_locos):
+        M_init[l[k % len(l)], o[k % len(o)]] += 1
+    WS_init = {(wx, ix): 0 for wx in w for ix in i}
+    for wx in w:
+        for ox in o:
+            WS_init[wx, ox] = 20
+    OL = {lx: sum(M_init[lx, ix] for ix in i) for lx in l}
+    OW = {wx: sum(WS_init[wx, ix] for ix in i) for wx in w}
+
+    NC = {ix: 50 * max_batch for ix in i}
+    NL = {ix: n_locos for ix in i}
+    NW = {ix: sum(OW.values()) for ix in i}
+    P = {ix: int(rng.integers(0, 2)) for ix in i}
+    WMAX = 30
+
+    FC = {(lx,) + leg: int(100 * h * (k + 1)) for k, lx in enumerate(l) for leg, h in H.items()}
+    VC = {(wx,) + leg: int(5 * h * (k + 1)) for k, wx in enumerate(w) for leg, h in H.items()}
+
+    set_input = faux.SetInput(g, i, j, o, d, l, c, w, t, a, at)
+    fixed_par = faux.ParaFixedInput(tau, H, OL, OW, NC, NL, NW)
+    var_par = faux.ParaVarInput(FC, VC, P, WMAX, S, M_init, WS_init)
+    return set_input, fixed_par, var_par
@@ -0,0 +1,125 @@
+###############################################
+# This documents contains the phase profiler: #
+# wall time, CPU time and memory of every #####
+# phase of the solve pipeline and of every ####
+# constraint family, with the rows and ########
+# nonzeros each family generates. #############
+
+# Import nccessary packages
+import contextlib
+import json
+import os
+import resource
+import time
+
+from pyomo.repn import generate_standard_repn
+
+
+def current_rss():
+    """
+    This function returns the resident memory of the process in MB (the
+    peak so far where /proc is not available)
+    """
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+def peak_rss():
+    """
+    This function returns the peak resident memory of the process in MB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def family_size(component):
+    """
+    This function returns the number of rows of a Pyomo constraint
+    component and the number of nonzeros they hold
+    """
+    nonzeros = 0
+    for con in component.values():
+        nonzeros += len(generate_standard_repn(con.body, quadratic = False).linear_vars)
+    return len(component), nonzeros
+
+class Profiler():
+    """
+    This is an object that records one entry per phase run under
+    phase(name): wall and CPU time, resident memory before and after and
+    the peak so far, and for constraint families their rows and nonzeros.
+    With log, every phase prints one line when it ends
+    """
+    def __init__(self, log = False):
+        self.log = log
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        This function measures the block it wraps as the phase name
+        """
+        record = {'phase': name, 'rss_before_mb': current_rss()}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time.perf_counter() - wall
+            record['cpu_time'] = time.process_time() - cpu
+            record['rss_after_mb'] = current_rss()
+            record['rss_delta_mb'] = record['rss_after_mb'] - record['rss_before_mb']
+            record['peak_rss_mb'] = max(peak_rss(), record['rss_after_mb'])
+            self.phases.append(record)
+            if self.log:
+                print('%-28s wall %8.3fs  cpu %8.3fs  rss %+9.1fMB  peak %9.1fMB'
+                      % (name, record['wall_time'], record['cpu_time'],
+                         record['rss_delta_mb'], record['peak_rss_mb']))
+
+    def count_rows(self, model, names):
+        """
+        This function adds the rows and nonzeros of the constraint
+        components names of the model to their phase entries (counted
+        after the phases, so the counting is not timed)
+        """
+        records = {record['phase']: record for record in self.phases}
+        for name in names:
+            if name in records and hasattr(model, name):
+                records[name]['rows'], records[name]['nonzeros'] = family_size(getattr(model, name))
+
+    def report(self):
+        """
+        This function returns the report: the phases in the order they ran
+        and the totals
+        """
+        return {
+        'phases': self.phases,
+        'total_wall_time': sum(record['wall_time'] for record in self.phases),
+        'total_cpu_time': sum(record['cpu_time'] for record in self.phases),
+        'peak_rss_mb': peak_rss(),
+        }
+
+    def write(self, file_name):
+        """
+        This function writes the report to file_name as JSON
+        """
+        with open(file_name, 'w') as handle:
+            json.dump(self.report(), handle, indent = 2)
+
+def phase(profiler, name):
+    """
+    This function returns the measuring context of the phase name, or an
+    empty one when there is no profiler
+    """
+    return contextlib.nullcontext() if profiler is None else profiler.phase(name)
+
+def timed(profiler, name, function):
+    """
+    This function returns function wrapped so that every call is measured
+    as the phase name, or function itself when there is no profiler
+    """
+    if profiler is None:
+        return function
+
+    def measured(*args, **kwds):
+        with profiler.phase(name):
+            return function(*args, **kwds)
+    return measured
@@ -0,0 +1,166 @@
+###############################################
+# This documents contains the fast planning ###
+# mode: the LP relaxation of the model solved #
+# once, its services, wagons and containers ###
+# rounded block by block in small restricted ##
+# MILPs that restore integrality and ##########
+# feasibility, and the schedule reported ######
+# against the LP bound. #######################
+
+# Import nccessary packages
+import time
+
+import numpy as np
+
+import Commodity_Aggregation as fagg
+import Greedy_Heuristic as fheur
+import Presolve as fpre
+import Sparse_Builder as fsparse
+
+# flows rounded stage by stage: the integer columns of the stage, the columns
+# kept continuous alongside them and the flow whose LP support is kept
+ROUNDING_STAGES = (
+    (('x', 'M'), ('WM', 'WS', 'CM', 'CS'), 'x'),
+    (('WM', 'WS'), ('CM', 'CS'), 'WM'),
+    )
+
+# LP values at or below this count as outside the support
+SUPPORT_TOL = 1e-6
+
+# share of the time left that a rounding stage may take
+STAGE_SHARE = 0.5
+
+# share of the time limit the LP relaxation may take; past it, the time left
+# goes to the MIP for a first feasible schedule instead
+LP_SHARE = 0.5
+
+
+def _mask(sparse_model, names):
+    mask = np.zeros(sparse_model.n_col, dtype = bool)
+    for name in names:
+        family = sparse_model.columns[name]
+        mask[family.offset:family.offset + family.space.size] = True
+    return mask
+
+def solve_relaxation(sparse_model, time_limit = None, threads = None):
+    """
+    This function solves the LP relaxation of the SparseModel by interior
+    point with crossover, much faster than simplex on the large
+    relaxations, and returns a SparseSolution
+    """
+    highs = fsparse.highs_instance(sparse_model, time_limit, threads = threads, relax = True)
+    highs.setOptionValue('solver', 'ipm')
+    return fsparse.run_highs(highs, sparse_model, relax = True)
+
+def round_stage(sparse_model, values, support, integer, continuous, flow, time_limit = None,
+                mip_rel_gap = None, threads = None):
+    """
+    This function rounds one stage from the column values: the columns
+    of the integer families become integer and those of the continuous
+    families stay relaxed, every other column keeps its entry in values.
+    The flow family may only use the departures where support (column
+    values, e.g. of the LP relaxation) is positive, or all of them when
+    support is None. Returns the column values with the integer families
+    rounded, or None when the restricted model has no solution in time
+    """
+    free = _mask(sparse_model, integer + continuous)
+    flow_cols = _mask(sparse_model, (flow,))
+    if support is not None:
+        free &= ~flow_cols | (support > SUPPORT_TOL)
+    # the flow rounded as the start, the flow outside the support at zero
+    values = values.copy()
+    values[flow_cols & free] = np.round(values[flow_cols & free])
+    values[flow_cols & ~free] = 0
+
+    rows = np.flatnonzero(abs(sparse_model.A) @ free.astype(np.float64) > 0)
+    restricted = fsparse.RestrictedModel(sparse_model, np.flatnonzero(free), values, rows)
+    integer_cols = _mask(sparse_model, integer)
+    restricted.integrality = np.where(integer_cols[free], restricted.integrality, 0).astype(np.int32)
+    solution = fsparse.solve_highs(restricted, time_limit, mip_rel_gap, threads, start = values[free])
+    if len(solution.values) != restricted.n_col or not np.isfinite(solution.objective):
+        return None
+    rounded = restricted.expand(solution.values)
+    rounded[integer_cols] = np.round(rounded[integer_cols])
+    return rounded
+
+def solve_rounded(sparse_model, time_limit = 30, mip_rel_gap = 0.02, threads = None, tee = False):
+    """
+    This function solves the LP relaxation of the SparseModel and rounds
+    it to a schedule: the services x (with the locomotive stocks) are
+    made integer with the wagon and container flows relaxed, then the
+    wagons over those services, then the containers over those wagons
+    (Commodity_Aggregation.repair_container_flows). Each stage first
+    keeps to the departures the LP relaxation uses, then adds those of
+    the greedy schedule and only opens all of them when both fail, each
+    attempt taking at most STAGE_SHARE of the time left (its best
+    schedule by then); the greedy schedule is the last resort, and the
+    one used once time_limit is spent. When the LP relaxation does not
+    finish within LP_SHARE of time_limit, the presolved MIP is solved
+    from the greedy schedule in the time left instead, and its best
+    schedule by then reported with the MIP bound (-inf without one); the
+    greedy schedule stays the last resort.
+    On the strengthened model the LP bound is much tighter. Returns the
+    SparseSolution with the LP bound and the gap of the schedule to it
+    """
+    begin = time.perf_counter()
+
+    def left(share = 1.0):
+        return None if time_limit is None else max(0.0, share * (time_limit - (time.perf_counter() - begin)))
+
+    def spent():
+        return time_limit is not None and time.perf_counter() - begin >= time_limit
+
+    lp = solve_relaxation(sparse_model, left(LP_SHARE), threads)
+    solved = lp.status == 'Optimal'
+    bound = lp.objective if solved else -np.inf
+    if tee:
+        print(('LP relaxation: bound %.2f, %.2fs' % (bound, time.perf_counter() - begin)) if solved else
+              ('LP relaxation: %s, %.2fs' % (lp.status, time.perf_counter() - begin)))
+
+    # each stage tries the LP support, then the LP and greedy supports (the
+    # services from the greedy schedule), then every departure; once the
+    # time is spent the remaining attempts are skipped for the greedy schedule
+    values, status, greedy = (np.array(lp.values) if solved else None), 'Rounded', None
+    for integer, continuous, flow in ROUNDING_STAGES if solved else ():
+        rounded = None
+        for attempt in ('lp', 'greedy', 'all'):
+            if spent():
+                break
+            start, support = values, lp.values
+            if attempt == 'greedy':
+                greedy = fheur.greedy_schedule(sparse_model)[0] if greedy is None else greedy
+                start, support = greedy if flow == 'x' else values, np.maximum(lp.values, greedy)
+            elif attempt == 'all':
+                support = None
+            rounded = round_stage(sparse_model, start, support, integer, continuous, flow,
+                                  left(STAGE_SHARE), mip_rel_gap, threads)
+            if rounded is not None:
+                break
+        values = rounded
+        if values is None:
+            break
+        if tee:
+            print('%s rounded: cost %.2f, %.2fs' % (flow, float(sparse_model.c @ values), time.perf_counter() - begin))
+    if values is not None:
+        values = None if spent() else fagg.repair_container_flows(sparse_model, values, left(), threads)
+
+    # no relaxation in time: the MIP from the greedy schedule in the time left
+    if not solved and not spent():
+        greedy, violated = fheur.greedy_schedule(sparse_model)
+        mip = fpre.solve_presolved(sparse_model, left(), mip_rel_gap, threads,
+                                   start = greedy if len(violated) == 0 else None)[0]
+        bound = mip.bound if np.isfinite(mip.bound) else -np.inf
+        if np.isfinite(mip.objective):
+            values, status = mip.values, 'MIP ' + mip.status
+
+    if values is None or len(sparse_model.violated_rows(values)) > 0:
+        values, violated = fheur.greedy_schedule(sparse_model)
+        status = 'Greedy' if len(violated) == 0 else 'No feasible rounding'
+
+    objective = float(sparse_model.c @ values) if status != 'No feasible rounding' else np.inf
+    gap = (objective - bound) / max(abs(objective), 1e-9) if np.isfinite(objective) else np.inf
+    runtime = time.perf_counter() - begin
+    if tee:
+        print('%s schedule: cost %.2f, bound %.2f, gap %.2f%%, %.2fs'
+              % (status, objective, bound, 100 * gap, runtime))
+    return fsparse.SparseSolution(sparse_model, status, objective, bound, gap, runtime, values)
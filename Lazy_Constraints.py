@@ -0,0 +1,187 @@
+###############################################
+# This documents contains the lazy-constraint #
+# mode: the storage limits, the transport #####
+# capacity and the wagon mix left out of the ##
+# model and only added, row by row, once a ####
+# candidate schedule violates them, first #####
+# over LP re-solves and then over MIP rounds. #
+
+# Import nccessary packages
+import time
+
+import highspy
+import numpy as np
+
+import Sparse_Builder as fsparse
+
+# the constraint families added lazily: storage_limit_1/2/3,
+# transportation_constraint and wagon_mix_1/2
+LAZY_FAMILIES = ('constraint9', 'constraint10', 'constraint11', 'constraint13', 'constraint14', 'constraint15')
+
+
+class LazyModel():
+    """
+    This is an object that holds the SparseModel with the rows of the
+    lazy families left out until they are separated: active marks the
+    rows in the model solved, lazy the rows that may still be added
+    """
+    def __init__(self, sparse_model, families = LAZY_FAMILIES, tol = 1e-6):
+        self.sparse_model = sparse_model
+        self.tol = tol
+        self.lazy = np.zeros(sparse_model.n_row, dtype = bool)
+        for family in sparse_model.families:
+            if family.name in families:
+                offset = sparse_model.row_offset[family.name]
+                self.lazy[offset:offset + len(family)] = True
+        self.active = ~self.lazy
+
+        # rows of lazy families over the departures of the same leg, or over
+        # the same node and period, share a key and are separated together
+        index = sparse_model.index
+        leg = index.dep_i * index.nI + index.dep_j
+        self.key = np.full(sparse_model.n_row, -1, dtype = np.int64)
+        for family in sparse_model.families:
+            if family.name in families:
+                offset = sparse_model.row_offset[family.name]
+                if family.space.shape == (index.nK,):
+                    self.key[offset:offset + len(family)] = 2 * leg[family.index]
+                else:
+                    self.key[offset:offset + len(family)] = 2 * family.index + 1
+
+    def reduced_model(self):
+        """
+        This function returns the model of the active rows over every column
+        """
+        model = self.sparse_model
+        return fsparse.RestrictedModel(model, np.arange(model.n_col), np.zeros(model.n_col),
+                                       np.flatnonzero(self.active))
+
+    def separate(self, values):
+        """
+        This function returns the rows left out that the column values violate
+        """
+        rows = self.sparse_model.violated_rows(np.asarray(values, dtype = np.float64), self.tol)
+        return rows[~self.active[rows]]
+
+    def siblings(self, rows):
+        """
+        This function returns the rows left out that share the key of one
+        of rows
+        """
+        return np.flatnonzero(np.isin(self.key, self.key[rows]) & self.lazy & ~self.active)
+
+    def activate(self, highs, rows):
+        """
+        This function adds the rows to the HiGHS instance and marks them active
+        """
+        rows = np.unique(np.asarray(rows, dtype = np.int64))
+        block = self.sparse_model.A[rows]
+        inf = highspy.kHighsInf
+        highs.addRows(len(rows),
+                      np.maximum(self.sparse_model.row_lower[rows], -inf),
+                      np.minimum(self.sparse_model.row_upper[rows], inf),
+                      block.nnz, block.indptr[:-1].astype(np.int32), block.indices.astype(np.int32),
+                      block.data)
+        self.active[rows] = True
+
+def _time_left(time_limit, begin):
+    return None if time_limit is None else max(0.0, time_limit - (time.perf_counter() - begin))
+
+def solve_lazy(sparse_model, families = LAZY_FAMILIES, time_limit = None, mip_rel_gap = None,
+               threads = None, tee = False, max_rounds = 100):
+    """
+    This function solves the SparseModel with the rows of families added
+    lazily. The LP relaxation of the reduced model is re-solved from its
+    last basis with the violated rows added until it satisfies them all;
+    then the MILP is solved, the rows violated by its optimum and by
+    every improving schedule found on the way are added, and it is
+    solved again (from the best schedule satisfying every row) until its
+    optimum violates none. That optimum is the optimum of the full
+    model, as every round solves a relaxation of it. Returns the
+    SparseSolution over the full model and the statistics of the rounds
+    """
+    begin = time.perf_counter()
+    lazy = LazyModel(sparse_model, families)
+    stats = {'lazy_rows': int(lazy.lazy.sum()), 'initial_rows': int(lazy.active.sum()),
+             'lp_rounds': 0, 'mip_rounds': 0}
+
+    # LP rounds: the relaxation re-solved from its basis as rows are added
+    highs = fsparse.highs_instance(lazy.reduced_model(), _time_left(time_limit, begin), threads = threads,
+                                   relax = True)
+    while True:
+        if time_limit is not None:
+            highs.setOptionValue('time_limit', _time_left(time_limit, begin))
+        highs.run()
+        if highs.modelStatusToString(highs.getModelStatus()) != 'Optimal':
+            break
+        rows = lazy.separate(highs.getSolution().col_value)
+        if len(rows) == 0:
+            break
+        lazy.activate(highs, lazy.siblings(rows))
+        stats['lp_rounds'] += 1
+    stats['lp_rows'] = int(lazy.active.sum())
+    if tee:
+        print('LP rounds: %d, %d of %d lazy rows added, %.2fs'
+              % (stats['lp_rounds'], int((lazy.active & lazy.lazy).sum()), stats['lazy_rows'],
+                 time.perf_counter() - begin))
+
+    # MIP rounds: every improving schedule is checked against the rows left out
+    best, best_values = np.inf, None
+    found, candidates = [], []
+
+    def improving(event):
+        values = np.array(event.data_out.mip_solution)
+        rows = lazy.separate(values)
+        candidates.append(rows)
+        if len(rows) == 0:
+            found.append((float(sparse_model.c @ values), values))
+
+    # a round whose schedules violate rows left out is cut short and solved again with them
+    def interrupt(event):
+        if any(len(rows) for rows in candidates):
+            event.interrupt()
+
+    status, bound = 'Round limit reached', -np.inf
+    for mip_round in range(max_rounds):
+        left = _time_left(time_limit, begin)
+        if left is not None and left <= 0:
+            status = 'Time limit reached'
+            break
+        # a new instance every round, as an interrupted one stays interrupted
+        highs = fsparse.highs_instance(lazy.reduced_model(), left, mip_rel_gap, threads, tee)
+        highs.cbMipImprovingSolution.subscribe(improving)
+        highs.cbMipInterrupt.subscribe(interrupt)
+        del found[:], candidates[:]
+        solution = fsparse.run_highs(highs, sparse_model, start = best_values)
+        stats['mip_rounds'] += 1
+        if solution.status == 'Infeasible':
+            status = solution.status
+            break
+        bound = max(bound, solution.bound)
+
+        violated = np.empty(0, dtype = np.int64)
+        if len(solution.values) == sparse_model.n_col and np.isfinite(solution.objective):
+            violated = lazy.separate(solution.values)
+            if len(violated) == 0:
+                found.append((solution.objective, solution.values))
+        for objective, values in found:
+            if objective < best:
+                best, best_values = objective, values
+        if solution.status == 'Optimal' and len(violated) == 0:
+            status = 'Optimal'
+            break
+
+        rows = np.unique(np.concatenate([violated] + candidates).astype(np.int64))
+        if tee:
+            print('MIP round %d: %s, objective %.2f, bound %.2f, %d rows violated, %.2fs'
+                  % (mip_round, solution.status, solution.objective, bound, len(rows), time.perf_counter() - begin))
+        if len(rows) == 0:
+            status = solution.status
+            break
+        lazy.active[lazy.siblings(rows)] = True
+
+    stats['rows'] = int(lazy.active.sum())
+    stats['runtime'] = time.perf_counter() - begin
+    values = best_values if best_values is not None else np.zeros(sparse_model.n_col)
+    gap = (best - bound) / max(abs(best), 1e-9) if np.isfinite(best) else np.inf
+    return fsparse.SparseSolution(sparse_model, status, best, bound, gap, stats['runtime'], values), stats
@@ -9,6 +9,25 @@ import Parameters as fpar
 import Variables as fvar
 import Constraints as fcon
 import Auxiliary_Functions as faux
+import Input_Cache as fcache
+import Coded_Input as fcode
+import Sparse_Builder as fsparse
+import Rolling_Horizon as froll
+import Scenario_Batch as fbatch
+import Greedy_Heuristic as fheur
+import Commodity_Aggregation as fagg
+import Presolve as fpre
+import Time_Compression as ftime
+import Instrumentation as finst
+import Solution_Export as fsol
+import Model_Export as fexport
+import Benders as fbenders
+import Solution_Cache as fscache
+import Solver_Portfolio as fport
+import Disruption_Replan as freplan
+import Lazy_Constraints as flazy
+import LP_Rounding as fround
+import Persistent_Solve as fpersist
 
 
 def data_construction(file_name):
@@ -26,40 +45,47 @@ def data_construction(file_name):
     w = ['40ft', '60ft']
     t = [n for n in range(0,49)]
 
-    set_input = faux.SetInput(g, i, j, o, d, l, c, w, t)
-    
+    # open the workbook once; every sheet below is read from it in bulk
+    workbook = faux.open_workbook(file_name)
+
     # Maximum number of wagons on each service
     WMAX = 30
     
     # load single-dimension parameters of set 'i'
-    P = faux.read_par_from_excel(Excel_file,'1DPar_i', (2, 'A'), (6, 'B'), 1)
-    NC = faux.read_par_from_excel(Excel_file,'1DPar_i', (2, 'A'), (6, 'C'), 1)
-    NL = faux.read_par_from_excel(Excel_file,'1DPar_i', (2, 'A'), (6, 'D'), 1)
-    NW = faux.read_par_from_excel(Excel_file,'1DPar_i', (2, 'A'), (6, 'E'), 1)
+    P = workbook.read_par('1DPar_i', (2, 'A'), (6, 'B'), 1)
+    NC = workbook.read_par('1DPar_i', (2, 'A'), (6, 'C'), 1)
+    NL = workbook.read_par('1DPar_i', (2, 'A'), (6, 'D'), 1)
+    NW = workbook.read_par('1DPar_i', (2, 'A'), (6, 'E'), 1)
 
     # load asset ownership information
-    OL = faux.read_par_from_excel(Excel_file,'1DPar_OL', (2, 'A'), (4, 'B'), 1)
-    OW = faux.read_par_from_excel(Excel_file,'1DPar_OW', (2, 'A'), (4, 'B'), 1)
+    OL = workbook.read_par('1DPar_OL', (2, 'A'), (4, 'B'), 1)
+    OW = workbook.read_par('1DPar_OW', (2, 'A'), (4, 'B'), 1)
 
     # load journey time of feasible legs
-    H = faux.read_par_from_excel(Excel_file,'2DPar_H', (2, 'A'), (18, 'C'), 2)
+    H = workbook.read_par('2DPar_H', (2, 'A'), (18, 'C'), 2)
     H = {key:val for key, val in H.items() if val != 0}
 
+    # derive the sparse leg and departure sets from the feasible legs
+    a = faux.feasible_legs(H)
+    at = faux.feasible_departures(H, t)
+
+    set_input = faux.SetInput(g, i, j, o, d, l, c, w, t, a, at)
+
     # load initial number of stationary wagons and locomotives at each node
-    M_init = faux.read_par_from_excel(Excel_file,'2DPar_M0', (2, 'A'), (10, 'C'), 2)
-    WS_init = faux.read_par_from_excel(Excel_file,'2DPar_lw0', (2, 'A'), (10, 'C'), 2)    
+    M_init = workbook.read_par('2DPar_M0', (2, 'A'), (10, 'C'), 2)
+    WS_init = workbook.read_par('2DPar_lw0', (2, 'A'), (10, 'C'), 2)    
 
     # Load cost information
-    FC = faux.read_par_from_excel(Excel_file,'3DPar_FC', (2, 'A'), (34, 'D'), 3)
+    FC = workbook.read_par('3DPar_FC', (2, 'A'), (34, 'D'), 3)
     FC = {key:val for key, val in FC.items() if val != 0}
-    VC = faux.read_par_from_excel(Excel_file,'3DPar_VC', (2, 'A'), (34, 'D'), 3)
+    VC = workbook.read_par('3DPar_VC', (2, 'A'), (34, 'D'), 3)
     VC = {key:val for key, val in VC.items() if val != 0}
 
     # Load Delivery time information
-    tau = faux.read_par_from_excel(Excel_file,'3DPar_Tau', (2, 'A'), (4, 'D'), 3)
+    tau = workbook.read_par('3DPar_Tau', (2, 'A'), (4, 'D'), 3)
 
     # Load Delivery time information
-    S = faux.read_par_from_excel(Excel_file,'5DPar_S', (2, 'A'), (100, 'F'), 5)
+    S = workbook.read_par('5DPar_S', (2, 'A'), (100, 'F'), 5)
 
     fixed_var = faux.ParaFixedInput(tau, H, OL, OW, NC, NL, NW)
 
@@ -67,38 +93,353 @@ def data_construction(file_name):
 
     return set_input, fixed_var, variable_par
 
-def main():
+def cached_data_construction(file_name, coded = False):
     """
-    This is the main function which calls all other functions to solve the
-    optimisation model
+    This function returns the input data objects from the compiled cache
+    of the workbook, and only parses the workbook (and recompiles the
+    cache) when the cache is missing or the workbook content, or the
+    data_construction that parses it, has changed.
+    With coded, the integer-coded input objects of Coded_Input are
+    returned, read straight from the cache arrays; the modes that only
+    build the sparse model ask for them
+    """
+    digest = fcache.file_digest(file_name, data_construction)
+    cache_file = fcache.cache_file_name(file_name)
+
+    data = (fcode.load_coded_input_cache if coded else fcache.load_input_cache)(cache_file, digest)
+    if data is None:
+        data = data_construction(file_name)
+        fcache.compile_input_cache(cache_file, digest, *data)
+        if coded:
+            data = fcode.encode_input(*data)
+
+    return data
+
+def build_model(set_input, fixed_par, variable_par, profiler = None, strengthened = False, reachable = None):
+    """
+    This function takes in the input data objects and returns the
+    initialised Pyomo ConcreteModel. With a profiler, every
+    initialisation step and constraint component is measured. With
+    strengthened, the valid inequalities of the strengthened formulation
+    are added. With reachable (Presolve.reachable_sets), the container
+    flows and stocks, and their rows, are only built where some supply
+    can use them; as the sets follow the supply, such a model is not
+    meant for later edits of S
     """
     # initialise the concreteModel
     RSO_model = ConcreteModel()
 
-    # get the data input as objects
-    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
-    set_input, fixed_par, variable_par = data_construction(Excel_file)
-
     # set initialisation
-    fset.set_initialisation(RSO_model, set_input)
+    with finst.phase(profiler, 'set_initialisation'):
+        fset.set_initialisation(RSO_model, set_input, reachable)
 
-    # parameter initialisation
-    fpar.parameter_initialisation(RSO_model, fixed_par, variable_par)
+    # parameter initialisation (coded parameters handed over as dictionaries)
+    with finst.phase(profiler, 'parameter_initialisation'):
+        fpar.parameter_initialisation(RSO_model, *fcode.decode_parameters(fixed_par, variable_par))
 
     # variable initialisation
-    fvar.variable_initialisation(RSO_model)
+    with finst.phase(profiler, 'variable_initialisation'):
+        fvar.variable_initialisation(RSO_model)
 
     # constraint initialisation
-    fcon.constraint_definition(RSO_model)
+    fcon.constraint_definition(RSO_model, profiler)
+    if strengthened:
+        fcon.strengthening_definition(RSO_model, profiler)
+
+    return RSO_model
+
+def main(profile_file = None, log_phases = False, strengthened = False):
+    """
+    This is the main function which calls all other functions to solve the
+    optimisation model. With profile_file, the wall time, CPU time and
+    memory of every phase (and the rows and nonzeros of every constraint
+    family) are written there as JSON; log_phases prints a line per phase.
+    With strengthened, the model carries the valid inequalities of the
+    strengthened formulation
+    """
+    profiler = finst.Profiler(log_phases) if profile_file or log_phases else None
+
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    with finst.phase(profiler, 'data_construction'):
+        set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    # the container flows and stocks no supply can use are left out of the model
+    with finst.phase(profiler, 'presolve'):
+        index = fsparse.ModelIndex(set_input, fixed_par, variable_par)
+        reachable = fpre.reachable_sets(index)
+
+    RSO_model = build_model(set_input, fixed_par, variable_par, profiler, strengthened, reachable)
+
+    # warm start from the greedy schedule when it is feasible (the sparse
+    # rows of the same index check the schedule and lay out its columns)
+    with finst.phase(profiler, 'warm_start'):
+        sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par, index = index)
+        start_values, violated = fheur.greedy_schedule(sparse_model)
+        warmstart = len(violated) == 0
+        if warmstart:
+            fheur.pyomo_warm_start(RSO_model, sparse_model, start_values)
+        else:
+            print('greedy schedule violates %d rows: solving without a warm start' % len(violated))
 
     # set up the model
     opt = SolverFactory('cplex')
 
-    results = opt.solve(RSO_model, tee = True, symbolic_solver_labels = True)
+    # the solver interface writes the LP file, runs the solver and reads
+    # its solution back: each step is measured as a phase of its own
+    opt._convert_problem = finst.timed(profiler, 'lp_write', opt._convert_problem)
+    opt._apply_solver = finst.timed(profiler, 'solve', opt._apply_solver)
+    opt._postsolve = finst.timed(profiler, 'solution_read', opt._postsolve)
+    results = opt.solve(RSO_model, tee = True, symbolic_solver_labels = True, warmstart = warmstart)
 
-    RSO_model.solutions.store_to(results)
-    
+    # solver status to solution.yml, the nonzero schedule as columnar tables
     results.write(filename = 'solution.yml')
+    tables = fsol.solution_tables(sparse_model, fsol.pyomo_column_values(RSO_model, sparse_model))
+    fsol.write_solution(tables, 'solution.npz')
+
+    if profiler is not None:
+        profiler.count_rows(RSO_model, ['constraint%d' % n for n in range(1, 23)])
+        if profile_file:
+            profiler.write(profile_file)
+
+def main_sparse(cross_check = False, presolve = True):
+    """
+    This is the main function of the sparse-matrix backend: the same
+    model built directly as NumPy/SciPy arrays and solved in-process with
+    HiGHS. With cross_check, the Pyomo model is built as well and the two
+    are compared row by row before solving (small instances only). With
+    presolve, the unreachable container columns are removed first
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par)
+
+    if cross_check:
+        RSO_model = build_model(set_input, fixed_par, variable_par)
+        mismatches = fsparse.cross_check(RSO_model, sparse_model)
+        if mismatches:
+            raise ValueError('sparse model differs from the Pyomo model:\n' + '\n'.join(mismatches))
+
+    start_values, violated = fheur.greedy_schedule(sparse_model)
+    start = start_values if len(violated) == 0 else None
+
+    if presolve:
+        return fpre.solve_presolved(sparse_model, tee = True, start = start)[0]
+
+    return fsparse.solve_highs(sparse_model, tee = True, start = start)
+
+def main_aggregated():
+    """
+    This is the main function of the aggregated mode: customers with the
+    same destination and deadlines are merged into one commodity for the
+    solve, and the container flows are split back per customer
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    return fagg.solve_aggregated(set_input, fixed_par, variable_par, tee = True)
+
+def main_compressed(max_gap = 4, cross_check = False):
+    """
+    This is the main function of the compressed-timeline mode: the
+    periods without events are merged into buckets of at most max_gap
+    periods and the sparse model is built and solved on that timeline.
+    With cross_check, the Pyomo model of the compressed input is built as
+    well and compared with it row by row before solving
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    set_input, variable_par = ftime.compress_timeline(set_input, fixed_par, variable_par, max_gap)
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par)
+
+    if cross_check:
+        RSO_model = build_model(set_input, fixed_par, variable_par)
+        mismatches = fsparse.cross_check(RSO_model, sparse_model)
+        if mismatches:
+            raise ValueError('sparse model differs from the Pyomo model:\n' + '\n'.join(mismatches))
+
+    return fsparse.solve_highs(sparse_model, tee = True)
+
+def main_benders(time_limit = None):
+    """
+    This is the main function of the decomposition mode: the services are
+    chosen in a master problem and the wagons and containers routed over
+    them in a subproblem, until the proven gap closes
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par)
+
+    return fbenders.solve_benders(sparse_model, time_limit = time_limit, tee = True)
+
+def main_lazy(time_limit = None):
+    """
+    This is the main function of the lazy-constraint mode: the storage
+    limits, the transport capacity and the wagon mix only enter the model
+    once a candidate schedule violates them
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par)
+    solution, stats = flazy.solve_lazy(sparse_model, time_limit = time_limit, tee = True)
+    print('%(rows)d of the model rows used, %(lp_rounds)d LP and %(mip_rounds)d MIP rounds' % stats)
+
+    return solution
+
+def main_cached(cache_folder = 'solution_cache', max_bytes = 256 * 2**20):
+    """
+    This is the main function of the cached mode: a workbook solved
+    before under the same options is answered from the solution cache,
+    and a changed one is solved from the closest cached schedule on the
+    same network
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    cache = fscache.SolutionCache(cache_folder, max_bytes)
+    solution, source = cache.solve(set_input, fixed_par, variable_par, tee = True)
+    print('solution from the cache: %s' % source)
+
+    return solution
+
+def main_portfolio(time_limit = 600, n_racers = None):
+    """
+    This is the main function of the portfolio mode: the model is raced
+    on the MIP solvers installed here (HiGHS always, with several seeds)
+    instead of CPLEX alone, and the first proven optimum or the best
+    schedule within time_limit is kept
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    solution, racers = fport.solve_portfolio(set_input, fixed_par, variable_par,
+                                             fport.default_portfolio(n_racers), time_limit)
+    for racer in racers:
+        print('%(racer)-16s %(status)-22s objective %(objective)s, bound %(bound)s, start %(start)s, '
+              '%(runtime).1fs' % racer)
+
+    return solution
+
+def main_replan(values, disruption, time_limit = 60):
+    """
+    This is the main function of the re-plan mode: values holds the
+    column values of the schedule running (e.g. SparseSolution.values)
+    and disruption the Disruption_Replan.Disruption that hit it; the
+    schedule before the disruption is kept and only the remaining
+    periods are re-optimised
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    return freplan.replan(set_input, fixed_par, variable_par, values, disruption,
+                          time_limit = time_limit, tee = True)
+
+def main_what_if(edits, time_limit = None):
+    """
+    This is the main function of the what-if mode: the Pyomo model is
+    solved once in a persistent solver, then every dictionary in edits
+    (e.g. {'S': {...}, 'FC': {...}}) is applied to its mutable parameters
+    and the model re-solved from the previous schedule; the objective of
+    every run is returned
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    session = fpersist.PyomoSession(set_input, fixed_par, variable_par, time_limit = time_limit)
+    objectives = []
+    for changes in [{}] + list(edits):
+        n_changed = session.update(**changes)
+        results, runtime = session.solve()
+        objectives.append(value(session.model.objective_function))
+        print('%d entries changed: %s, objective %s, %.1fs'
+              % (n_changed, results.solver.termination_condition, objectives[-1], runtime))
+
+    return objectives
+
+def main_export(file_name = 'RSO_model.mps.gz'):
+    """
+    This is the main function of the export mode: the model is streamed
+    to file_name (MPS or LP, optionally gzip-compressed) for an offline
+    solve, without building the Pyomo model, and the name of the name map
+    written next to it is returned
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    return fexport.export_model(set_input, fixed_par, variable_par, file_name)
+
+def main_quick_plan():
+    """
+    This is the main function of the quick plan mode: the greedy
+    schedule on its own, without any solver
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par)
+
+    return fheur.quick_plan(sparse_model)
+
+def main_fast_plan(time_limit = 30, strengthened = True):
+    """
+    This is the main function of the fast plan mode: the LP relaxation
+    solved once and rounded to a schedule in small restricted MILPs,
+    reported against the LP bound (tighter on the strengthened model)
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par, strengthened = strengthened)
+
+    return fround.solve_rounded(sparse_model, time_limit = time_limit, tee = True)
+
+def main_rolling(window = 24, overlap = 6):
+    """
+    This is the main function of the rolling-horizon mode: the horizon is
+    solved in windows of window periods, each overlapping the next by
+    overlap periods
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file, coded = True)
+
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, variable_par)
+
+    return froll.solve_rolling_horizon(sparse_model, window, overlap, tee = True)
+
+def main_scenarios(scenario_sheets, workers = None, threads = 1):
+    """
+    This is the main function of the scenario batch mode: every sheet in
+    scenario_sheets holds an alternative supply table laid out like
+    5DPar_S, and all of them are solved in parallel against the network
+    and fleet of the workbook
+    """
+    # get the data input as objects
+    Excel_file = 'Pyomo_RSO_Parameter_Input.xlsx'
+    set_input, fixed_par, variable_par = cached_data_construction(Excel_file)
+
+    scenarios = fbatch.read_supply_scenarios(faux.open_workbook(Excel_file), scenario_sheets)
+    results = fbatch.run_scenarios(set_input, fixed_par, variable_par, scenarios,
+                                   workers = workers, threads = threads)
+    results.to_csv('scenario_results.csv', index = False)
+
+    return results
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,249 @@
+###############################################
+# This documents contains the streaming model #
+# export: the formulation written straight ####
+# from the index data to an LP or MPS file ####
+# (optionally gzip-compressed), one ###########
+# constraint family at a time, with short #####
+# names and a compact name map on the side. ###
+
+# Import nccessary packages
+import gzip
+import json
+import os
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+import Sparse_Builder as fsparse
+
+# number of terms per line of the LP file
+LP_TERMS_PER_LINE = 8
+
+# record layout of the matrix entries spilled to disk for the MPS columns
+ENTRY = np.dtype([('col', '<i8'), ('row', '<i8'), ('val', '<f8')])
+BOUND = np.dtype([('row', '<i8'), ('lower', '<f8'), ('upper', '<f8')])
+
+
+def open_text(file_name):
+    """
+    This function opens file_name for writing text, gzip-compressed when
+    the name ends with .gz
+    """
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, 'wt', compresslevel = 6)
+    return open(file_name, 'w')
+
+def _number(val):
+    return '%.17g' % val
+
+def name_map_file(file_name):
+    """
+    This function returns the name of the name map kept next to the
+    exported file
+    """
+    stem = file_name[:-3] if file_name.endswith('.gz') else file_name
+    return os.path.splitext(stem)[0] + '.names.json'
+
+def _space_labels(space):
+    return [[list(label) if isinstance(label, tuple) else label for label in dim] for dim in space.labels]
+
+def write_name_map(file_name, columns, families):
+    """
+    This function writes the name map: column cN is position N - offset
+    of the variable family whose range holds it, and row rN likewise of
+    its constraint family (through index when the family skips rows),
+    each position unravelled over the labels of the family
+    """
+    name_map = {
+    'columns': [
+               {'name': family.name, 'offset': family.offset, 'count': family.space.size,
+                'labels': _space_labels(family.space)}
+               for family in columns.values()
+               ],
+    'rows': families,
+    }
+    with open(file_name, 'w') as handle:
+        json.dump(name_map, handle, default = lambda val: val.item())
+
+def row_entry(family, offset):
+    """
+    This function returns the name map entry of a constraint family
+    """
+    entry = {'name': family.name, 'rule': family.rule, 'offset': offset, 'count': len(family),
+             'labels': _space_labels(family.space)}
+    if len(family) != family.space.size:
+        entry['index'] = family.index.tolist()
+    return entry
+
+def _streamed_families(index, columns):
+    """
+    This function yields the constraint families one at a time with the
+    model row of their first row, each as a CSR block of its own rows
+    """
+    n_col = sum(family.space.size for family in columns.values())
+    offset = 0
+    for family in fsparse.constraint_families(index, columns):
+        block = sp.csr_matrix((family.vals, (family.rows, family.cols)), shape = (len(family), n_col))
+        block.sum_duplicates()
+        yield family, offset, block
+        offset += len(family)
+
+def _lp_expression(handle, cols, vals):
+    """
+    This function writes the terms of one row or of the objective
+    """
+    if len(cols) == 0:
+        handle.write(' 0 c0')
+    for n, (col, val) in enumerate(zip(cols.tolist(), vals.tolist())):
+        if n and n % LP_TERMS_PER_LINE == 0:
+            handle.write('\n   ')
+        handle.write(' %s%s c%d' % ('+' if val >= 0 else '-', _number(abs(val)), col))
+
+def _lp_names(handle, cols):
+    for start in range(0, len(cols), LP_TERMS_PER_LINE * 2):
+        handle.write(' ' + ' '.join('c%d' % col for col in cols[start:start + LP_TERMS_PER_LINE * 2].tolist()) + '\n')
+
+def write_lp(set_input, fixed_par, var_par, file_name):
+    """
+    This function streams the model to file_name in CPLEX LP format,
+    constraint family by constraint family, and writes the name map next
+    to it. Rows bounded on both sides are written as a >= row rN and a
+    <= row rN_u
+    """
+    index = fsparse.ModelIndex(set_input, fixed_par, var_par)
+    columns = fsparse.variable_families(index)
+    c = fsparse.objective_vector(index, columns)
+    families = []
+
+    with open_text(file_name) as handle:
+        handle.write('\\ Rail scheduling model, names in %s\n' % os.path.basename(name_map_file(file_name)))
+        handle.write('Minimize\n obj:')
+        cols = np.flatnonzero(c)
+        _lp_expression(handle, cols, c[cols])
+        handle.write('\nSubject To\n')
+
+        for family, offset, block in _streamed_families(index, columns):
+            families.append(row_entry(family, offset))
+            for r in range(block.shape[0]):
+                cols = block.indices[block.indptr[r]:block.indptr[r + 1]]
+                vals = block.data[block.indptr[r]:block.indptr[r + 1]]
+                lower, upper = family.lower[r], family.upper[r]
+                senses = [('=', lower)] if lower == upper else \
+                         [(sense, bound) for sense, bound in (('>=', lower), ('<=', upper)) if np.isfinite(bound)]
+                for n, (sense, bound) in enumerate(senses):
+                    handle.write(' r%d%s:' % (offset + r, '_u' if n else ''))
+                    _lp_expression(handle, cols, vals)
+                    handle.write(' %s %s\n' % (sense, _number(bound)))
+
+        binary = np.zeros(len(c), dtype = bool)
+        upper = np.concatenate([np.full(family.space.size, family.upper) for family in columns.values()])
+        binary[upper == 1] = True
+        handle.write('Bounds\n')
+        for col in np.flatnonzero(~binary & np.isfinite(upper)).tolist():
+            handle.write(' 0 <= c%d <= %s\n' % (col, _number(upper[col])))
+        handle.write('Binaries\n')
+        _lp_names(handle, np.flatnonzero(binary))
+        handle.write('Generals\n')
+        _lp_names(handle, np.flatnonzero(~binary))
+        handle.write('End\n')
+
+    write_name_map(name_map_file(file_name), columns, families)
+
+def write_mps(set_input, fixed_par, var_par, file_name, bucket_cols = 1 << 20):
+    """
+    This function streams the model to file_name in free MPS format and
+    writes the name map next to it. The ROWS section is written while the
+    constraint families are generated; as MPS lists the matrix by column,
+    the entries are spilled to temporary files per range of bucket_cols
+    columns and each range is sorted and written on its own, so memory
+    stays bounded by one family and one column range
+    """
+    index = fsparse.ModelIndex(set_input, fixed_par, var_par)
+    columns = fsparse.variable_families(index)
+    c = fsparse.objective_vector(index, columns)
+    n_col = len(c)
+    upper = np.concatenate([np.full(family.space.size, family.upper) for family in columns.values()])
+    n_bucket = max(1, -(-n_col // bucket_cols))
+    families = []
+
+    with tempfile.TemporaryDirectory() as folder, open_text(file_name) as handle:
+        spills = [open(os.path.join(folder, 'entries_%d' % b), 'wb') for b in range(n_bucket)]
+        bounds = open(os.path.join(folder, 'bounds'), 'wb')
+
+        handle.write('NAME RSO\nROWS\n N obj\n')
+        for family, offset, block in _streamed_families(index, columns):
+            families.append(row_entry(family, offset))
+            rows = offset + np.arange(block.shape[0])
+            sense = np.where(family.lower == family.upper, 'E',
+                    np.where(np.isfinite(family.lower), 'G', np.where(np.isfinite(family.upper), 'L', 'N')))
+            handle.writelines(' %s r%d\n' % (s, row) for s, row in zip(sense.tolist(), rows.tolist()))
+
+            record = np.empty(len(rows), dtype = BOUND)
+            record['row'], record['lower'], record['upper'] = rows, family.lower, family.upper
+            record.tofile(bounds)
+
+            coo = block.tocoo()
+            entries = np.empty(coo.nnz, dtype = ENTRY)
+            entries['col'], entries['row'], entries['val'] = coo.col, offset + coo.row, coo.data
+            for b in range(n_bucket):
+                entries[entries['col'] // bucket_cols == b].tofile(spills[b])
+        for spill in spills:
+            spill.close()
+        bounds.close()
+
+        handle.write("COLUMNS\n    MARKER 'MARKER' 'INTORG'\n")
+        for b in range(n_bucket):
+            entries = np.fromfile(os.path.join(folder, 'entries_%d' % b), dtype = ENTRY)
+            entries = entries[np.lexsort((entries['row'], entries['col']))]
+            first, last = b * bucket_cols, min((b + 1) * bucket_cols, n_col)
+            starts = np.searchsorted(entries['col'], np.arange(first, last + 1))
+            for col in range(first, last):
+                if c[col] or starts[col - first] == starts[col - first + 1]:
+                    handle.write('    c%d obj %s\n' % (col, _number(c[col])))
+                chunk = entries[starts[col - first]:starts[col - first + 1]]
+                handle.writelines('    c%d r%d %s\n' % (col, row, _number(val))
+                                  for row, val in zip(chunk['row'].tolist(), chunk['val'].tolist()))
+        handle.write("    MARKER 'MARKER' 'INTEND'\n")
+
+        bounds = np.memmap(os.path.join(folder, 'bounds'), dtype = BOUND, mode = 'r') \
+                 if os.path.getsize(os.path.join(folder, 'bounds')) else np.empty(0, dtype = BOUND)
+        handle.write('RHS\n')
+        for start in range(0, len(bounds), bucket_cols):
+            chunk = np.array(bounds[start:start + bucket_cols])
+            rhs = np.where(np.isfinite(chunk['lower']), chunk['lower'], chunk['upper'])
+            keep = np.isfinite(rhs) & (rhs != 0)
+            handle.writelines(' rhs r%d %s\n' % (row, _number(val))
+                              for row, val in zip(chunk['row'][keep].tolist(), rhs[keep].tolist()))
+        handle.write('RANGES\n')
+        for start in range(0, len(bounds), bucket_cols):
+            chunk = np.array(bounds[start:start + bucket_cols])
+            ranged = np.isfinite(chunk['lower']) & np.isfinite(chunk['upper']) & (chunk['lower'] != chunk['upper'])
+            handle.writelines(' rng r%d %s\n' % (row, _number(val))
+                              for row, val in zip(chunk['row'][ranged].tolist(),
+                                                  (chunk['upper'] - chunk['lower'])[ranged].tolist()))
+        del bounds
+
+        handle.write('BOUNDS\n')
+        handle.writelines(' BV bnd c%d\n' % col if upper[col] == 1 else
+                          (' UP bnd c%d %s\n' % (col, _number(upper[col])) if np.isfinite(upper[col])
+                           else ' PL bnd c%d\n' % col)
+                          for col in range(n_col))
+        handle.write('ENDATA\n')
+
+    write_name_map(name_map_file(file_name), columns, families)
+
+def export_model(set_input, fixed_par, var_par, file_name):
+    """
+    This function streams the model to file_name, as MPS or LP after its
+    extension (.mps, .lp, each optionally followed by .gz), and returns
+    the name of the name map written next to it
+    """
+    stem = file_name[:-3] if file_name.endswith('.gz') else file_name
+    if stem.endswith('.mps'):
+        write_mps(set_input, fixed_par, var_par, file_name)
+    elif stem.endswith('.lp'):
+        write_lp(set_input, fixed_par, var_par, file_name)
+    else:
+        raise ValueError('export file names end with .mps, .lp, .mps.gz or .lp.gz')
+    return name_map_file(file_name)
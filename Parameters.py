@@ -1,5 +1,8 @@
 import pyomo.environ as pyo
 
+# parameters planners edit between runs; the model keeps them mutable
+MUTABLE_PARAMETERS = ('S', 'FC', 'VC', 'OL', 'OW')
+
 def parameter_initialisation(optimisation_model, fixed_par_input, var_par_input):
     """
     This function takes the model input (optimisation_model) and the
@@ -13,34 +16,32 @@ def parameter_initialisation(optimisation_model, fixed_par_input, var_par_input)
                              )
 
     optimisation_model.H = pyo.Param(
-                           optimisation_model.i, optimisation_model.j,
+                           optimisation_model.a,
                            initialize = fixed_par_input.H,
                            doc = 'time spent by locomotives to travel from node i to j'
                            )
 
     optimisation_model.FC = pyo.Param(
-                            optimisation_model.l, optimisation_model.i,
-                            optimisation_model.j,
-                            initialize = var_par_input.FC,
+                            optimisation_model.l, optimisation_model.a,
+                            initialize = var_par_input.FC, default = 0, mutable = True,
                             doc = 'fixed cost of running a service with locomotive (of type l) from i to j'
                             )
 
     optimisation_model.VC = pyo.Param(
-                            optimisation_model.w, optimisation_model.i,
-                            optimisation_model.j,
-                            initialize = var_par_input.VC,
+                            optimisation_model.w, optimisation_model.a,
+                            initialize = var_par_input.VC, default = 0, mutable = True,
                             doc = 'incremental cost of moving an extra wagon (of type w) from i to j'
                             )
 
     optimisation_model.OL = pyo.Param(
                             optimisation_model.l,
-                            initialize = fixed_par_input.OL,
+                            initialize = fixed_par_input.OL, mutable = True,
                             doc = 'number of locomotives (of type l) owned'
                             )
 
     optimisation_model.OW = pyo.Param(
                             optimisation_model.w,
-                            initialize = fixed_par_input.OW,
+                            initialize = fixed_par_input.OW, mutable = True,
                             doc = 'number of wagons (of type l) owned'
                             )
 
@@ -59,7 +60,7 @@ def parameter_initialisation(optimisation_model, fixed_par_input, var_par_input)
                            optimisation_model.c, optimisation_model.g,
                            optimisation_model.i, optimisation_model.d,
                            optimisation_model.t,
-                           initialize = var_par_input.S,
+                           initialize = var_par_input.S, default = 0, mutable = True,
                            doc = 'supply of containers (of type c) at time t for customer g at node i for destination d'
                            )
 
@@ -82,7 +83,7 @@ def parameter_initialisation(optimisation_model, fixed_par_input, var_par_input)
                             )
     
     optimisation_model.M_init = pyo.Param(
-                                optimisation_model.l, optimisation_model.l,
+                                optimisation_model.l, optimisation_model.i,
                                 initialize = var_par_input.M_init,
                                 doc = 'initial # locomotives (of type l) stationed at i'
                                 )
@@ -92,3 +93,21 @@ def parameter_initialisation(optimisation_model, fixed_par_input, var_par_input)
                                  initialize = var_par_input.WS_init,
                                  doc = 'initial # wagons (of type l) stationed at i'
                                  )
+
+def parameter_update(optimisation_model, **changes):
+    """
+    This function takes in the model and new values for any of its
+    mutable parameters (S, FC, VC, OL, OW) as dictionaries keyed like
+    their input, sets only the entries whose value changed so that a
+    persistent solver has the least to push, and returns how many were set
+    """
+    n_changed = 0
+    for name, values in changes.items():
+        if name not in MUTABLE_PARAMETERS:
+            raise ValueError('parameter %s is not mutable' % name)
+        param = getattr(optimisation_model, name)
+        for key, val in values.items():
+            if pyo.value(param[key]) != val:
+                param[key] = val
+                n_changed += 1
+    return n_changed
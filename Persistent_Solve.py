@@ -0,0 +1,200 @@
+###############################################
+# This documents contains the persistent ######
+# solver sessions used for what-if runs: the #
+# model stays loaded in one HiGHS instance ####
+# (or a Pyomo persistent solver) and edits of #
+# S, FC, VC, OL and OW are pushed as the row ##
+# bounds and costs they touch before ##########
+# re-solving. #################################
+
+# Import nccessary packages
+import copy
+import time
+
+import numpy as np
+import pyomo.environ as pyo
+
+import Parameters as fpar
+import Sparse_Builder as fsparse
+
+
+class PersistentSession():
+    """
+    This is an object that keeps the SparseModel of one input loaded in a
+    HiGHS instance between solves. update() turns an edit of the supply
+    S, the costs FC/VC or the fleet sizes OL/OW into the changed row
+    bounds and column costs only, and solve() re-solves from the basis
+    and incumbent of the previous solve
+    """
+    def __init__(self, set_input, fixed_par, var_par, time_limit = None,
+                 mip_rel_gap = None, threads = None, tee = False):
+        self.fixed_par = copy.deepcopy(fixed_par)
+        self.var_par = copy.deepcopy(var_par)
+        self.sparse_model = fsparse.build_sparse_model(set_input, self.fixed_par, self.var_par)
+        self.index = self.sparse_model.index
+        self.highs = fsparse.highs_instance(self.sparse_model, time_limit, mip_rel_gap, threads, tee)
+        self.solution = None
+
+        # departures k along every leg, to find the columns a leg cost prices
+        self.leg_departures = {}
+        for k, (i, j, t) in enumerate(self.index.at):
+            self.leg_departures.setdefault((i, j), []).append(k)
+
+    def _row(self, family_name, flat):
+        """
+        This function returns the model row of a position in an
+        uncompressed constraint family
+        """
+        return self.sparse_model.row_offset[family_name] + flat
+
+    def _supply_rows(self, key, delta, lower, upper):
+        """
+        This function shifts the bounds of the container balance and
+        demand tracking rows that the supply entry key feeds by delta
+        """
+        index, model = self.index, self.sparse_model
+        c, g, i, d, t = key
+        f, i, t = index.commodity(c, g, d), index.i_pos[i], index.t_pos[t]
+
+        row = self._row('constraint3', (f * index.nI + i) * index.nT + t)
+        lower[row] = lower.get(row, model.row_lower[row]) + delta
+        upper[row] = upper.get(row, model.row_upper[row]) + delta
+
+        due = min(index.due_period(f, i, t), index.nT - 1)
+        for tp in range(due, index.nT):
+            row = self._row('constraint12', f * index.nT + tp)
+            lower[row] = lower.get(row, model.row_lower[row]) + delta
+            upper.setdefault(row, model.row_upper[row])
+
+    def _refresh_supply(self, supply):
+        """
+        This function carries the edited supply {(f, i, t): value} over to
+        the supply arrays of the ModelIndex, so that what reads them after
+        the update (e.g. stocks_from_flows) sees the new supply
+        """
+        index = self.index
+        position = {key: n for n, key in enumerate(zip(index.s_f.tolist(), index.s_i.tolist(), index.s_t.tolist()))}
+        s_val = index.s_val.copy()
+        new = []
+        for key, val in supply.items():
+            if key in position:
+                s_val[position[key]] = val
+            elif val != 0:
+                new.append(key + (val,))
+        keep = s_val != 0
+        new = np.array(new, dtype = np.float64).reshape(-1, 4)
+        index.s_f = np.concatenate([index.s_f[keep], new[:, 0].astype(np.int64)])
+        index.s_i = np.concatenate([index.s_i[keep], new[:, 1].astype(np.int64)])
+        index.s_t = np.concatenate([index.s_t[keep], new[:, 2].astype(np.int64)])
+        index.s_val = np.concatenate([s_val[keep], new[:, 3]])
+
+    def update(self, S = None, FC = None, VC = None, OL = None, OW = None):
+        """
+        This function takes in dictionaries of edited parameter entries
+        (keyed like the input), pushes only the row bounds and column
+        costs they change to the solver, carries them over to the
+        ModelIndex and returns how many entries changed
+        """
+        index, model = self.index, self.sparse_model
+        lower, upper, costs, supply = {}, {}, {}, {}
+        n_changed = 0
+
+        for key, val in (S or {}).items():
+            delta = val - self.var_par.S.get(key, 0)
+            if delta:
+                self._supply_rows(key, delta, lower, upper)
+                c, g, i, d, t = key
+                supply[index.commodity(c, g, d), index.i_pos[i], index.t_pos[t]] = val
+                self.var_par.S[key] = val
+                n_changed += 1
+        if supply:
+            self._refresh_supply(supply)
+
+        for name, values, flow, sets in (('FC', FC, 'x', index.l_pos), ('VC', VC, 'WM', index.w_pos)):
+            current = getattr(self.var_par, name)
+            offset = model.columns[flow].offset
+            for (k0, i, j), val in (values or {}).items():
+                if current.get((k0, i, j), 0) != val:
+                    for k in self.leg_departures.get((i, j), []):
+                        costs[offset + sets[k0] * index.nK + k] = val
+                        getattr(index, name)[sets[k0], k] = val
+                    current[k0, i, j] = val
+                    n_changed += 1
+
+        for name, values, family_name, sets in (('OL', OL, 'constraint7', index.l_pos),
+                                                ('OW', OW, 'constraint6', index.w_pos)):
+            current = getattr(self.fixed_par, name)
+            for k0, val in (values or {}).items():
+                if current[k0] != val:
+                    for tp in range(index.nT):
+                        row = self._row(family_name, sets[k0] * index.nT + tp)
+                        lower.setdefault(row, model.row_lower[row])
+                        upper[row] = val
+                    getattr(index, name)[sets[k0]] = val
+                    current[k0] = val
+                    n_changed += 1
+
+        if lower:
+            rows = np.array(sorted(lower), dtype = np.int32)
+            model.row_lower[rows] = [lower[row] for row in rows.tolist()]
+            model.row_upper[rows] = [upper[row] for row in rows.tolist()]
+            self.highs.changeRowsBounds(len(rows), rows, model.row_lower[rows], model.row_upper[rows])
+        if costs:
+            cols = np.array(sorted(costs), dtype = np.int32)
+            model.c[cols] = [costs[col] for col in cols.tolist()]
+            self.highs.changeColsCost(len(cols), cols, model.c[cols])
+        return n_changed
+
+    def solve(self):
+        """
+        This function re-solves the loaded model, starting from the previous
+        incumbent (HiGHS keeps the previous basis itself), and returns the
+        SparseSolution
+        """
+        start = None if self.solution is None else self.solution.values
+        self.solution = fsparse.run_highs(self.highs, self.sparse_model, start = start)
+        return self.solution
+
+class PyomoSession():
+    """
+    This is an object that keeps the Pyomo model of one input loaded in a
+    Pyomo persistent solver (appsi_highs by default) between solves.
+    update() sets the edited entries of the mutable parameters S, FC, VC,
+    OL and OW through Parameters.parameter_update, and the solver pushes
+    only the coefficients and bounds they touch at the next solve(),
+    which starts from the previous schedule
+    """
+    def __init__(self, set_input, fixed_par, var_par, solver = 'appsi_highs', time_limit = None,
+                 mip_rel_gap = None, tee = False):
+        import Main
+
+        self.model = Main.build_model(set_input, fixed_par, var_par)
+        self.opt = pyo.SolverFactory(solver)
+        if time_limit is not None:
+            self.opt.config.time_limit = time_limit
+        if mip_rel_gap is not None:
+            self.opt.config.mip_gap = mip_rel_gap
+        self.opt.config.stream_solver = bool(tee)
+        self.results = None
+
+    def update(self, **changes):
+        """
+        This function takes in dictionaries of edited parameter entries
+        (keyed like the input, e.g. S = {...}), sets them on the model and
+        returns how many entries changed
+        """
+        return fpar.parameter_update(self.model, **changes)
+
+    def solve(self):
+        """
+        This function re-solves the loaded model, warm started from the
+        previous schedule once there is one, and returns the results with
+        the solve time
+        """
+        self.opt.config.warmstart = self.results is not None
+        begin = time.perf_counter()
+        self.results = self.opt.solve(self.model, load_solutions = False)
+        runtime = time.perf_counter() - begin
+        if len(self.results.solution) > 0:
+            self.model.solutions.load_from(self.results)
+        return self.results, runtime
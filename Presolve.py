@@ -0,0 +1,157 @@
+###############################################
+# This documents contains the reachability ####
+# presolve: container flows and stocks that ###
+# no supply can reach, or that could no #######
+# longer get to their destination in time, ####
+# are removed before the model is solved. #####
+
+# Import nccessary packages
+import numpy as np
+
+import Sparse_Builder as fsparse
+import Greedy_Heuristic as fheur
+
+
+class PresolveReport():
+    """
+    This is an object that records how many columns of every variable and
+    rows of every constraint family the presolve removed
+    """
+    def __init__(self, sparse_model, keep_cols, keep_rows):
+        self.columns = {
+        name: int(family.space.size - keep_cols[family.offset:family.offset + family.space.size].sum())
+        for name, family in sparse_model.columns.items()
+        }
+        self.rows = {
+        family.name: int(len(family) - keep_rows[sparse_model.row_offset[family.name]:
+                                                 sparse_model.row_offset[family.name] + len(family)].sum())
+        for family in sparse_model.families
+        }
+        self.n_col, self.n_row = sparse_model.n_col, sparse_model.n_row
+        self.removed_cols = sum(self.columns.values())
+        self.removed_rows = sum(self.rows.values())
+
+    def summary(self):
+        """
+        This function returns the report as printable lines
+        """
+        lines = ['presolve removed %d of %d columns and %d of %d rows'
+                 % (self.removed_cols, self.n_col, self.removed_rows, self.n_row)]
+        lines += ['  %s: %d columns' % (name, n) for name, n in self.columns.items() if n]
+        lines += ['  %s: %d rows' % (name, n) for name, n in self.rows.items() if n]
+        return lines
+
+def commodity_windows(index):
+    """
+    This function returns, as time values, for every commodity and node
+    (nF, nI) the earliest period supply of the commodity can be there and
+    the latest period it is still of use there: the last deadline under
+    demand_tracking among the supply entries that can pass the node and
+    still reach their destination in time, following the shortest
+    journey times. Pairs no such supply passes get an empty window
+    """
+    dist = fheur.shortest_routes(index)[0]
+    dest = index.d_node[index.f_d[index.s_f]]
+    due = index.t_val[np.minimum(index.release_period(), index.nT - 1)].astype(np.float64)
+
+    # arrival of every supply entry at every node, and whether it is still in time from there
+    arrival = index.t_val[index.s_t][:, None] + dist[index.s_i]
+    useful = arrival + dist[:, dest].T <= due[:, None]
+
+    s, i = np.nonzero(useful)
+    earliest = np.full((index.nF, index.nI), np.inf)
+    latest = np.full((index.nF, index.nI), -np.inf)
+    np.minimum.at(earliest, (index.s_f[s], i), arrival[s, i])
+    np.maximum.at(latest, (index.s_f[s], i), due[s])
+    return dist, earliest, latest, useful
+
+def reachable_masks(index):
+    """
+    This function returns the masks of the CM (nF, nK) and CS (nF, nI, nT)
+    columns that can be nonzero in a feasible schedule. CM[f, k] needs
+    supply of f at the departure node by the departure period and, after
+    the arrival, enough time left to reach the destination of f by the
+    latest period f is of use at the arrival node (once complete, the
+    stock at the destination must stay there). CS[f, i, t] likewise needs
+    supply at i by t and, away from the destination, a departure from
+    t + 1 on that still arrives in time
+    """
+    dist, earliest, latest = commodity_windows(index)[:3]
+    dest = index.d_node[index.f_d]
+
+    f, k = np.divmod(np.arange(index.nF * index.nK, dtype = np.int64), index.nK)
+    j = index.dep_j[k]
+    CM = (earliest[f, index.dep_i[k]] <= index.t_val[index.dep_t[k]]) \
+         & (index.t_val[index.arr_t[k]] + dist[j, dest[f]] <= latest[f, j])
+
+    f, i, t = np.unravel_index(np.arange(index.nF * index.nI * index.nT, dtype = np.int64),
+                               (index.nF, index.nI, index.nT))
+    CS = (earliest[f, i] <= index.t_val[t]) \
+         & ((i == dest[f]) | (index.t_val[t] + 1 + dist[i, dest[f]] <= latest[f, i]))
+    return CM.reshape(index.nF, index.nK), CS.reshape(index.nF, index.nI, index.nT)
+
+def reachable_columns(sparse_model):
+    """
+    This function returns a mask of the columns that can be nonzero in a
+    feasible schedule (every column of the other variables, the CM and
+    CS columns of reachable_masks)
+    """
+    keep = np.ones(sparse_model.n_col, dtype = bool)
+    for name, mask in zip(('CM', 'CS'), reachable_masks(sparse_model.index)):
+        family = sparse_model.columns[name]
+        keep[family.offset:family.offset + family.space.size] = mask.ravel()
+    return keep
+
+def reachable_sets(index):
+    """
+    This function takes in the ModelIndex and returns the index keys of
+    the CM (c, g, d, i, j, t) and CS (c, g, d, i, t) variables that can be
+    nonzero, in set order, so build_model creates only those. Raises
+    ValueError when some supply cannot reach its destination in time
+    """
+    useful = commodity_windows(index)[3]
+    if not useful[np.arange(len(index.s_f)), index.s_i].all():
+        raise ValueError('supply cannot reach its destination in time: the input is infeasible')
+
+    CM, CS = reachable_masks(index)
+    commodity = [(index.c[c], index.g[g], index.d[d]) for c, g, d in zip(index.f_c, index.f_g, index.f_d)]
+    cm_keys = [commodity[f] + index.at[k] for f, k in zip(*np.nonzero(CM))]
+    cs_keys = [commodity[f] + (index.i[i], index.t[t]) for f, i, t in zip(*np.nonzero(CS))]
+    return cm_keys, cs_keys
+
+def presolve(sparse_model):
+    """
+    This function takes in the SparseModel and returns it as a
+    RestrictedModel over the reachable columns, without the rows left
+    with no column, together with the PresolveReport. Raises ValueError
+    when a removed row cannot hold at zero (the input is infeasible)
+    """
+    keep_cols = reachable_columns(sparse_model)
+    keep_rows = abs(sparse_model.A) @ keep_cols.astype(np.float64) > 0
+
+    dropped = ~keep_rows
+    if (sparse_model.row_lower[dropped] > 1e-9).any() or (sparse_model.row_upper[dropped] < -1e-9).any():
+        raise ValueError('supply cannot reach its destination in time: a presolved row is infeasible')
+
+    restricted = fsparse.RestrictedModel(
+                 sparse_model, np.flatnonzero(keep_cols), np.zeros(sparse_model.n_col),
+                 np.flatnonzero(keep_rows)
+                 )
+    return restricted, PresolveReport(sparse_model, keep_cols, keep_rows)
+
+def solve_presolved(sparse_model, time_limit = None, mip_rel_gap = None, threads = None,
+                    tee = False, start = None):
+    """
+    This function presolves the SparseModel, solves the reduced model
+    with HiGHS and returns the SparseSolution over all columns together
+    with the PresolveReport
+    """
+    restricted, report = presolve(sparse_model)
+    if tee:
+        print('\n'.join(report.summary()))
+    sub_start = None if start is None else np.asarray(start)[restricted.free_cols]
+    solution = fsparse.solve_highs(restricted, time_limit, mip_rel_gap, threads, tee, start = sub_start)
+    values = restricted.expand(solution.values) if len(solution.values) == restricted.n_col \
+             else np.zeros(sparse_model.n_col)
+    return fsparse.SparseSolution(sparse_model, solution.status, solution.objective, solution.bound,
+                                  solution.gap, solution.runtime, values), report
@@ -0,0 +1,76 @@
+###############################################
+# This documents contains the rolling-horizon #
+# driver: the horizon is solved as a sequence #
+# of overlapping windows, each committing its #
+# first periods before the next one starts. ###
+
+# Import nccessary packages
+import numpy as np
+
+import Sparse_Builder as fsparse
+
+
+def window_rows(sparse_model, free, last_period):
+    """
+    This function returns the rows of the window: those touching at least
+    one free column and no column after last_period
+    """
+    touches_free = abs(sparse_model.A) @ free.astype(np.float64) > 0
+    return np.flatnonzero(touches_free & (sparse_model.row_period <= last_period))
+
+def solve_rolling_horizon(sparse_model, window, overlap, time_limit = None,
+                          mip_rel_gap = None, threads = None, tee = False):
+    """
+    This function takes in the SparseModel and the window and overlap
+    lengths (in periods) and solves successive windows of the horizon.
+    After each window the decisions (x, WM, CM) and stocks (M, WS, CS) of
+    its first window - overlap periods are fixed, so the stocks at the end
+    of the committed stretch become the initial conditions of the next
+    window, and departures still under way arrive into it as constants.
+    Rows reaching past a window (e.g. close_the_loop) only enter the
+    window that covers them. Returns a SparseSolution over all columns;
+    as there is no global bound, bound and gap are NaN
+    """
+    if not 0 <= overlap < window:
+        raise ValueError('the overlap must be smaller than the window')
+
+    nT = sparse_model.index.nT
+    col_period = sparse_model.col_period
+    integer = sparse_model.integrality.astype(bool)
+    values = np.zeros(sparse_model.n_col)
+    runtime = 0.0
+    status = 'Optimal'
+
+    start = 0
+    while True:
+        end = min(start + window - 1, nT - 1)
+        free = (col_period >= start) & (col_period <= end)
+        restricted = fsparse.RestrictedModel(
+                     sparse_model, np.flatnonzero(free), values,
+                     window_rows(sparse_model, free, end)
+                     )
+
+        solution = fsparse.solve_highs(restricted, time_limit, mip_rel_gap, threads,
+                                       start = values[free])
+        runtime += solution.runtime
+        if tee:
+            print('window %d-%d: %s, objective %s, %.2fs'
+                  % (start, end, solution.status, solution.objective, solution.runtime))
+        if solution.status != 'Optimal':
+            status = solution.status
+            if len(solution.values) != restricted.n_col or not np.isfinite(solution.objective):
+                break
+
+        window_values = restricted.expand(solution.values)
+        window_values[integer] = np.round(window_values[integer])
+        if end == nT - 1:
+            values = window_values
+            break
+
+        # the first window - overlap periods are committed: they are fixed
+        # in the next window, while the overlap only serves as its warm start
+        values = window_values
+        start += window - overlap
+
+    return fsparse.SparseSolution(sparse_model, status, float(sparse_model.c @ values),
+                                  np.nan, np.nan, runtime, values)
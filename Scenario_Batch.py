@@ -0,0 +1,101 @@
+###############################################
+# This documents contains the scenario batch ##
+# runner: alternative supply tables S solved ##
+# against the same network and fleet over a ###
+# process pool, collected into one table. #####
+
+# Import nccessary packages
+import concurrent.futures
+import copy
+import os
+import time
+
+import pandas as pd
+
+import Sparse_Builder as fsparse
+
+# inputs shared by every scenario, set once in each worker process
+_shared = {}
+
+
+def _init_worker(set_input, fixed_par, var_par, options):
+    """
+    This function stores the shared inputs and solver options in the worker
+    """
+    _shared['set_input'] = set_input
+    _shared['fixed_par'] = fixed_par
+    _shared['var_par'] = var_par
+    _shared['options'] = options
+
+def schedule_metrics(solution):
+    """
+    This function returns the key schedule figures of a SparseSolution:
+    the number of services run and of wagon and container movements
+    """
+    model = solution.sparse_model
+    metrics = {}
+    for name, label in (('x', 'services'), ('WM', 'wagon_moves'), ('CM', 'container_moves')):
+        family = model.columns[name]
+        metrics[label] = float(solution.values[family.offset:family.offset + family.space.size].sum())
+    return metrics
+
+def solve_scenario(name, S):
+    """
+    This function solves the shared input with the supply table S in the
+    worker and returns one result row
+    """
+    var_par = copy.copy(_shared['var_par'])
+    var_par.S = S
+
+    begin = time.perf_counter()
+    sparse_model = fsparse.build_sparse_model(_shared['set_input'], _shared['fixed_par'], var_par)
+    build_time = time.perf_counter() - begin
+    solution = fsparse.solve_highs(sparse_model, **_shared['options'])
+
+    row = {
+    'scenario': name,
+    'status': solution.status,
+    'objective': solution.objective,
+    'bound': solution.bound,
+    'gap': solution.gap,
+    'build_time': build_time,
+    'solve_time': solution.runtime,
+    'supply': float(sum(S.values())),
+    }
+    row.update(schedule_metrics(solution))
+    return row
+
+def run_scenarios(set_input, fixed_par, var_par, scenarios, workers = None, threads = 1,
+                  time_limit = None, mip_rel_gap = None):
+    """
+    This function takes in the shared input objects and a dictionary of
+    scenario name -> supply table S, solves every scenario over a pool of
+    workers processes (all cores by default), each HiGHS run limited to
+    threads threads, and returns the results as a DataFrame, one row per
+    scenario in the order given
+    """
+    workers = workers or os.cpu_count()
+    options = {'threads': threads, 'time_limit': time_limit, 'mip_rel_gap': mip_rel_gap}
+
+    with concurrent.futures.ProcessPoolExecutor(
+         max_workers = workers, initializer = _init_worker,
+         initargs = (set_input, fixed_par, var_par, options)) as pool:
+        futures = {name: pool.submit(solve_scenario, name, S) for name, S in scenarios.items()}
+        rows = []
+        for name, future in futures.items():
+            try:
+                rows.append(future.result())
+            except Exception as error:
+                rows.append({'scenario': name, 'status': 'Error: %s' % error})
+
+    return pd.DataFrame(rows)
+
+def read_supply_scenarios(workbook, sheet_names, start_loc = (2, 'A'), end_loc = (100, 'F')):
+    """
+    This function takes in an ExcelWorkbook and the names of sheets laid
+    out like 5DPar_S and returns the dictionary of scenario name -> S
+    """
+    return {
+    sheet_name: workbook.read_par(sheet_name, start_loc, end_loc, 5)
+    for sheet_name in sheet_names
+    }
@@ -2,10 +2,13 @@
 import pyomo.environ as pyo
 
 
-def set_initialisation(optimisation_model, set_class):
+def set_initialisation(optimisation_model, set_class, reachable = None):
     """
     This function takes in the model object and the set input (set_class)
-    and initialise the set for the model
+    and initialise the set for the model. With reachable, the index keys
+    of the container flows and stocks some supply can use
+    (Presolve.reachable_sets), the sets cm and cs the container variables
+    are built over are initialised too
     """
     
     optimisation_model.g = pyo.Set(initialize = set_class.g,
@@ -33,4 +36,17 @@ def set_initialisation(optimisation_model, set_class):
                          doc = 'Wagon type', ordered = True)
 
     optimisation_model.t = pyo.Set(initialize = set_class.t,
-                         doc = 'time periods', ordered = True)    
+                         doc = 'time periods', ordered = True)
+
+    optimisation_model.a = pyo.Set(initialize = set_class.a, dimen = 2,
+                         doc = 'feasible legs (i, j)', ordered = True)
+
+    optimisation_model.at = pyo.Set(initialize = set_class.at, dimen = 3,
+                          doc = 'feasible departures (i, j, t) along the legs', ordered = True)
+
+    if reachable is not None:
+        optimisation_model.cm = pyo.Set(initialize = reachable[0], dimen = 6,
+                                doc = 'container departures (c, g, d, i, j, t) some supply can use', ordered = True)
+
+        optimisation_model.cs = pyo.Set(initialize = reachable[1], dimen = 5,
+                                doc = 'container stocks (c, g, d, i, t) some supply can use', ordered = True)
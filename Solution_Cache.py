@@ -0,0 +1,240 @@
+###############################################
+# This documents contains the solution cache: #
+# solved schedules stored on disk under a #####
+# canonical hash of the input objects and the #
+# solver options, returned at once on an ######
+# exact hit and reused as the MIP start of ####
+# the closest input on the same network. ######
+
+# Import nccessary packages
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import Commodity_Aggregation as fagg
+import Input_Cache as fcache
+import Sparse_Builder as fsparse
+
+# bump whenever the cache layout or the formulation changes
+CACHE_VERSION = 1
+
+# parameters with a zero default, whose zero entries are left out of the hash
+ZERO_DEFAULT = ('S', 'FC', 'VC')
+
+# solver options that do not change the solution
+IGNORED_OPTIONS = ('tee',)
+
+
+def _label(key):
+    return list(key) if isinstance(key, tuple) else key
+
+def _update_par(digest, name, par_dict):
+    """
+    This function feeds the parameter dictionary to the digest in a
+    canonical order, independent of how the dictionary was filled
+    """
+    items = sorted(
+            json.dumps([_label(key), float(val)])
+            for key, val in par_dict.items()
+            if not (name in ZERO_DEFAULT and val == 0)
+            )
+    digest.update(json.dumps([name, items]).encode())
+
+def network_digest(set_input):
+    """
+    This function returns the hash of the sets (with the departures at),
+    which fix the column layout: schedules of inputs with the same network
+    digest are interchangeable as MIP starts
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for set_name in fcache.SET_NAMES + ('a', 'at'):
+        digest.update(json.dumps([set_name, [_label(label) for label in getattr(set_input, set_name)]]).encode())
+    return digest.hexdigest()
+
+def input_digest(set_input, fixed_par, var_par, options = None):
+    """
+    This function returns the canonical hash of the input objects passed
+    to Parameters.parameter_initialisation and of the solver options
+    """
+    digest = hashlib.sha256(network_digest(set_input).encode())
+    for name in fcache.FIXED_PAR_SETS:
+        _update_par(digest, name, getattr(fixed_par, name))
+    for name in fcache.VAR_PAR_SETS:
+        _update_par(digest, name, getattr(var_par, name))
+    digest.update(json.dumps(['WMAX', float(var_par.WMAX)]).encode())
+    options = {key: val for key, val in (options or {}).items() if key not in IGNORED_OPTIONS}
+    digest.update(json.dumps(sorted(options.items())).encode())
+    return digest.hexdigest()
+
+def input_features(index):
+    """
+    This function returns the parameters a near miss may change (supply,
+    costs and fleet) as dense arrays laid out by the ModelIndex
+    """
+    supply = np.zeros((index.nF, index.nI, index.nT))
+    np.add.at(supply, (index.s_f, index.s_i, index.s_t), index.s_val)
+    return {'S': supply.ravel(), 'FC': index.FC.ravel(), 'VC': index.VC.ravel(), 'OL': index.OL, 'OW': index.OW}
+
+def feature_distance(features_a, features_b):
+    """
+    This function returns the distance of two inputs on the same network:
+    the relative L1 difference of every parameter, summed
+    """
+    distance = 0.0
+    for name, a in features_a.items():
+        b = features_b[name]
+        distance += np.abs(a - b).sum() / max(np.abs(a).sum(), np.abs(b).sum(), 1.0)
+    return distance
+
+class CachedSolution(fsparse.SparseSolution):
+    """
+    This is an object that holds a schedule answered from the cache: the
+    SparseModel it decodes against is only built from the input objects
+    when first asked for
+    """
+    def __init__(self, inputs, stats, values):
+        self.inputs = inputs
+        super().__init__(None, stats['status'], stats['objective'], stats['bound'], stats['gap'], 0.0, values)
+
+    @property
+    def sparse_model(self):
+        if self._sparse_model is None:
+            self._sparse_model = fsparse.build_sparse_model(*self.inputs)
+        return self._sparse_model
+
+    @sparse_model.setter
+    def sparse_model(self, sparse_model):
+        self._sparse_model = sparse_model
+
+class SolutionCache():
+    """
+    This is an object that keeps solved schedules in folder, one .npz file
+    per input digest in a subfolder per network digest, holding the
+    nonzero column values, the statistics of the solve and the input
+    features. The least recently used files are evicted once the folder
+    holds more than max_bytes
+    """
+    def __init__(self, folder = 'solution_cache', max_bytes = 256 * 2**20):
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+    def entry_file(self, network, digest):
+        """
+        This function returns the file of the entry digest
+        """
+        return os.path.join(self.folder, network, digest + '.npz')
+
+    def lookup(self, network, digest):
+        """
+        This function returns the statistics and column values of the
+        entry, or None when it is not cached (or unreadable)
+        """
+        file_name = self.entry_file(network, digest)
+        try:
+            with np.load(file_name, allow_pickle = False) as arrays:
+                stats = json.loads(str(arrays['stats']))
+                values = np.zeros(int(arrays['n_col']))
+                values[arrays['positions']] = arrays['values']
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(file_name)
+        return stats, values
+
+    def nearest(self, network, features):
+        """
+        This function returns the column values of the cached schedule on
+        the same network whose input lies closest to features, with its
+        distance, or (None, inf) when the network has no entry
+        """
+        best, best_file = np.inf, None
+        folder = os.path.join(self.folder, network)
+        for file_name in (os.listdir(folder) if os.path.isdir(folder) else []):
+            try:
+                with np.load(os.path.join(folder, file_name), allow_pickle = False) as arrays:
+                    distance = feature_distance(features, {name: arrays['feature_' + name] for name in features})
+            except (OSError, ValueError, KeyError):
+                continue
+            if distance < best:
+                best, best_file = distance, file_name
+        if best_file is None:
+            return None, np.inf
+        return self.lookup(network, best_file[:-len('.npz')])[1], best
+
+    def store(self, network, digest, solution, features):
+        """
+        This function stores the SparseSolution as the entry digest and
+        evicts the least recently used entries over the size bound
+        """
+        values = np.asarray(solution.values, dtype = np.float64)
+        positions = np.flatnonzero(np.abs(values) > 1e-9)
+        stats = {
+        'status': solution.status,
+        'objective': solution.objective,
+        'bound': solution.bound,
+        'gap': solution.gap,
+        'runtime': solution.runtime,
+        'stored': time.time(),
+        }
+        arrays = {'stats': np.array(json.dumps(stats)), 'n_col': np.array(len(values)),
+                  'positions': positions, 'values': values[positions]}
+        arrays.update({'feature_' + name: feature for name, feature in features.items()})
+
+        file_name = self.entry_file(network, digest)
+        os.makedirs(os.path.dirname(file_name), exist_ok = True)
+        temp_file = file_name + '.tmp'
+        with open(temp_file, 'wb') as handle:
+            np.savez_compressed(handle, **arrays)
+        os.replace(temp_file, file_name)
+        self.evict()
+
+    def evict(self):
+        """
+        This function removes the least recently used entries until the
+        folder holds at most max_bytes
+        """
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            for file_name in files:
+                if file_name.endswith('.npz'):
+                    path = os.path.join(root, file_name)
+                    status = os.stat(path)
+                    entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def solve(self, set_input, fixed_par, var_par, **options):
+        """
+        This function returns the SparseSolution of the input under the
+        solve_highs options and how it was found: 'hit' when the same
+        input and options were solved before (no model built and no solve
+        at all), 'warm' when the closest cached schedule on the same
+        network served as the MIP start (its container flows repaired over
+        its trains when they no longer fit the supply), 'cold' otherwise.
+        Every feasible schedule found is stored
+        """
+        network = network_digest(set_input)
+        digest = input_digest(set_input, fixed_par, var_par, options)
+        cached = self.lookup(network, digest)
+        if cached is not None:
+            stats, values = cached
+            return CachedSolution((set_input, fixed_par, var_par), stats, values), 'hit'
+
+        sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par)
+        # a neighbour schedule whose trains cannot carry the new supply is repaired first
+        features = input_features(sparse_model.index)
+        start, _ = self.nearest(network, features)
+        if start is not None and len(sparse_model.violated_rows(start)):
+            repaired = fagg.repair_container_flows(sparse_model, start, options.get('time_limit'),
+                                                   options.get('threads'))
+            start = start if repaired is None else repaired
+        solution = fsparse.solve_highs(sparse_model, start = start, **options)
+        if np.isfinite(solution.objective) and len(sparse_model.violated_rows(solution.values)) == 0:
+            self.store(network, digest, solution, features)
+        return solution, 'cold' if start is None else 'warm'
@@ -0,0 +1,104 @@
+###############################################
+# This documents contains the solution ########
+# export: the nonzero values of every #########
+# variable family pulled out in bulk as a #####
+# typed columnar table with decoded index #####
+# columns, written as .npz or Parquet. ########
+
+# Import nccessary packages
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# names of the index columns of every variable family
+INDEX_COLUMNS = {
+    'x': ('l', 'i', 'j', 't'),
+    'M': ('l', 'i', 't'),
+    'WM': ('w', 'i', 'j', 't'),
+    'WS': ('w', 'i', 't'),
+    'CM': ('c', 'g', 'd', 'i', 'j', 't'),
+    'CS': ('c', 'g', 'd', 'i', 't'),
+    }
+
+
+def decoded_columns(space, positions):
+    """
+    This function returns the index labels of the flat positions of an
+    IndexSpace as one array per index column, with tuple labels (the
+    departures (i, j, t)) split into their parts
+    """
+    columns = []
+    for dim, codes in zip(space.labels, np.unravel_index(positions, space.shape)):
+        if dim and isinstance(dim[0], tuple):
+            for part in zip(*dim):
+                columns.append(np.asarray(part)[codes])
+        else:
+            columns.append(np.asarray(dim)[codes])
+    return columns
+
+def solution_tables(sparse_model, values, tol = 1e-9):
+    """
+    This function takes in the SparseModel and the column values of a
+    solution and returns, per variable family, a NumPy record array of
+    the nonzero entries only: the decoded index columns and the value
+    """
+    tables = {}
+    for name, family in sparse_model.columns.items():
+        block = np.asarray(values[family.offset:family.offset + family.space.size], dtype = np.float64)
+        positions = np.flatnonzero(np.abs(block) > tol)
+        columns = decoded_columns(family.space, positions) + [block[positions]]
+        tables[name] = np.rec.fromarrays(columns, names = list(INDEX_COLUMNS[name]) + ['value'])
+    return tables
+
+def pyomo_column_values(pyomo_model, sparse_model):
+    """
+    This function returns the values of the Pyomo model's variables as
+    one column vector laid out like the SparseModel (unset values as 0).
+    Pyomo iterates an indexed variable over the product of its ordered
+    sets in the same order as the IndexSpace of its family; a variable
+    built over the reachable sets only is looked up key by key, and the
+    columns it leaves out are 0
+    """
+    values = np.zeros(sparse_model.n_col)
+    for name, family in sparse_model.columns.items():
+        var = getattr(pyomo_model, name)
+        if len(var) == family.space.size:
+            values[family.offset:family.offset + family.space.size] = np.fromiter(
+                                                                       (v.value or 0 for v in var.values()),
+                                                                       dtype = np.float64, count = family.space.size
+                                                                       )
+            continue
+        for pos in range(family.space.size):
+            key = family.space.key(pos)
+            if key in var:
+                values[family.offset + pos] = var[key].value or 0
+    return values
+
+def write_solution(tables, file_name):
+    """
+    This function writes the tables to file_name: one compressed .npz
+    holding a record array per family, or with a .parquet name, one
+    Parquet file per family next to it (needs pyarrow)
+    """
+    if file_name.endswith('.parquet'):
+        if pyarrow is None:
+            raise ImportError('writing Parquet needs the pyarrow package')
+        stem = file_name[:-len('.parquet')]
+        for name, table in tables.items():
+            pyarrow.parquet.write_table(
+            pyarrow.table({column: table[column] for column in table.dtype.names}),
+            '%s_%s.parquet' % (stem, name)
+            )
+        return
+    np.savez_compressed(file_name, **tables)
+
+def read_solution(file_name):
+    """
+    This function returns the tables of a solution written to .npz
+    """
+    with np.load(file_name, allow_pickle = False) as arrays:
+        return {name: arrays[name].view(np.recarray) for name in arrays.files}
@@ -0,0 +1,282 @@
+###############################################
+# This documents contains the solver ##########
+# portfolio: the same model raced on several ##
+# locally installed MIP solvers and seeds in ##
+# parallel processes sharing one incumbent, ###
+# keeping the first proven optimum and ########
+# stopping the other racers. ##################
+
+# Import nccessary packages
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import numpy as np
+import pyomo.environ as pyo
+from pyomo.opt import TerminationCondition
+
+import Greedy_Heuristic as fheur
+import Solution_Export as fsol
+import Sparse_Builder as fsparse
+
+# Pyomo solvers tried besides HiGHS, with the names of their time limit and gap options
+PYOMO_SOLVERS = {
+    'cplex': ('timelimit', 'mipgap'),
+    'gurobi': ('TimeLimit', 'MIPGap'),
+    'cbc': ('sec', 'ratioGap'),
+    'glpk': ('tmlim', 'mipgap'),
+    }
+
+# seconds the racers get to stop on their own before they are killed
+STOP_GRACE = 2.0
+
+
+def available_solvers():
+    """
+    This function returns the solvers the portfolio can race here: HiGHS
+    (always, in-process) and the Pyomo solvers found on this machine
+    """
+    solvers = ['highs']
+    for name in PYOMO_SOLVERS:
+        try:
+            if pyo.SolverFactory(name).available(exception_flag = False):
+                solvers.append(name)
+        except Exception:
+            continue
+    return solvers
+
+def default_portfolio(n_racers = None):
+    """
+    This function returns the racers of the default portfolio: one per
+    available Pyomo solver and HiGHS with different random seeds on the
+    remaining cores (n_racers in all, every core by default)
+    """
+    n_racers = n_racers or os.cpu_count() or 1
+    others = [{'solver': name} for name in available_solvers() if name != 'highs']
+    seeds = max(1, n_racers - len(others))
+    return [{'solver': 'highs', 'random_seed': seed} for seed in range(seeds)] + others
+
+def racer_name(racer):
+    """
+    This function returns the label of a racer in the results
+    """
+    if 'random_seed' in racer:
+        return '%s seed %d' % (racer['solver'], racer['random_seed'])
+    return racer['solver']
+
+class SharedIncumbent():
+    """
+    This is an object that holds the best schedule any racer has found in
+    shared memory: its objective and column values, behind a lock
+    """
+    def __init__(self, context, n_col):
+        self.lock = context.Lock()
+        self.objective = context.Value('d', np.inf, lock = False)
+        self.values = context.Array('d', n_col, lock = False)
+
+    def offer(self, objective, values):
+        """
+        This function keeps the schedule when it beats the incumbent
+        """
+        with self.lock:
+            if objective < self.objective.value:
+                self.values[:] = np.asarray(values, dtype = np.float64)
+                self.objective.value = objective
+
+    def better_than(self, objective, tol = 1e-6):
+        """
+        This function returns the incumbent values when the incumbent
+        beats objective (any incumbent beats an objective that is not
+        finite), else None
+        """
+        with self.lock:
+            best = self.objective.value
+            if np.isfinite(best) and (not np.isfinite(objective)
+                                      or best < objective - tol * max(1.0, abs(objective))):
+                return np.array(self.values[:])
+        return None
+
+def _race_highs(racer, sparse_model, incumbent, stop, time_limit, mip_rel_gap, start = None):
+    """
+    This function runs a HiGHS racer from the column values start: its
+    improving schedules go to the shared incumbent, a better incumbent
+    found elsewhere is injected into its search, and it interrupts itself
+    once stop is set
+    """
+    highs = fsparse.highs_instance(sparse_model, time_limit, mip_rel_gap, threads = 1)
+    for option, value in racer.items():
+        if option != 'solver':
+            highs.setOptionValue(option, value)
+
+    def improving(event):
+        incumbent.offer(event.data_out.objective_function_value, event.data_out.mip_solution)
+
+    def user_solution(event):
+        values = incumbent.better_than(event.data_out.mip_primal_bound)
+        if values is not None:
+            event.data_in.setSolution(values)
+
+    def interrupt(event):
+        if stop.is_set():
+            event.interrupt()
+
+    highs.cbMipImprovingSolution.subscribe(improving)
+    highs.cbMipUserSolution.subscribe(user_solution)
+    highs.cbMipInterrupt.subscribe(interrupt)
+    return fsparse.run_highs(highs, sparse_model, start = start)
+
+def _race_pyomo(racer, sparse_model, incumbent, time_limit, mip_rel_gap, start = None):
+    """
+    This function runs a racer on a Pyomo solver, warm started from the
+    column values start where the solver takes a start; its schedule is
+    shared when it ends
+    """
+    import Main
+
+    index = sparse_model.index
+    model = Main.build_model(index.set_input, index.fixed_par, index.var_par)
+    if start is not None:
+        fheur.pyomo_warm_start(model, sparse_model, start)
+
+    opt = pyo.SolverFactory(racer['solver'])
+    time_option, gap_option = PYOMO_SOLVERS[racer['solver']]
+    if time_limit is not None:
+        opt.options[time_option] = time_limit
+    if mip_rel_gap is not None:
+        opt.options[gap_option] = mip_rel_gap
+    for option, value in racer.items():
+        if option != 'solver':
+            opt.options[option] = value
+
+    begin = time.perf_counter()
+    try:
+        results = opt.solve(model, warmstart = start is not None, load_solutions = False)
+    except (TypeError, ValueError):
+        results = opt.solve(model, load_solutions = False)
+    runtime = time.perf_counter() - begin
+
+    condition = results.solver.termination_condition
+    if len(results.solution) == 0:
+        status = 'Infeasible' if condition == TerminationCondition.infeasible else str(condition)
+        return fsparse.SparseSolution(sparse_model, status, np.inf, -np.inf, np.inf, runtime,
+                                      np.zeros(sparse_model.n_col))
+    model.solutions.load_from(results)
+    values = fsol.pyomo_column_values(model, sparse_model)
+    objective = float(sparse_model.c @ values)
+    optimal = condition == TerminationCondition.optimal
+    bound = objective if optimal else results.problem.lower_bound
+    bound = bound if bound is not None and np.isfinite(bound) else -np.inf
+    gap = (objective - bound) / max(abs(objective), 1e-9)
+    incumbent.offer(objective, values)
+    return fsparse.SparseSolution(sparse_model, 'Optimal' if optimal else 'Time limit reached',
+                                  objective, bound, gap, runtime, values)
+
+def _racer(racer, set_input, fixed_par, var_par, incumbent, stop, results, end_time, mip_rel_gap):
+    """
+    This function is the body of a racer process: it builds the model,
+    solves it with its solver from the shared incumbent in the time left
+    until end_time (wall clock) and puts its outcome, with the objective
+    of the start it received (None without one), on the results queue
+    """
+    # own process group, so the solver processes it starts go down with it
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    name = racer_name(racer)
+    start_objective = None
+    try:
+        sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par)
+        time_limit = max(1.0, end_time - time.time())
+        start = incumbent.better_than(np.inf)
+        start_objective = None if start is None else float(sparse_model.c @ start)
+        if racer['solver'] == 'highs':
+            solution = _race_highs(racer, sparse_model, incumbent, stop, time_limit, mip_rel_gap, start)
+        else:
+            solution = _race_pyomo(racer, sparse_model, incumbent, time_limit, mip_rel_gap, start)
+        results.put({'racer': name, 'status': solution.status, 'objective': solution.objective,
+                     'bound': solution.bound, 'gap': solution.gap, 'runtime': solution.runtime,
+                     'start': start_objective})
+    except Exception as error:
+        results.put({'racer': name, 'status': 'Error: %s' % error, 'objective': np.inf,
+                     'bound': -np.inf, 'gap': np.inf, 'runtime': 0.0, 'start': start_objective})
+
+def _kill(process):
+    """
+    This function kills a racer process together with its process group
+    """
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            # not yet a group of its own
+            process.kill()
+    process.join()
+
+def solve_portfolio(set_input, fixed_par, var_par, racers = None, time_limit = 60, mip_rel_gap = 1e-4):
+    """
+    This function races the model on every racer (the default portfolio
+    when None; each a dictionary naming the solver and its options) in
+    parallel processes, all starting from the greedy schedule when it is
+    feasible and sharing their improving schedules. It returns the
+    SparseSolution of the first proven optimum, or of the best schedule
+    once time_limit is reached, with the best bound any racer proved,
+    and the outcome of every racer (with the start it received); the
+    racers still running are stopped
+    """
+    racers = default_portfolio() if racers is None else racers
+    sparse_model = fsparse.build_sparse_model(set_input, fixed_par, var_par)
+    context = multiprocessing.get_context('spawn')
+    incumbent = SharedIncumbent(context, sparse_model.n_col)
+    stop = context.Event()
+    results = context.Queue()
+
+    start_values, violated = fheur.greedy_schedule(sparse_model)
+    if len(violated) == 0:
+        incumbent.offer(float(sparse_model.c @ start_values), start_values)
+
+    begin = time.perf_counter()
+    end_time = time.time() + time_limit
+    processes = [
+    context.Process(target = _racer, args = (racer, set_input, fixed_par, var_par, incumbent, stop,
+                                             results, end_time, mip_rel_gap), daemon = True)
+    for racer in racers
+    ]
+    for process in processes:
+        process.start()
+
+    rows, winner = [], None
+    deadline = begin + time_limit + STOP_GRACE
+    while len(rows) < len(processes) and winner is None:
+        try:
+            row = results.get(timeout = max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            break
+        rows.append(row)
+        if row['status'] == 'Optimal':
+            winner = row['racer']
+
+    # let the others stop at their next interrupt check, then kill what is left
+    stop.set()
+    stop_by = time.perf_counter() + STOP_GRACE
+    for process in processes:
+        process.join(max(0.0, stop_by - time.perf_counter()))
+        _kill(process)
+    while True:
+        try:
+            rows.append(results.get_nowait())
+        except queue.Empty:
+            break
+    runtime = time.perf_counter() - begin
+
+    objective = incumbent.objective.value
+    values = np.array(incumbent.values[:]) if np.isfinite(objective) else np.zeros(sparse_model.n_col)
+    bound = max([row['bound'] for row in rows if np.isfinite(row['bound'])], default = -np.inf)
+    gap = (objective - bound) / max(abs(objective), 1e-9) if np.isfinite(objective) else np.inf
+    if winner is not None:
+        status = 'Optimal'
+    elif np.isfinite(objective):
+        status = 'Time limit reached'
+    else:
+        status = 'No solution found'
+    return fsparse.SparseSolution(sparse_model, status, objective, bound, gap, runtime, values), rows
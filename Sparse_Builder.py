@@ -0,0 +1,737 @@
+###############################################
+# This documents contains the sparse-matrix ###
+# model builder: the formulation of ###########
+# Constraints.py emitted family by family as ##
+# vectorised NumPy/SciPy arrays and solved ####
+# in-process with HiGHS, without building #####
+# any Pyomo expression. #######################
+
+# Import nccessary packages
+import time
+
+import highspy
+import numpy as np
+import scipy.sparse as sp
+from pyomo.repn import generate_standard_repn
+import pyomo.environ as pyo
+
+import Coded_Input as fcode
+import Constraints as fcon
+
+
+class IndexSpace():
+    """
+    This is an object that maps the flat positions of a family of
+    variables or constraints to their Pyomo index tuples. labels holds
+    one label list per dimension; tuple labels (e.g. the departures)
+    are spliced into the key
+    """
+    def __init__(self, labels):
+        self.labels = [list(dim) for dim in labels]
+        self.shape = tuple(len(dim) for dim in self.labels)
+        self.size = int(np.prod(self.shape, dtype = np.int64))
+
+    def key(self, flat):
+        """
+        This function returns the Pyomo index of the flat position
+        """
+        key = ()
+        for dim, pos in zip(self.labels, np.unravel_index(int(flat), self.shape)):
+            label = dim[pos]
+            key += label if isinstance(label, tuple) else (label,)
+        return key
+
+class VarFamily():
+    """
+    This is an object that describes one variable of the model as a
+    contiguous block of columns
+    """
+    def __init__(self, name, space, offset, upper):
+        self.name = name
+        self.space = space
+        self.offset = offset
+        self.upper = upper
+
+    def columns(self, *codes):
+        """
+        This function returns the column numbers of the given index codes
+        """
+        return self.offset + np.ravel_multi_index(codes, self.space.shape)
+
+class RowFamily():
+    """
+    This is an object that holds one constraint family (named after its
+    Pyomo component) as coordinate entries: rows are local to the family
+    and index[r] is the flat position of row r in space
+    """
+    def __init__(self, name, rule, space, index, lower, upper, rows, cols, vals):
+        self.name = name
+        self.rule = rule
+        self.space = space
+        self.index = index
+        self.lower = lower
+        self.upper = upper
+        self.rows = rows
+        self.cols = cols
+        self.vals = vals
+
+    def __len__(self):
+        return len(self.index)
+
+class ModelIndex():
+    """
+    This is an object that codes the sets and parameters of the input
+    objects as integer positions and NumPy arrays, with the departures
+    (i, j, t) of the set at as parallel arrays of node and period codes
+    """
+    def __init__(self, set_input, fixed_par, var_par):
+        self.set_input = set_input
+        self.fixed_par = fixed_par
+        self.var_par = var_par
+        for name in ('g', 'i', 'o', 'd', 'l', 'c', 'w', 't'):
+            labels = list(getattr(set_input, name))
+            setattr(self, name, labels)
+            setattr(self, name + '_pos', {label: pos for pos, label in enumerate(labels)})
+        self.at = list(set_input.at)
+
+        self.nL, self.nW, self.nC = len(self.l), len(self.w), len(self.c)
+        self.nG, self.nD, self.nI = len(self.g), len(self.d), len(self.i)
+        self.nT, self.nK = len(self.t), len(self.at)
+        self.nF = self.nC * self.nG * self.nD
+
+        self.t_val = np.array(self.t)
+        self.dep_i = np.array([self.i_pos[i] for (i, j, t) in self.at], dtype = np.int64)
+        self.dep_j = np.array([self.i_pos[j] for (i, j, t) in self.at], dtype = np.int64)
+        self.dep_t = np.array([self.t_pos[t] for (i, j, t) in self.at], dtype = np.int64)
+
+        # parameters read through the array lookups of their coded form
+        _, fixed, var = fcode.encode_input(set_input, fixed_par, var_par)
+        H = fixed.H.lookup((fixed.H.encode(0, self.i)[self.dep_i], fixed.H.encode(1, self.i)[self.dep_j]))
+        # arrivals fall in the first period reached (the period itself on a uniform grid)
+        self.arr_t = np.searchsorted(self.t_val, self.t_val[self.dep_t] + H).astype(np.int64)
+
+        # node position of every destination and commodity codes (c, g, d)
+        self.d_node = np.array([self.i_pos[d] for d in self.d], dtype = np.int64)
+        self.f_c, self.f_g, self.f_d = np.unravel_index(np.arange(self.nF), (self.nC, self.nG, self.nD))
+
+        self.FC = var.FC.lookup((var.FC.encode(0, self.l)[:, None], var.FC.encode(1, self.i)[self.dep_i],
+                                 var.FC.encode(2, self.i)[self.dep_j]), default = 0).astype(np.float64)
+        self.VC = var.VC.lookup((var.VC.encode(0, self.w)[:, None], var.VC.encode(1, self.i)[self.dep_i],
+                                 var.VC.encode(2, self.i)[self.dep_j]), default = 0).astype(np.float64)
+        self.FC = self.FC.reshape(self.nL, self.nK)
+        self.VC = self.VC.reshape(self.nW, self.nK)
+
+        self.OL = fixed.OL.lookup((fixed.OL.encode(0, self.l),)).astype(np.float64)
+        self.OW = fixed.OW.lookup((fixed.OW.encode(0, self.w),)).astype(np.float64)
+        self.NC = fixed.NC.lookup((fixed.NC.encode(0, self.i),)).astype(np.float64)
+        self.NL = fixed.NL.lookup((fixed.NL.encode(0, self.i),)).astype(np.float64)
+        self.NW = fixed.NW.lookup((fixed.NW.encode(0, self.i),)).astype(np.float64)
+        self.P = var.P.lookup((var.P.encode(0, self.i),)).astype(np.float64)
+        self.WMAX = float(var_par.WMAX)
+        self.M_init = var.M_init.lookup((var.M_init.encode(0, self.l)[:, None],
+                                         var.M_init.encode(1, self.i)[None, :])).astype(np.float64)
+        self.WS_init = var.WS_init.lookup((var.WS_init.encode(0, self.w)[:, None],
+                                           var.WS_init.encode(1, self.i)[None, :])).astype(np.float64)
+        self.M_init = self.M_init.reshape(self.nL, self.nI)
+        self.WS_init = self.WS_init.reshape(self.nW, self.nI)
+
+        # delivery windows tau[g, i, d] of the origins, nan elsewhere
+        self.tau = fixed.tau.lookup((fixed.tau.encode(0, self.g)[:, None, None],
+                                     fixed.tau.encode(1, self.i)[None, :, None],
+                                     fixed.tau.encode(2, self.d)[None, None, :]), default = np.nan)
+        self.tau = self.tau.astype(np.float64).reshape(self.nG, self.nI, self.nD)
+
+        # supply as parallel arrays of (commodity, node, period) codes and values,
+        # its coded keys carried over to the positions of the sets
+        codes, values = var.S.entries()
+        c, g, i, d, t = [
+                        var.S.remap(dim, labels)[code]
+                        for dim, (code, labels) in enumerate(zip(codes, (self.c, self.g, self.i, self.d, self.t)))
+                        ]
+        keep = (values != 0) & (c >= 0) & (g >= 0) & (i >= 0) & (d >= 0) & (t >= 0)
+        self.s_f = ((c[keep] * self.nG + g[keep]) * self.nD + d[keep]).astype(np.int64)
+        self.s_i = i[keep].astype(np.int64)
+        self.s_t = t[keep].astype(np.int64)
+        self.s_val = values[keep].astype(np.float64)
+
+    def commodity(self, c, g, d):
+        """
+        This function returns the code of the commodity (c, g, d)
+        """
+        return (self.c_pos[c] * self.nG + self.g_pos[g]) * self.nD + self.d_pos[d]
+
+    def due_period(self, f, i, t):
+        """
+        This function returns the first period position by which supply of
+        commodity f released at node position i in period position t must
+        have reached its destination (nT when only the end of the horizon
+        applies), following demand_tracking
+        """
+        g, d = self.g[self.f_g[f]], self.d[self.f_d[f]]
+        node = self.i[i]
+        if node == d:
+            return t
+        if node in self.o_pos:
+            due = self.t[t] + self.fixed_par.tau[g, node, d]
+            return int(np.searchsorted(self.t_val, due, side = 'left'))
+        return self.nT
+
+    def release_period(self):
+        """
+        This function returns the due period of every supply entry, as
+        due_period does entry by entry
+        """
+        g, d = self.f_g[self.s_f], self.f_d[self.s_f]
+        at_origin = np.array([node in self.o_pos for node in self.i], dtype = bool)[self.s_i]
+        at_destination = self.d_node[d] == self.s_i
+        tau = self.tau[g, self.s_i, d]
+        if np.isnan(tau[at_origin & ~at_destination]).any():
+            raise KeyError('tau has no delivery window for some supply at an origin')
+        due = np.full(len(self.s_f), self.nT, dtype = np.int64)
+        due[at_origin] = np.searchsorted(self.t_val, self.t_val[self.s_t[at_origin]] + tau[at_origin], side = 'left')
+        due[at_destination] = self.s_t[at_destination]
+        return due
+
+def variable_families(index):
+    """
+    This function lays the variables of Variables.py out as consecutive
+    column blocks and returns them as an ordered dictionary by name
+    """
+    spaces = [
+    ('x', [index.l, index.at], 1),
+    ('M', [index.l, index.i, index.t], np.inf),
+    ('WM', [index.w, index.at], np.inf),
+    ('WS', [index.w, index.i, index.t], np.inf),
+    ('CM', [index.c, index.g, index.d, index.at], np.inf),
+    ('CS', [index.c, index.g, index.d, index.i, index.t], np.inf),
+    ]
+    families = {}
+    offset = 0
+    for name, labels, upper in spaces:
+        space = IndexSpace(labels)
+        families[name] = VarFamily(name, space, offset, upper)
+        offset += space.size
+    return families
+
+def _family(name, rule, labels, lower, upper, rows, cols, vals, compress = False):
+    """
+    This function assembles a RowFamily from its entry lists. With
+    compress, the rows without any entry are dropped, as the Pyomo rules
+    skip them
+    """
+    space = IndexSpace(labels)
+    rows = np.concatenate(rows).astype(np.int64)
+    cols = np.concatenate(cols).astype(np.int64)
+    vals = np.concatenate(vals).astype(np.float64)
+    index = np.arange(space.size, dtype = np.int64)
+    lower = np.broadcast_to(np.asarray(lower, dtype = np.float64), (space.size,))
+    upper = np.broadcast_to(np.asarray(upper, dtype = np.float64), (space.size,))
+
+    if compress:
+        index = np.flatnonzero(np.bincount(rows, minlength = space.size))
+        remap = np.full(space.size, -1, dtype = np.int64)
+        remap[index] = np.arange(len(index))
+        rows = remap[rows]
+    return RowFamily(name, rule, space, index, lower[index], upper[index], rows, cols, vals)
+
+def _balance(index, stock, flow, n_com, rhs):
+    """
+    This function returns the entry lists of a stock balance over
+    (commodity, i, t): stock - previous stock + outbound - inbound = rhs
+    """
+    nI, nT = index.nI, index.nT
+    stock_rows = np.arange(n_com * nI * nT, dtype = np.int64)
+    later = stock_rows[stock_rows % nT > 0]
+
+    com, k = np.divmod(np.arange(n_com * index.nK, dtype = np.int64), index.nK)
+    flow_cols = flow.offset + np.arange(n_com * index.nK, dtype = np.int64)
+    out_rows = (com * nI + index.dep_i[k]) * nT + index.dep_t[k]
+    in_rows = (com * nI + index.dep_j[k]) * nT + index.arr_t[k]
+
+    rows = [stock_rows, later, out_rows, in_rows]
+    cols = [stock.offset + stock_rows, stock.offset + later - 1, flow_cols, flow_cols]
+    vals = [np.ones(len(stock_rows)), -np.ones(len(later)), np.ones(len(out_rows)), -np.ones(len(in_rows))]
+    return rhs, rhs, rows, cols, vals
+
+def constraint_families(index, columns):
+    """
+    This function yields the constraint families of
+    Constraints.constraint_definition one at a time, each as a RowFamily
+    """
+    nL, nW, nI, nT, nK, nF = index.nL, index.nW, index.nI, index.nT, index.nK, index.nF
+    x, M, WM, WS, CM, CS = (columns[name] for name in ('x', 'M', 'WM', 'WS', 'CM', 'CS'))
+    first = np.arange(nI * nT) % nT == 0
+
+    rhs = np.zeros((nL, nI, nT))
+    rhs[:, :, 0] = index.M_init
+    yield _family('constraint1', 'locomotive_balance', [index.l, index.i, index.t],
+                  *_balance(index, M, x, nL, rhs.ravel()))
+
+    rhs = np.zeros((nW, nI, nT))
+    rhs[:, :, 0] = index.WS_init
+    yield _family('constraint2', 'wagon_balance', [index.w, index.i, index.t],
+                  *_balance(index, WS, WM, nW, rhs.ravel()))
+
+    rhs = np.zeros(nF * nI * nT)
+    np.add.at(rhs, (index.s_f * nI + index.s_i) * nT + index.s_t, index.s_val)
+    yield _family('constraint3', 'container_balance', [index.c, index.g, index.d, index.i, index.t],
+                  *_balance(index, CS, CM, nF, rhs))
+
+    for name, rule, stock, n_com, labels in (
+        ('constraint4', 'close_the_loop_1', M, nL, index.l),
+        ('constraint5', 'close_the_loop_2', WS, nW, index.w)):
+        rows = np.arange(n_com * nI, dtype = np.int64)
+        yield _family(name, rule, [labels, index.i], 0, 0,
+                      [rows, rows], [stock.offset + rows * nT, stock.offset + rows * nT + nT - 1],
+                      [np.ones(len(rows)), -np.ones(len(rows))])
+
+    for name, rule, flow, stock, n_com, labels, owned in (
+        ('constraint6', 'operational_limit_1', WM, WS, nW, index.w, index.OW),
+        ('constraint7', 'operational_limit_2', x, M, nL, index.l, index.OL)):
+        com, k = np.divmod(np.arange(n_com * nK, dtype = np.int64), nK)
+        stock_com, stock_it = np.divmod(np.arange(n_com * nI * nT, dtype = np.int64), nI * nT)
+        yield _family(name, rule, [labels, index.t], -np.inf, np.repeat(owned, nT),
+                      [com * nT + index.dep_t[k], stock_com * nT + stock_it % nT],
+                      [flow.offset + com * nK + k, stock.offset + np.arange(n_com * nI * nT)],
+                      [np.ones(len(k)), np.ones(len(stock_com))])
+
+    l, k = np.divmod(np.arange(nL * nK, dtype = np.int64), nK)
+    yield _family('constraint8', 'service_limit', [index.i, index.t], -np.inf, 1,
+                  [index.dep_i[k] * nT + index.dep_t[k]], [x.offset + l * nK + k],
+                  [np.ones(len(k))], compress = True)
+
+    f, i, t = np.unravel_index(np.arange(nF * nI * nT, dtype = np.int64), (nF, nI, nT))
+    held = index.d_node[index.f_d[f]] != i
+    yield _family('constraint9', 'storage_limit_1', [index.i, index.t], -np.inf, np.repeat(index.NC, nT),
+                  [(i * nT + t)[held]], [CS.offset + np.flatnonzero(held)],
+                  [np.ones(int(held.sum()))], compress = True)
+
+    for name, rule, stock, n_com, cap in (
+        ('constraint10', 'storage_limit_2', M, nL, index.NL),
+        ('constraint11', 'storage_limit_3', WS, nW, index.NW)):
+        com, i, t = np.unravel_index(np.arange(n_com * nI * nT, dtype = np.int64), (n_com, nI, nT))
+        yield _family(name, rule, [index.i, index.t], -np.inf, np.repeat(cap, nT),
+                      [i * nT + t], [stock.offset + np.arange(n_com * nI * nT)],
+                      [np.ones(len(com))])
+
+    due = np.zeros((nF, nT + 1))
+    np.add.at(due, (index.s_f, index.release_period()), index.s_val)
+    due = np.cumsum(due[:, :nT], axis = 1)
+    totals = np.zeros(nF)
+    np.add.at(totals, index.s_f, index.s_val)
+    due[:, -1] = totals
+    rows = np.arange(nF * nT, dtype = np.int64)
+    f, t = np.divmod(rows, nT)
+    yield _family('constraint12', 'demand_tracking', [index.c, index.g, index.d, index.t],
+                  due.ravel(), np.inf, [rows], [CS.offset + (f * nI + index.d_node[index.f_d[f]]) * nT + t],
+                  [np.ones(len(rows))])
+
+    l, k = np.divmod(np.arange(nL * nK, dtype = np.int64), nK)
+    w, kw = np.divmod(np.arange(nW * nK, dtype = np.int64), nK)
+    yield _family('constraint13', 'transportation_constraint', [index.at], 0, np.inf,
+                  [k, kw], [x.offset + l * nK + k, WM.offset + w * nK + kw],
+                  [np.full(len(k), index.WMAX), -np.ones(len(kw))])
+
+    w60, w40 = index.w_pos['60ft'], index.w_pos['40ft']
+    c40, c20 = index.c_pos['40ft'], index.c_pos['20ft']
+    f, k = np.divmod(np.arange(nF * nK, dtype = np.int64), nK)
+    is40, is20 = index.f_c[f] == c40, index.f_c[f] == c20
+    kk = np.arange(nK, dtype = np.int64)
+    yield _family('constraint14', 'wagon_mix_1', [index.at], 0, np.inf,
+                  [kk, kk, k[is40]],
+                  [WM.offset + w60 * nK + kk, WM.offset + w40 * nK + kk, CM.offset + np.flatnonzero(is40)],
+                  [np.ones(nK), np.ones(nK), -np.ones(int(is40.sum()))])
+    yield _family('constraint15', 'wagon_mix_2', [index.at], 0, np.inf,
+                  [kk, k[is40], k[is20]],
+                  [WM.offset + w60 * nK + kk, CM.offset + np.flatnonzero(is40), CM.offset + np.flatnonzero(is20)],
+                  [np.full(nK, 3.0), -2 * np.ones(int(is40.sum())), -np.ones(int(is20.sum()))])
+
+    # first period of every preparation window; only the maximal windows are kept
+    start = np.searchsorted(index.t_val, index.t_val[None, :] - index.P[:, None], side = 'left')
+    departs = np.zeros((nI, nT + 1))
+    np.add.at(departs, (index.dep_i, index.dep_t + 1), 1)
+    departs = np.cumsum(departs, axis = 1)
+    end = np.concatenate([start[:, 1:], np.full((nI, 1), nT)], axis = 1)
+    maximal = np.take_along_axis(departs, end, axis = 1) > np.take_along_axis(departs, start, axis = 1)
+
+    rows, cols = [], []
+    l, k = np.divmod(np.arange(nL * nK, dtype = np.int64), nK)
+    for shift in range(int((np.arange(nT)[None, :] - start).max(initial = -1)) + 1):
+        later = np.minimum(index.dep_t[k] + shift, nT - 1)
+        inside = (index.dep_t[k] + shift <= nT - 1) & (start[index.dep_i[k], later] <= index.dep_t[k]) \
+                 & maximal[index.dep_i[k], later]
+        rows.append(index.dep_i[k][inside] * nT + later[inside])
+        cols.append(x.offset + (l * nK + k)[inside])
+    yield _family('constraint16', 'min_prep_time', [index.i, index.t], -np.inf, 1,
+                  rows or [np.empty(0)], cols or [np.empty(0)],
+                  [np.ones(len(r)) for r in rows] or [np.empty(0)], compress = True)
+
+def strengthening_families(index, columns):
+    """
+    This function yields the constraint families of
+    Constraints.strengthening_definition one at a time, each as a RowFamily
+    """
+    nL, nW, nK, nF, nT = index.nL, index.nW, index.nK, index.nF, index.nT
+    x, WM, CM = columns['x'], columns['WM'], columns['CM']
+    set_input, fixed_par, var_par = index.set_input, index.fixed_par, index.var_par
+
+    def linking(n_com, flow, bound):
+        com, k = np.divmod(np.arange(n_com * nK, dtype = np.int64), nK)
+        rows = [com * nK + k] + [com * nK + k] * nL
+        cols = [flow.offset + com * nK + k] + [x.offset + l * nK + k for l in range(nL)]
+        vals = [np.ones(len(k))] + [-bound] * nL
+        return rows, cols, vals
+
+    yield _family('constraint17', 'wagon_link', [index.w, index.at], -np.inf, 0,
+                  *linking(nW, WM, np.repeat(index.OW, nK)))
+
+    released = np.zeros((nF, nT))
+    np.add.at(released, (index.s_f, index.s_t), index.s_val)
+    released = np.cumsum(released, axis = 1)
+    yield _family('constraint18', 'container_link', [index.c, index.g, index.d, index.at], -np.inf, 0,
+                  *linking(nF, CM, released[:, index.dep_t].ravel()))
+
+    w60, w40 = index.w_pos['60ft'], index.w_pos['40ft']
+    c40, c20 = index.c_pos['40ft'], index.c_pos['20ft']
+    f, k = np.divmod(np.arange(nF * nK, dtype = np.int64), nK)
+    is40, is20 = index.f_c[f] == c40, index.f_c[f] == c20
+    l, kl = np.divmod(np.arange(nL * nK, dtype = np.int64), nK)
+    yield _family('constraint19', 'wagon_capacity_1', [index.at], -np.inf, 0,
+                  [k[is40], kl], [CM.offset + np.flatnonzero(is40), x.offset + l * nK + kl],
+                  [np.ones(int(is40.sum())), np.full(len(kl), -(index.OW[w60] + index.OW[w40]))])
+    yield _family('constraint20', 'wagon_capacity_2', [index.at], -np.inf, 0,
+                  [k[is20], k[is40], kl],
+                  [CM.offset + np.flatnonzero(is20), CM.offset + np.flatnonzero(is40), x.offset + l * nK + kl],
+                  [np.ones(int(is20.sum())), np.full(int(is40.sum()), 2.0), np.full(len(kl), -3 * index.OW[w60])])
+
+    # interchangeable types, told apart by no cost, fleet or initial position
+    loco_successor = fcon.interchangeable_successor(index.l, {
+                     l: (tuple(var_par.FC.get((l, i, j), 0) for (i, j) in set_input.a),
+                         fixed_par.OL[l], tuple(var_par.M_init[l, i] for i in index.i))
+                     for l in index.l
+                     })
+    wagons = [w for w in index.w if w not in ('60ft', '40ft')]
+    wagon_successor = fcon.interchangeable_successor(wagons, {
+                      w: (tuple(var_par.VC.get((w, i, j), 0) for (i, j) in set_input.a),
+                          fixed_par.OW[w], tuple(var_par.WS_init[w, i] for i in index.i))
+                      for w in wagons
+                      })
+    for name, rule, flow, labels, successor in (
+        ('constraint21', 'locomotive_symmetry', x, index.l, loco_successor),
+        ('constraint22', 'wagon_symmetry', WM, index.w, wagon_successor)):
+        pos = {label: n for n, label in enumerate(labels)}
+        pairs = [(pos[a], pos[b]) for a, b in successor.items() if b is not None]
+        kk = np.arange(nK, dtype = np.int64)
+        yield _family(name, rule, [labels], 0, np.inf,
+                      [np.full(nK, a) for a, b in pairs] + [np.full(nK, a) for a, b in pairs] or [np.empty(0)],
+                      [flow.offset + a * nK + kk for a, b in pairs]
+                      + [flow.offset + b * nK + kk for a, b in pairs] or [np.empty(0)],
+                      [np.ones(nK) for pair in pairs] + [-np.ones(nK) for pair in pairs] or [np.empty(0)],
+                      compress = True)
+
+def column_periods(index, columns):
+    """
+    This function returns the period position of every column: the
+    departure period for x, WM and CM and the period for M, WS and CS
+    """
+    periods = {
+    'x': np.tile(index.dep_t, index.nL),
+    'M': np.tile(np.arange(index.nT), index.nL * index.nI),
+    'WM': np.tile(index.dep_t, index.nW),
+    'WS': np.tile(np.arange(index.nT), index.nW * index.nI),
+    'CM': np.tile(index.dep_t, index.nF),
+    'CS': np.tile(np.arange(index.nT), index.nF * index.nI),
+    }
+    return np.concatenate([periods[name] for name in columns]).astype(np.int64)
+
+class RestrictedModel():
+    """
+    This is an object that holds a SparseModel restricted to the columns
+    free_cols and the rows rows, with every other column fixed at its
+    entry in values (moved into the row bounds). It is solved like a
+    SparseModel and expand() maps its solution back to all columns
+    """
+    def __init__(self, sparse_model, free_cols, values, rows):
+        self.parent = sparse_model
+        self.free_cols = np.asarray(free_cols, dtype = np.int64)
+        self.values = np.array(values, dtype = np.float64)
+        self.values[self.free_cols] = 0
+
+        A_rows = sparse_model.A[rows]
+        fixed_activity = A_rows @ self.values
+        self.A = A_rows[:, self.free_cols].tocsr()
+        self.row_lower = sparse_model.row_lower[rows] - fixed_activity
+        self.row_upper = sparse_model.row_upper[rows] - fixed_activity
+        self.c = sparse_model.c[self.free_cols]
+        self.col_lower = sparse_model.col_lower[self.free_cols]
+        self.col_upper = sparse_model.col_upper[self.free_cols]
+        self.integrality = sparse_model.integrality[self.free_cols]
+        self.n_row, self.n_col = self.A.shape
+
+    def expand(self, sub_values):
+        """
+        This function returns the full column vector of a solution of the
+        restricted model
+        """
+        values = self.values.copy()
+        values[self.free_cols] = sub_values
+        return values
+
+class SparseModel():
+    """
+    This is an object that holds the whole model as arrays: objective c,
+    column bounds and integrality, the constraint matrix A (CSR) with row
+    bounds, and the variable and row families to decode positions
+    """
+    def __init__(self, index, columns, families, c):
+        self.index = index
+        self.columns = columns
+        self.families = families
+        self.c = c
+        self.n_col = sum(family.space.size for family in columns.values())
+        self.col_lower = np.zeros(self.n_col)
+        self.col_upper = np.concatenate([
+                         np.full(family.space.size, family.upper, dtype = np.float64)
+                         for family in columns.values()
+                         ])
+        self.integrality = np.ones(self.n_col, dtype = np.int32)
+
+        self.row_offset = {}
+        offset = 0
+        for family in families:
+            self.row_offset[family.name] = offset
+            offset += len(family)
+        self.n_row = offset
+        self.A = sp.csr_matrix(
+                 (np.concatenate([family.vals for family in families]),
+                 (np.concatenate([family.rows + self.row_offset[family.name] for family in families]),
+                 np.concatenate([family.cols for family in families]))),
+                 shape = (self.n_row, self.n_col)
+                 )
+        self.A.sum_duplicates()
+        self.row_lower = np.concatenate([family.lower for family in families])
+        self.row_upper = np.concatenate([family.upper for family in families])
+
+        # period position of every column and latest period every row touches
+        self.col_period = column_periods(index, columns)
+        self.row_period = np.full(self.n_row, -1, dtype = np.int64)
+        np.maximum.at(self.row_period,
+                      np.repeat(np.arange(self.n_row), np.diff(self.A.indptr)),
+                      self.col_period[self.A.indices])
+
+    def violated_rows(self, values, tol = 1e-6):
+        """
+        This function returns the rows whose activity at the column values
+        lies outside their bounds by more than tol
+        """
+        activity = self.A @ values
+        return np.flatnonzero((activity < self.row_lower - tol) | (activity > self.row_upper + tol))
+
+    def column_key(self, col):
+        """
+        This function returns the variable name and Pyomo index of a column
+        """
+        for family in self.columns.values():
+            if family.offset <= col < family.offset + family.space.size:
+                return family.name, family.space.key(col - family.offset)
+        raise IndexError(col)
+
+def objective_vector(index, columns):
+    """
+    This function returns the cost of every column, as in objective_rule
+    """
+    c = np.zeros(sum(family.space.size for family in columns.values()))
+    c[columns['x'].offset:columns['x'].offset + index.nL * index.nK] = index.FC.ravel()
+    c[columns['WM'].offset:columns['WM'].offset + index.nW * index.nK] = index.VC.ravel()
+    return c
+
+def build_sparse_model(set_input, fixed_par, var_par, strengthened = False, index = None):
+    """
+    This function takes in the input objects and returns the SparseModel
+    of the formulation in Constraints.py (with strengthened, including
+    the valid inequalities of strengthening_definition). A ModelIndex
+    already built from the same input objects can be handed over as index
+    """
+    if index is None:
+        index = ModelIndex(set_input, fixed_par, var_par)
+    columns = variable_families(index)
+    families = list(constraint_families(index, columns))
+    if strengthened:
+        families += list(strengthening_families(index, columns))
+    return SparseModel(index, columns, families, objective_vector(index, columns))
+
+def stocks_from_flows(index, flow, n_com, init, supply = None):
+    """
+    This function returns the stocks (n_com, nI, nT) implied by the flows
+    (n_com, nK) through the balance constraints, from the initial stocks
+    init (n_com, nI) and the exogenous supply (n_com, nI, nT)
+    """
+    net = np.zeros((n_com, index.nI, index.nT)) if supply is None else supply.copy()
+    com = np.repeat(np.arange(n_com), index.nK)
+    k = np.tile(np.arange(index.nK), n_com)
+    np.add.at(net, (com, index.dep_i[k], index.dep_t[k]), -flow.ravel())
+    np.add.at(net, (com, index.dep_j[k], index.arr_t[k]), flow.ravel())
+    return init[:, :, None] + np.cumsum(net, axis = 2)
+
+class SparseSolution():
+    """
+    This is an object that holds the outcome of a HiGHS solve of a SparseModel
+    """
+    def __init__(self, sparse_model, status, objective, bound, gap, runtime, values):
+        self.sparse_model = sparse_model
+        self.status = status
+        self.objective = objective
+        self.bound = bound
+        self.gap = gap
+        self.runtime = runtime
+        self.values = values
+
+    def value(self, name):
+        """
+        This function returns the nonzero values of the named variable as
+        a dictionary keyed by its Pyomo index
+        """
+        family = self.sparse_model.columns[name]
+        block = self.values[family.offset:family.offset + family.space.size]
+        return {family.space.key(pos): float(block[pos]) for pos in np.flatnonzero(np.abs(block) > 1e-9)}
+
+def highs_instance(sparse_model, time_limit = None, mip_rel_gap = None, threads = None,
+                   tee = False, relax = False):
+    """
+    This function passes the arrays of the SparseModel straight to a new
+    in-process HiGHS instance (as an LP relaxation with relax) and
+    returns it ready to run
+    """
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', bool(tee))
+    if time_limit is not None:
+        highs.setOptionValue('time_limit', float(time_limit))
+    if mip_rel_gap is not None:
+        highs.setOptionValue('mip_rel_gap', float(mip_rel_gap))
+    if threads is not None:
+        highs.setOptionValue('threads', int(threads))
+
+    A = sparse_model.A.tocsc()
+    integrality = np.zeros(sparse_model.n_col, dtype = np.int32) if relax else sparse_model.integrality
+    inf = highspy.kHighsInf
+    highs.passModel(
+          sparse_model.n_col, sparse_model.n_row, A.nnz,
+          int(highspy.MatrixFormat.kColwise), int(highspy.ObjSense.kMinimize), 0.0,
+          sparse_model.c, sparse_model.col_lower, np.minimum(sparse_model.col_upper, inf),
+          np.maximum(sparse_model.row_lower, -inf), np.minimum(sparse_model.row_upper, inf),
+          A.indptr.astype(np.int32), A.indices.astype(np.int32), A.data, integrality
+          )
+    return highs
+
+def run_highs(highs, sparse_model, relax = False, start = None):
+    """
+    This function runs a HiGHS instance holding the SparseModel, from
+    the column values start as a MIP start when given, and returns a
+    SparseSolution
+    """
+    if start is not None and not relax:
+        solution = highspy.HighsSolution()
+        solution.col_value = np.asarray(start, dtype = np.float64).tolist()
+        solution.value_valid = True
+        highs.setSolution(solution)
+
+    begin = time.perf_counter()
+    highs.run()
+    runtime = time.perf_counter() - begin
+
+    info = highs.getInfo()
+    status = highs.modelStatusToString(highs.getModelStatus())
+    values = np.array(highs.getSolution().col_value)
+    objective = info.objective_function_value
+    if relax:
+        bound, gap = objective, 0.0
+    else:
+        bound, gap = info.mip_dual_bound, info.mip_gap
+    return SparseSolution(sparse_model, status, objective, bound, gap, runtime, values)
+
+def solve_highs(sparse_model, time_limit = None, mip_rel_gap = None, threads = None,
+                tee = False, relax = False, start = None):
+    """
+    This function solves the SparseModel in-process with HiGHS (the MILP,
+    or with relax its LP relaxation) and returns a SparseSolution
+    """
+    highs = highs_instance(sparse_model, time_limit, mip_rel_gap, threads, tee, relax)
+    return run_highs(highs, sparse_model, relax, start)
+
+def _canonical_row(coefs, lower, upper):
+    """
+    This function scales a row so its first coefficient is positive and
+    returns it with its bounds as comparable tuples
+    """
+    coefs = sorted((col, val) for col, val in coefs.items() if val != 0)
+    if coefs and coefs[0][1] < 0:
+        coefs = [(col, -val) for col, val in coefs]
+        lower, upper = -upper, -lower
+    return coefs, lower, upper
+
+def _close(a, b, tol):
+    return a == b or abs(a - b) <= tol * max(1.0, abs(a), abs(b))
+
+def _rows_match(row_a, row_b, tol):
+    (coefs_a, lower_a, upper_a), (coefs_b, lower_b, upper_b) = row_a, row_b
+    return len(coefs_a) == len(coefs_b) \
+           and all(ca == cb and _close(va, vb, tol) for (ca, va), (cb, vb) in zip(coefs_a, coefs_b)) \
+           and _close(lower_a, lower_b, tol) and _close(upper_a, upper_b, tol)
+
+def cross_check(pyomo_model, sparse_model, tol = 1e-9):
+    """
+    This function compares the SparseModel with the Pyomo model built
+    from the same input, column by column, row by row (up to the sign of
+    the row) and on the objective, and returns the list of mismatches
+    (empty when both formulations agree). Meant for small instances
+    """
+    mismatches = []
+    column_of = {}
+    for family in sparse_model.columns.values():
+        var = getattr(pyomo_model, family.name)
+        keys = [family.space.key(pos) for pos in range(family.space.size)]
+        if set(keys) != set(var.keys()):
+            mismatches.append('variable %s: index sets differ' % family.name)
+        for pos, key in enumerate(keys):
+            if key in var:
+                column_of[id(var[key])] = family.offset + pos
+
+    def pyomo_coefs(expr):
+        repn = generate_standard_repn(expr)
+        coefs = {}
+        for var, coef in zip(repn.linear_vars, repn.linear_coefs):
+            col = column_of[id(var)]
+            coefs[col] = coefs.get(col, 0) + pyo.value(coef)
+        return coefs, pyo.value(repn.constant)
+
+    def pyomo_row(con):
+        coefs, constant = pyomo_coefs(con.body)
+        lower = -np.inf if con.lower is None else pyo.value(con.lower) - constant
+        upper = np.inf if con.upper is None else pyo.value(con.upper) - constant
+        return _canonical_row(coefs, lower, upper)
+
+    A = sparse_model.A
+    for family in sparse_model.families:
+        con = getattr(pyomo_model, family.name)
+        offset = sparse_model.row_offset[family.name]
+        sparse_rows = {}
+        for r, flat in enumerate(family.index):
+            start, end = A.indptr[offset + r], A.indptr[offset + r + 1]
+            sparse_rows[family.space.key(flat)] = _canonical_row(
+                dict(zip(A.indices[start:end].tolist(), A.data[start:end].tolist())),
+                sparse_model.row_lower[offset + r], sparse_model.row_upper[offset + r]
+                )
+        # Pyomo keys the rows of a one-dimensional family by the bare label
+        pyomo_keys = {key if isinstance(key, tuple) else (key,): key for key in con.keys()}
+        if set(sparse_rows) != set(pyomo_keys):
+            mismatches.append('%s (%s): row index sets differ' % (family.name, family.rule))
+        for key, row in sparse_rows.items():
+            if key in pyomo_keys and not _rows_match(row, pyomo_row(con[pyomo_keys[key]]), tol):
+                mismatches.append('%s (%s) %s: coefficients or bounds differ' % (family.name, family.rule, key))
+
+    objective = pyomo_coefs(pyomo_model.objective_function.expr)[0]
+    objective = sorted((col, val) for col, val in objective.items() if val != 0)
+    sparse_objective = [(col, val) for col, val in enumerate(sparse_model.c.tolist()) if val != 0]
+    if not _rows_match((objective, 0, 0), (sparse_objective, 0, 0), tol):
+        mismatches.append('objective coefficients differ')
+    return mismatches
@@ -0,0 +1,86 @@
+###############################################
+# This documents contains the time-bucket #####
+# compression: stretches of the horizon #######
+# without events are merged into coarser ######
+# buckets, while every supply release, ########
+# deadline and arrival from those epochs ######
+# keeps its exact period. #####################
+
+# Import nccessary packages
+import Auxiliary_Functions as faux
+
+
+def event_periods(set_input, fixed_par, var_par):
+    """
+    This function returns the sorted periods the timeline must keep
+    exactly: the first and last period (close_the_loop), every supply
+    release, every deadline tau after a release at an origin, and the
+    arrivals of departures leaving in any of these periods
+    """
+    periods = list(set_input.t)
+    t_first, t_last = periods[0], periods[-1]
+    events = {t_first, t_last}
+    for (c, g, i, d, t), val in var_par.S.items():
+        if val and t in set_input.t:
+            events.add(t)
+            if i in set_input.o and i != d and (g, i, d) in fixed_par.tau:
+                events.add(t + fixed_par.tau[g, i, d])
+
+    arrivals = {
+    t + fixed_par.H[i, j]
+    for t in events for (i, j) in set_input.a
+    }
+    events |= arrivals
+    return sorted(t for t in events if t_first <= t <= t_last)
+
+def compressed_periods(set_input, fixed_par, var_par, max_gap):
+    """
+    This function returns the periods of the compressed timeline: the
+    event periods, with the quiet stretches between them sampled every
+    max_gap periods so that no bucket is longer than max_gap
+    """
+    periods = list(set_input.t)
+    events = event_periods(set_input, fixed_par, var_par)
+    kept = []
+    for start, end in zip(events[:-1], events[1:]):
+        kept += [t for t in periods if start <= t < end and (t - start) % max_gap == 0]
+    return kept + [events[-1]]
+
+def compress_supply(S, periods, kept):
+    """
+    This function returns the supply S over the kept periods only: every
+    entry of a dropped period (in practice only the zeros the workbook
+    holds for empty cells, as every release is kept) is merged into the
+    first kept period after it
+    """
+    kept_set = set(kept)
+    bucket, next_kept = {}, None
+    for t in reversed(periods):
+        if t in kept_set:
+            next_kept = t
+        bucket[t] = next_kept
+    compressed = {}
+    for (c, g, i, d, t), val in S.items():
+        if bucket.get(t) is not None:
+            key = (c, g, i, d, bucket[t])
+            compressed[key] = compressed.get(key, 0) + val
+    return compressed
+
+def compress_timeline(set_input, fixed_par, var_par, max_gap = 4):
+    """
+    This function takes in the input objects and returns the SetInput and
+    the varying parameters of the compressed timeline. Departures only
+    leave in the kept periods and arrive in the first kept period after
+    their journey time, so every schedule of the compressed model runs on
+    the original grid (assets wait where they arrive until the next kept
+    period); the constraints are stated in the kept periods. The supply S,
+    the only parameter indexed by period, is carried over to the kept
+    periods (compress_supply)
+    """
+    t = compressed_periods(set_input, fixed_par, var_par, max_gap)
+    at = faux.feasible_departures(fixed_par.H, t)
+    S = compress_supply(var_par.S, list(set_input.t), t)
+    return (faux.SetInput(set_input.g, set_input.i, set_input.j, set_input.o, set_input.d,
+                          set_input.l, set_input.c, set_input.w, t, set_input.a, at),
+            faux.ParaVarInput(var_par.FC, var_par.VC, var_par.P, var_par.WMAX, S,
+                              var_par.M_init, var_par.WS_init))
@@ -7,8 +7,7 @@ def variable_initialisation(optimisation_model):
     """
     
     optimisation_model.x = pyo.Var(
-                            optimisation_model.l, optimisation_model.i,
-                            optimisation_model.j, optimisation_model.t,
+                            optimisation_model.l, optimisation_model.at,
                             within = pyo.Binary,
                             doc = 'locomotive (of type l) leaving i for j at period t'
                             )
@@ -21,8 +20,7 @@ def variable_initialisation(optimisation_model):
                            )
 
     optimisation_model.WM = pyo.Var(
-                            optimisation_model.w, optimisation_model.i,
-                            optimisation_model.j, optimisation_model.t,
+                            optimisation_model.w, optimisation_model.at,
                             within = pyo.NonNegativeIntegers,
                             doc = '# Wagons (of type w) leaving i for j at period t'
                             )
@@ -34,18 +32,25 @@ def variable_initialisation(optimisation_model):
                             doc = '# Wagons (of type w) stationed at i at period t'
                             )
 
-    optimisation_model.CM = pyo.Var(
-                            optimisation_model.c, optimisation_model.g,
+    # container variables only over the reachable sets when the model has them
+    if hasattr(optimisation_model, 'cm'):
+        container_flows = (optimisation_model.cm,)
+        container_stocks = (optimisation_model.cs,)
+    else:
+        container_flows = (optimisation_model.c, optimisation_model.g,
+                           optimisation_model.d, optimisation_model.at)
+        container_stocks = (optimisation_model.c, optimisation_model.g,
                             optimisation_model.d, optimisation_model.i,
-                            optimisation_model.j, optimisation_model.t,
+                            optimisation_model.t)
+
+    optimisation_model.CM = pyo.Var(
+                            *container_flows,
                             within = pyo.NonNegativeIntegers,
                             doc = '# Containers (of type c for customer g, to be delivered from o) leaving i for j at period t'
                             )
 
     optimisation_model.CS = pyo.Var(
-                            optimisation_model.c, optimisation_model.g,
-                            optimisation_model.d, optimisation_model.i,
-                            optimisation_model.t,
+                            *container_stocks,
                             within = pyo.NonNegativeIntegers,
                             doc = '# Containers (of type c for customer g, to be delivered from o) staioned at i at period t'
                             )